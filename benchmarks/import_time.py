@@ -0,0 +1,117 @@
+"""Import-time budget of every chessnet module.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, and
+its cumulative import time is compared with its budget. The exit status is 1 if
+any module goes over budget.
+
+    python benchmarks/import_time.py [--repeat 5] [--output import_time.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Budgets in milliseconds. Only numpy and pandas are imported eagerly, igraph,
+# networkx, scipy, cdlib and python-chess are loaded on first use.
+BUDGETS_MS: Dict[str, float] = {
+    "chessnet": 50,
+    "chessnet.utils": 50,
+    "chessnet.compression": 100,
+    "chessnet.cache": 100,
+    "chessnet.metrics": 50,
+    "chessnet.rewiring": 300,
+    "chessnet.elo": 300,
+    "chessnet.players": 1000,
+    "chessnet.games": 1000,
+    "chessnet.statistics": 1000,
+    "chessnet.accumulators": 1000,
+    "chessnet.pgn": 1000,
+    "chessnet.edges": 1000,
+    "chessnet.graphs": 1000,
+    "chessnet.csr": 1000,
+    "chessnet.mixing": 1000,
+    "chessnet.rich_club": 1000,
+    "chessnet.temporal": 1000,
+    "chessnet.communities": 1000,
+    "chessnet.auxiliary": 1000,
+    "chessnet.pipeline": 1000,
+    "chessnet.cli": 50,
+}
+
+IMPORTTIME_REGEX = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure_import_time(module: str) -> Dict[str, float]:
+    """Cumulative import time of `module` and of its slowest dependencies, in ms."""
+    env = {**os.environ, "PYTHONPATH": str(ROOT_DIR / "src")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_REGEX.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2)) / 1000
+    return times
+
+
+def run(modules: List[str], repeat: int = 3) -> List[Dict]:
+    # Modules loaded at interpreter startup are not the module's fault
+    startup = set(measure_import_time("sys"))
+    results = []
+    for module in modules:
+        # The best of several runs is the least affected by a busy machine
+        runs = [measure_import_time(module) for _ in range(repeat)]
+        best = min(runs, key=lambda times: times.get(module, 0.0))
+        top_level = {
+            name: ms
+            for name, ms in best.items()
+            if "." not in name and name != "chessnet" and name not in startup
+        }
+        slowest = sorted(top_level.items(), key=lambda item: -item[1])[:3]
+        results.append(
+            {
+                "module": module,
+                "ms": best.get(module, 0.0),
+                "budget_ms": BUDGETS_MS.get(module, float("inf")),
+                "slowest_dependencies": dict(slowest),
+            }
+        )
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS_MS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = run(args.modules, repeat=args.repeat)
+    over_budget = False
+    for result in results:
+        status = "ok" if result["ms"] <= result["budget_ms"] else "OVER BUDGET"
+        over_budget |= status != "ok"
+        dependencies = ", ".join(
+            f"{name} {ms:.0f}ms" for name, ms in result["slowest_dependencies"].items()
+        )
+        print(
+            f"{result['module']:24s} {result['ms']:8.1f}ms "
+            f"(budget {result['budget_ms']:.0f}ms) {status}  [{dependencies}]"
+        )
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    sys.exit(1 if over_budget else 0)
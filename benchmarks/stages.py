@@ -0,0 +1,197 @@
+"""Wall time and peak memory of every pipeline stage on synthetic databases.
+
+For each size, a synthetic PGN is generated (once, it is kept in the benchmark
+data directory) and the pipeline stages are rebuilt from scratch, each in its
+own process, as `chessnet run --force` does. Data and artifacts live in
+`--root`, never in the project directories. Results are written as JSON, and
+with `--baseline` the stages that got slower or bigger than the tolerance are
+reported and the exit status is 1.
+
+    python benchmarks/stages.py --games 1000 100000 --output bench.json
+    python benchmarks/stages.py --games 100000 --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from synthetic import write_synthetic_pgn
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_STAGES = [
+    "games",
+    "graph",
+    "degree_and_elo",
+    "rewired",
+    "gml",
+    "csr",
+    "rich_club",
+    "rich_club_elo",
+    "communities",
+    "modularities",
+]
+
+
+def get_database(n_games: int, seed: int) -> str:
+    return f"synthetic_{n_games}_seed{seed}"
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    sizes: List[int],
+    stages: List[str],
+    seed: int = 0,
+    workers: int = 1,
+    parser: str = "scanner",
+    community_samples: int = 10,
+    nswap_ecount_times: float = 2.0,
+    samples: int = 30,
+) -> List[Dict[str, Any]]:
+    # Imported here, after the data and artifact directories are set
+    from chessnet.pipeline import get_stages, run_pipeline
+    from chessnet.utils import DATA_DIR
+
+    results = []
+    for n_games in sizes:
+        database = get_database(n_games, seed)
+        pgn = DATA_DIR / "om_datasets" / f"{database}.pgn"
+        if not pgn.is_file():
+            start = time.perf_counter()
+            write_synthetic_pgn(pgn, n_games, seed=seed)
+            print(f"Generated {pgn.name} in {time.perf_counter() - start:.1f}s")
+        pipeline_stages = get_stages(
+            database,
+            parser=parser,
+            workers=workers,
+            seed=seed,
+            nswap_ecount_times=nswap_ecount_times,
+            samples=samples,
+            community_samples=community_samples,
+        )
+        reports = run_pipeline(pipeline_stages, stages, workers=workers, force=True)
+        for report in reports:
+            results.append(
+                {
+                    "games": n_games,
+                    "stage": report["stage"].split("/", 1)[-1],
+                    "status": report["status"],
+                    "seconds": report["seconds"],
+                    "peak_rss": report["peak_rss"],
+                    "error": report["error"],
+                }
+            )
+    return results
+
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    tolerance: float = 0.25,
+    min_seconds: float = 0.5,
+) -> List[str]:
+    """Stages slower or bigger than `tolerance` (relative) than in the baseline.
+
+    Stages faster than `min_seconds` in both runs are too noisy to time.
+    """
+    previous = {(row["games"], row["stage"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get((row["games"], row["stage"]))
+        if old is None or old["status"] != "built" or row["status"] != "built":
+            continue
+        label = f"{row['stage']} ({row['games']} games)"
+        slow = max(row["seconds"], old["seconds"]) >= min_seconds
+        if slow and row["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{label}: {old['seconds']:.2f}s -> {row['seconds']:.2f}s"
+            )
+        if row["peak_rss"] > old["peak_rss"] * (1 + tolerance):
+            regressions.append(
+                f"{label}: peak RSS {old['peak_rss'] / 2**20:.0f} MB -> "
+                f"{row['peak_rss'] / 2**20:.0f} MB"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--stages", nargs="+", default=DEFAULT_STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--parser", choices=["chess", "scanner"], default="scanner")
+    parser.add_argument("--community-samples", type=int, default=10)
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=ROOT_DIR / "benchmarks" / "data",
+        help="Directory for the synthetic PGN files and the artifacts",
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    os.environ["CHESSNET_DATA_DIR"] = str(args.root)
+    os.environ["CHESSNET_ARTIFACTS_DIR"] = str(args.root / "artifacts")
+    (args.root / "artifacts").mkdir(parents=True, exist_ok=True)
+
+    results = run(
+        args.games,
+        args.stages,
+        seed=args.seed,
+        workers=args.workers,
+        parser=args.parser,
+        community_samples=args.community_samples,
+    )
+    for row in results:
+        print(
+            f"{row['games']:>10} {row['stage']:16s} {row['status']:8s} "
+            f"{row['seconds']:8.2f}s {row['peak_rss'] / 2**20:8.0f} MB"
+        )
+    if args.output is not None:
+        output = {
+            "revision": _git_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "arguments": {
+                key: str(value) if isinstance(value, Path) else value
+                for key, value in vars(args).items()
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(output, file, indent=2)
+
+    failed = [row for row in results if row["status"] == "failed"]
+    for row in failed:
+        print(f"{row['stage']} ({row['games']} games) failed:\n{row['error']}")
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+    sys.exit(1 if failed or regressions else 0)
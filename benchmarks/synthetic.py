@@ -0,0 +1,154 @@
+"""Deterministic synthetic PGN databases for benchmarks.
+
+Players have a heavy-tailed (Pareto) activity, so a few players play most of
+the games as in the OM databases, and a skill that grows with their activity.
+Each game has Elo tags drawn around the skill of both players (a few are
+missing), a result drawn from the Elo expected score, and a date in the
+`years` period. Games are generated in fixed-size chunks, each with its own
+random stream, so the same arguments always give the same file.
+
+    python benchmarks/synthetic.py 100000 data/bench/bench_100000.pgn [--seed 0]
+"""
+
+import argparse
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+CHUNK_GAMES = 100_000
+SITES = ["FICS freechess.org", "ICC", "Lichess"]
+SITE_PROBABILITIES = [0.8, 0.15, 0.05]
+MISSING_ELO_RATE = 0.02
+DRAW_RATE = 0.3
+
+
+def generate_players(
+    n_players: int, seed: int = 0, alpha: float = 1.2
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cumulative activity distribution and skill of every player."""
+    rng = np.random.default_rng([seed, 0])
+    activity = rng.pareto(alpha, n_players) + 1
+    skill = rng.normal(1650, 280, n_players) + 60 * np.log(activity)
+    skill = np.clip(skill, 700, 2850)
+    cdf = np.cumsum(activity)
+    return cdf / cdf[-1], skill
+
+
+def _sample_players(
+    rng: np.random.Generator, cdf: np.ndarray, n: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    white = np.searchsorted(cdf, rng.random(n), side="right")
+    black = np.searchsorted(cdf, rng.random(n), side="right")
+    # Nobody plays against themselves: redraw the opponent
+    same = np.flatnonzero(white == black)
+    while len(same):
+        black[same] = np.searchsorted(cdf, rng.random(len(same)), side="right")
+        same = same[white[same] == black[same]]
+    return white, black
+
+
+def generate_chunk(
+    chunk: int,
+    n_games: int,
+    cdf: np.ndarray,
+    skill: np.ndarray,
+    seed: int = 0,
+    years: Tuple[int, int] = (1990, 2015),
+) -> str:
+    rng = np.random.default_rng([seed, 1, chunk])
+    white, black = _sample_players(rng, cdf, n_games)
+    white_elo = np.round(skill[white] + rng.normal(0, 30, n_games)).astype(int)
+    black_elo = np.round(skill[black] + rng.normal(0, 30, n_games)).astype(int)
+    white_missing = rng.random(n_games) < MISSING_ELO_RATE
+    black_missing = rng.random(n_games) < MISSING_ELO_RATE
+
+    expected = 1 / (1 + 10 ** ((black_elo - white_elo) / 400))
+    draw = rng.random(n_games) < DRAW_RATE
+    white_wins = rng.random(n_games) < expected
+    results = np.where(draw, "1/2-1/2", np.where(white_wins, "1-0", "0-1"))
+
+    first = np.datetime64(f"{years[0]}-01-01")
+    days = (np.datetime64(f"{years[1]}-01-01") - first).astype(int)
+    dates = first + rng.integers(0, days, n_games).astype("timedelta64[D]")
+    dates = np.datetime_as_string(dates, unit="D")
+    sites = rng.choice(SITES, n_games, p=SITE_PROBABILITIES)
+    ecos = rng.choice(list("ABCDE"), n_games)
+    eco_numbers = rng.integers(0, 100, n_games)
+    plies = rng.integers(10, 160, n_games)
+
+    first_game = chunk * CHUNK_GAMES
+    games = []
+    for i in range(n_games):
+        tags = [
+            f'[Event "Synthetic {first_game + i}"]',
+            f'[Site "{sites[i]}"]',
+            f'[Date "{dates[i].replace("-", ".")}"]',
+            f'[White "P{white[i]}"]',
+            f'[Black "P{black[i]}"]',
+            f'[Result "{results[i]}"]',
+        ]
+        if not white_missing[i]:
+            tags.append(f'[WhiteElo "{white_elo[i]}"]')
+        if not black_missing[i]:
+            tags.append(f'[BlackElo "{black_elo[i]}"]')
+        tags.append(f'[ECO "{ecos[i]}{eco_numbers[i]:02d}"]')
+        tags.append(f'[PlyCount "{plies[i]}"]')
+        games.append("\n".join(tags) + f"\n\n1. e4 e5 {results[i]}\n\n")
+    return "".join(games)
+
+
+def iter_pgn_chunks(
+    n_games: int,
+    n_players: Optional[int] = None,
+    seed: int = 0,
+    years: Tuple[int, int] = (1990, 2015),
+) -> Iterator[str]:
+    n_players = max(n_games // 10, 10) if n_players is None else n_players
+    cdf, skill = generate_players(n_players, seed)
+    for chunk, start in enumerate(range(0, n_games, CHUNK_GAMES)):
+        size = min(CHUNK_GAMES, n_games - start)
+        yield generate_chunk(chunk, size, cdf, skill, seed=seed, years=years)
+
+
+def write_synthetic_pgn(
+    filename: Union[Path, str],
+    n_games: int,
+    n_players: Optional[int] = None,
+    seed: int = 0,
+    years: Tuple[int, int] = (1990, 2015),
+    verbose: bool = False,
+) -> None:
+    """Write `n_games` synthetic games, about 10 per player by default."""
+    filename = Path(filename)
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    tmp_filename = filename.with_name(f".{filename.name}.tmp")
+    with open(tmp_filename, "w") as file:
+        for i, text in enumerate(iter_pgn_chunks(n_games, n_players, seed, years)):
+            file.write(text)
+            if verbose:
+                done = min((i + 1) * CHUNK_GAMES, n_games)
+                print(f"Generated {done}/{n_games} games")
+    os.replace(tmp_filename, filename)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("games", type=int)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--players", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--first-year", type=int, default=1990)
+    parser.add_argument("--last-year", type=int, default=2014)
+    args = parser.parse_args()
+
+    write_synthetic_pgn(
+        args.output,
+        args.games,
+        n_players=args.players,
+        seed=args.seed,
+        years=(args.first_year, args.last_year + 1),
+        verbose=True,
+    )
@@ -0,0 +1,3 @@
+from chessnet.cli import main
+
+main()
@@ -0,0 +1,200 @@
+import os
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from chessnet.graphs import get_edges_filename
+from chessnet.players import read_player_registry
+from chessnet.statistics import get_elo_data_filename
+from chessnet.utils import ARTIFACTS_DIR
+
+Chunk = Union[Dict[str, list], pd.DataFrame]
+
+
+def _empty_moments() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"count": [], "mean": [], "m2": []},
+        index=pd.Index([], dtype=object, name="Player"),
+    )
+
+
+def _empty_pairs() -> pd.DataFrame:
+    index = pd.MultiIndex.from_arrays(
+        [pd.Index([], dtype=object), pd.Index([], dtype=object)],
+        names=["White", "Black"],
+    )
+    return pd.DataFrame(
+        {"count": np.zeros(0, dtype=np.int64), "first": np.zeros(0, dtype=np.int64)},
+        index=index,
+    )
+
+
+def merge_pairs(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Add the game counts of two pair tables and keep the earliest first game."""
+    pairs = pd.concat([a, b]).groupby(level=["White", "Black"], sort=False)
+    return pairs.agg({"count": "sum", "first": "min"}).astype(np.int64)
+
+
+def merge_moments(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Combine per-player count/mean/M2 of two disjoint sets of games.
+
+    This is the parallel form of Welford's update (Chan et al.), so the result
+    does not depend on how games were split into chunks.
+    """
+    a, b = a.align(b, join="outer", fill_value=0)
+    count = a["count"] + b["count"]
+    ratio = b["count"] / count
+    delta = b["mean"] - a["mean"]
+    return pd.DataFrame(
+        {
+            "count": count,
+            "mean": a["mean"] + delta * ratio,
+            "m2": a["m2"] + b["m2"] + delta**2 * a["count"] * ratio,
+        }
+    )
+
+
+class GameAccumulator:
+    """Per-player Elo moments and pairwise game counts, updated chunk by chunk.
+
+    Memory grows with the number of players and of distinct (White, Black)
+    pairs, not with the number of games. Players are keyed by name, so chunks
+    can be accumulated in workers that do not know the player registry and
+    merged afterwards. Elo values outside [min_elo, max_elo] are ignored, and a
+    pair is counted only when both Elo values are in range and, if `site` is
+    set, the game was played there, as in `graphs.edge_ids_from_games`.
+
+    Pairs also keep the position of their first game, so that edges can be
+    listed in the order of `value_counts`. Chunks must be updated, or their
+    accumulators merged, in the order of the games.
+    """
+
+    def __init__(
+        self, min_elo: int = 500, max_elo: int = 4000, site: Optional[str] = None
+    ):
+        self.min_elo = min_elo
+        self.max_elo = max_elo
+        self.site = site
+        self.moments = _empty_moments()
+        self.pairs = _empty_pairs()
+        self.n_games = 0
+
+    def empty(self) -> "GameAccumulator":
+        return GameAccumulator(self.min_elo, self.max_elo, self.site)
+
+    def update(self, chunk: Chunk) -> "GameAccumulator":
+        chunk = pd.DataFrame(chunk)
+        if chunk.empty:
+            return self
+        white = chunk["White"].to_numpy(dtype=object)
+        black = chunk["Black"].to_numpy(dtype=object)
+        white_elo = pd.to_numeric(chunk["WhiteElo"], errors="coerce").to_numpy(
+            dtype=float, na_value=np.nan
+        )
+        black_elo = pd.to_numeric(chunk["BlackElo"], errors="coerce").to_numpy(
+            dtype=float, na_value=np.nan
+        )
+        names = pd.Series(np.concatenate([white, black]))
+        elo = np.concatenate([white_elo, black_elo])
+        in_range = (elo >= self.min_elo) & (elo <= self.max_elo)
+        mask = in_range & names.notna().to_numpy()
+        grouped = pd.Series(elo[mask]).groupby(names[mask].to_numpy())
+        count = grouped.size()
+        moments = pd.DataFrame(
+            {
+                "count": count,
+                "mean": grouped.mean(),
+                "m2": grouped.var(ddof=0) * count,
+            }
+        )
+        self.moments = merge_moments(self.moments, moments)
+
+        n = len(chunk)
+        mask = in_range[:n] & in_range[n:] & pd.notna(white) & pd.notna(black)
+        if self.site is not None and "Site" in chunk.columns:
+            mask &= (chunk["Site"] == self.site).to_numpy()
+        pairs = pd.DataFrame(
+            {
+                "White": white[mask],
+                "Black": black[mask],
+                "game": np.flatnonzero(mask) + self.n_games,
+            }
+        )
+        pairs = pairs.groupby(["White", "Black"], sort=False)["game"].agg(
+            ["size", "min"]
+        )
+        pairs.columns = ["count", "first"]
+        self.pairs = merge_pairs(self.pairs, pairs)
+        self.n_games += n
+        return self
+
+    def merge(self, other: "GameAccumulator") -> "GameAccumulator":
+        if (other.min_elo, other.max_elo, other.site) != (
+            self.min_elo,
+            self.max_elo,
+            self.site,
+        ):
+            raise ValueError("Cannot merge accumulators with different filters")
+        self.moments = merge_moments(self.moments, other.moments)
+        # The games of `other` come after the games of this accumulator
+        pairs = other.pairs.assign(first=other.pairs["first"] + self.n_games)
+        self.pairs = merge_pairs(self.pairs, pairs)
+        self.n_games += other.n_games
+        return self
+
+    def elo_data(self, registry: pd.Index) -> pd.DataFrame:
+        """The `_elo_data` table, as `statistics.get_players_elo` computes it."""
+        moments = self.moments[self.moments["count"] >= 2]
+        ids = registry.get_indexer(moments.index)
+        df = pd.DataFrame(
+            {
+                "MeanElo": moments["mean"].to_numpy(),
+                "StdElo": np.sqrt(moments["m2"] / (moments["count"] - 1)).to_numpy(),
+                "PlayerId": ids,
+            },
+            index=pd.Index(moments.index, name="Player"),
+        )
+        return df[ids >= 0].sort_values("PlayerId")
+
+    def edge_ids(self, registry: pd.Index) -> pd.DataFrame:
+        """Directed edges by player ID, as `graphs.edge_ids_from_games` orders them."""
+        white = registry.get_indexer(self.pairs.index.get_level_values("White"))
+        black = registry.get_indexer(self.pairs.index.get_level_values("Black"))
+        counts = self.pairs["count"].to_numpy()
+        first = self.pairs["first"].to_numpy()
+        mask = (white >= 0) & (black >= 0)
+        white, black = white[mask], black[mask]
+        counts, first = counts[mask], first[mask]
+        order = np.lexsort((first, -counts))
+        return pd.DataFrame(
+            {
+                "WhiteId": white[order].astype(np.int32),
+                "BlackId": black[order].astype(np.int32),
+                "NUMBER_OF_GAMES": counts[order],
+            }
+        )
+
+
+def write_accumulated(database: str, accumulator: GameAccumulator) -> None:
+    """Write the `_elo_data` and edge artifacts of a database from its games.
+
+    The player registry must already hold every player of the accumulator. Edge
+    tables of the database with other Elo bounds are deleted.
+    """
+    registry = read_player_registry(database)
+    elo_filename = get_elo_data_filename(database)
+    edges_filename = get_edges_filename(
+        database, accumulator.min_elo, accumulator.max_elo
+    )
+    # Edge tables of other Elo bounds describe the games of a previous parse
+    for filename in ARTIFACTS_DIR.glob(f"{database}_edges_*.csv"):
+        if filename != edges_filename:
+            filename.unlink()
+    for df, filename, index in [
+        (accumulator.elo_data(registry), elo_filename, True),
+        (accumulator.edge_ids(registry), edges_filename, False),
+    ]:
+        tmp_filename = filename.with_name(filename.name + ".tmp")
+        df.to_csv(tmp_filename, index=index)
+        os.replace(tmp_filename, filename)
@@ -1,7 +1,10 @@
-from typing import Union, Literal, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
+Scale = Literal["loglog", "logx", "logy", "linear", "powerlaw"]
+
 
 def powerlaw(
     X: Union[float, np.ndarray], a: float, c: float
@@ -9,14 +12,12 @@ def powerlaw(
     return c * X**a
 
 
-def linear_regression(
+def _transform(
     xvalues: Union[np.ndarray, Sequence],
     yvalues: Union[np.ndarray, Sequence],
-    scale: Literal["loglog", "logx", "logy", "linear"] = "loglog",
-    t: float = 1.96,
-) -> Tuple[np.ndarray, float, float]:
-
-    if scale == "loglog":
+    scale: Scale,
+) -> Tuple[np.ndarray, np.ndarray]:
+    if scale in ["loglog", "powerlaw"]:
         X = np.log(xvalues)
         Y = np.log(yvalues)
     elif scale == "logy":
@@ -30,7 +31,17 @@ def linear_regression(
         Y = np.array(yvalues)
     else:
         raise ValueError("ERROR: scale", scale, "not supported")
+    return X.astype(float), Y.astype(float)
+
 
+def linear_regression(
+    xvalues: Union[np.ndarray, Sequence],
+    yvalues: Union[np.ndarray, Sequence],
+    scale: Literal["loglog", "logx", "logy", "linear"] = "loglog",
+    t: float = 1.96,
+) -> Tuple[np.ndarray, float, float]:
+
+    X, Y = _transform(xvalues, yvalues, scale)
     coeffs, cov = np.polyfit(X, Y, 1, cov=True)
     errors = np.sqrt(np.diag(cov))
 
@@ -43,3 +54,114 @@ def linear_regression(
     y_error = t * std
 
     return Y_pred, slope, y_error
+
+
+def fit_lines(X: np.ndarray, Y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Least-squares slope and intercept of every row of X and Y at once.
+
+    Rows with a constant X have no fit and get NaN.
+    """
+    x_mean = X.mean(axis=-1, keepdims=True)
+    y_mean = Y.mean(axis=-1, keepdims=True)
+    dx = X - x_mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (dx * (Y - y_mean)).sum(axis=-1) / (dx * dx).sum(axis=-1)
+    intercept = y_mean[..., 0] - slope * x_mean[..., 0]
+    return slope, intercept
+
+
+_bootstrap_data: Tuple[np.ndarray, np.ndarray] = (np.zeros(0), np.zeros(0))
+
+
+def _init_bootstrap_worker(X: np.ndarray, Y: np.ndarray) -> None:
+    # The points are sent once per worker, not once per chunk
+    global _bootstrap_data
+    _bootstrap_data = (X, Y)
+
+
+def _bootstrap_chunk(
+    replicates: int, seed_sequence: np.random.SeedSequence
+) -> Tuple[np.ndarray, np.ndarray]:
+    X, Y = _bootstrap_data
+    rng = np.random.default_rng(seed_sequence)
+    indices = rng.integers(0, len(X), size=(replicates, len(X)))
+    return fit_lines(X[indices], Y[indices])
+
+
+def _indices_chunk(indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    X, Y = _bootstrap_data
+    return fit_lines(X[indices], Y[indices])
+
+
+def bootstrap_regression(
+    xvalues: Union[np.ndarray, Sequence],
+    yvalues: Union[np.ndarray, Sequence],
+    scale: Scale = "loglog",
+    replicates: int = 1000,
+    seed: Optional[int] = None,
+    indices: Optional[np.ndarray] = None,
+    workers: int = 1,
+    max_elements: int = 2**24,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Fit the line of `linear_regression` to bootstrap resamples of the points.
+
+    Every replicate draws len(xvalues) points with replacement, or, if given,
+    takes the points of one row of the (replicates x samples) `indices` matrix,
+    e.g. to resample players with a custom scheme. Replicates are solved in
+    chunks of about `max_elements` points, all rows of a chunk at once, and
+    chunks are spread over `workers` processes. Each chunk gets its own child
+    of the master `seed`, so the result does not depend on the workers.
+
+    Only the points are resampled. With the `write_degree_and_elo` table, one
+    point per player, this is a bootstrap over players. Resampling games
+    changes the degree and Elo of the players themselves, so the points of
+    every replicate must be computed by the caller, e.g. stacked in one table
+    with a row of `indices` selecting each replicate.
+
+    Returns the slope and intercept of every replicate, in log space for the
+    log scales. For `powerlaw` (a log-log fit) returns the exponent `a` and the
+    prefactor `c` of `powerlaw(X, a, c)` instead.
+    """
+    X, Y = _transform(xvalues, yvalues, scale)
+    n = indices.shape[1] if indices is not None else len(X)
+    per_chunk = max(1, max_elements // max(n, 1))
+    if indices is not None:
+        jobs = [
+            (indices[start : start + per_chunk],)
+            for start in range(0, len(indices), per_chunk)
+        ]
+        fit = _indices_chunk
+    else:
+        sizes = [
+            min(per_chunk, replicates - start)
+            for start in range(0, replicates, per_chunk)
+        ]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        jobs = list(zip(sizes, seeds))
+        fit = _bootstrap_chunk
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_bootstrap_worker,
+            initargs=(X, Y),
+        ) as executor:
+            results = list(executor.map(fit, *zip(*jobs)))
+    else:
+        _init_bootstrap_worker(X, Y)
+        results = [fit(*job) for job in jobs]
+
+    if not results:
+        return np.zeros(0), np.zeros(0)
+    slope = np.concatenate([result[0] for result in results])
+    intercept = np.concatenate([result[1] for result in results])
+    if scale == "powerlaw":
+        return slope, np.exp(intercept)
+    return slope, intercept
+
+
+def confidence_interval(values: np.ndarray, level: float = 0.95) -> Tuple[float, float]:
+    """Percentile interval of bootstrap estimates, ignoring failed fits."""
+    alpha = (1 - level) / 2
+    low, high = np.nanquantile(values, [alpha, 1 - alpha])
+    return low, high
@@ -0,0 +1,304 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional
+
+from chessnet.utils import ARTIFACTS_DIR, ROOT_DIR
+
+CACHE_DIR = ARTIFACTS_DIR / "cache"
+MAX_CACHE_BYTES = 50 * 2**30
+HASH_BLOCK_SIZE = 8 * 2**20
+
+StageStatus = Literal["fresh", "restored", "built"]
+
+
+@dataclass
+class Stage:
+    """A pipeline step that turns input artifacts into output artifacts.
+
+    The outputs are considered fresh while the content of the inputs and the
+    `params` are the ones they were built from. `resumable` stages keep their
+    partial outputs when an interrupted build of the same key is resumed.
+    `workers` is the number of processes the stage runs on.
+    """
+
+    name: str
+    func: Callable[[], Any]
+    inputs: List[Path]
+    outputs: List[Path]
+    params: Dict[str, Any] = field(default_factory=dict)
+    resumable: bool = False
+    workers: int = 1
+
+
+def get_manifest_filename() -> Path:
+    return CACHE_DIR / "manifest.json"
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {"files": {}, "outputs": {}, "pending": {}, "entries": {}}
+
+
+def read_manifest() -> Dict[str, Any]:
+    filename = get_manifest_filename()
+    if not filename.is_file():
+        return _empty_manifest()
+    with open(filename, "r") as file:
+        return {**_empty_manifest(), **json.load(file)}
+
+
+def write_manifest(manifest: Dict[str, Any]) -> None:
+    filename = get_manifest_filename()
+    tmp_filename = filename.with_suffix(".json.tmp")
+    with open(tmp_filename, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_filename, filename)
+
+
+@contextmanager
+def _manifest_lock() -> Iterator[Dict[str, Any]]:
+    """Hold the cache lock and write back the yielded manifest on exit."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_DIR / ".lock", "w") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            manifest = read_manifest()
+            yield manifest
+            write_manifest(manifest)
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _relative(path: Path) -> str:
+    path = Path(path).resolve()
+    try:
+        return str(path.relative_to(ROOT_DIR))
+    except ValueError:
+        return str(path)
+
+
+def _iter_files(path: Path) -> Iterator[Path]:
+    # Hidden files are temporary files and locks
+    if path.is_dir():
+        for child in sorted(path.rglob("*")):
+            if child.is_file() and not child.name.startswith("."):
+                yield child
+    elif path.is_file():
+        yield path
+
+
+def _file_digest(path: Path, memo: Dict[str, Any]) -> str:
+    # Hashing a large PGN takes a while, so digests are reused while the size
+    # and modification time of the file do not change
+    stat = path.stat()
+    name = _relative(path)
+    entry = memo.get(name)
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+        return entry["sha256"]
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    memo[name] = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+    }
+    return digest.hexdigest()
+
+
+def artifact_digest(path: Path, memo: Optional[Dict[str, Any]] = None) -> str:
+    """Content hash of a file, or of every file in a directory artifact."""
+    path = Path(path)
+    memo = {} if memo is None else memo
+    if path.is_file():
+        return _file_digest(path, memo)
+    if not path.is_dir():
+        raise FileNotFoundError(f"Artifact {path} does not exist")
+    digest = hashlib.sha256()
+    for filename in _iter_files(path):
+        digest.update(str(filename.relative_to(path)).encode())
+        digest.update(_file_digest(filename, memo).encode())
+    return digest.hexdigest()
+
+
+def stage_key(stage: Stage, memo: Optional[Dict[str, Any]] = None) -> str:
+    description = {
+        "stage": stage.name,
+        "params": stage.params,
+        "inputs": {
+            _relative(path): artifact_digest(path, memo) for path in stage.inputs
+        },
+        "outputs": [_relative(path) for path in stage.outputs],
+    }
+    encoded = json.dumps(description, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def _artifact_size(path: Path) -> int:
+    return sum(filename.stat().st_size for filename in _iter_files(path))
+
+
+def _remove_artifact(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _copy_artifact(source: Path, destination: Path) -> None:
+    # Variants share disk blocks with the live artifacts through hard links.
+    # Stages always get fresh files (outputs are removed before a build), so a
+    # cached variant is never modified in place.
+    _remove_artifact(destination)
+    if source.is_dir():
+        shutil.copytree(source, destination, copy_function=_link_or_copy)
+    else:
+        _link_or_copy(str(source), str(destination))
+
+
+def _discard(key: str, manifest: Dict[str, Any]) -> None:
+    shutil.rmtree(CACHE_DIR / key, ignore_errors=True)
+    prefix = _relative(CACHE_DIR / key)
+    for name in [name for name in manifest["files"] if name.startswith(prefix)]:
+        del manifest["files"][name]
+
+
+def _variant_path(key: str, index: int, path: Path) -> Path:
+    return CACHE_DIR / key / f"{index}_{path.name}"
+
+
+def is_fresh(stage: Stage, key: str, manifest: Dict[str, Any]) -> bool:
+    entry = manifest["entries"].get(key)
+    if entry is None:
+        return False
+    for path, digest in zip(stage.outputs, entry["digests"]):
+        if manifest["outputs"].get(_relative(path)) != key or not path.exists():
+            return False
+        if artifact_digest(path, manifest["files"]) != digest:
+            return False
+    return True
+
+
+def _restore(stage: Stage, key: str, manifest: Dict[str, Any]) -> bool:
+    entry = manifest["entries"].get(key)
+    if entry is None:
+        return False
+    variants = [_variant_path(key, i, path) for i, path in enumerate(stage.outputs)]
+    if not all(variant.exists() for variant in variants):
+        return False
+    # A live artifact written in place outside the cache also changes the
+    # hard-linked variant, which is then discarded
+    for variant, digest in zip(variants, entry["digests"]):
+        if artifact_digest(variant, manifest["files"]) != digest:
+            _discard(key, manifest)
+            del manifest["entries"][key]
+            return False
+    for variant, path in zip(variants, stage.outputs):
+        _copy_artifact(variant, path)
+        manifest["outputs"][_relative(path)] = key
+    return True
+
+
+def _store(stage: Stage, key: str, manifest: Dict[str, Any]) -> None:
+    variant_dir = CACHE_DIR / key
+    if variant_dir.exists():
+        shutil.rmtree(variant_dir)
+    variant_dir.mkdir(parents=True)
+    for i, path in enumerate(stage.outputs):
+        if not path.exists():
+            raise FileNotFoundError(f"Stage {stage.name} did not write {path}")
+        _copy_artifact(path, _variant_path(key, i, path))
+        manifest["outputs"][_relative(path)] = key
+        manifest["pending"].pop(_relative(path), None)
+    manifest["entries"][key] = {
+        "stage": stage.name,
+        "params": json.loads(json.dumps(stage.params, default=str)),
+        "outputs": [_relative(path) for path in stage.outputs],
+        "digests": [artifact_digest(path, manifest["files"]) for path in stage.outputs],
+        "bytes": sum(_artifact_size(path) for path in stage.outputs),
+        "created": time.time(),
+        "last_used": time.time(),
+    }
+
+
+def evict(max_bytes: int = MAX_CACHE_BYTES, manifest: Optional[Dict] = None) -> int:
+    """Remove the least recently used variants until the cache fits in `max_bytes`.
+
+    Variants that back the current artifacts are kept. Returns the freed bytes.
+    """
+    if manifest is None:
+        with _manifest_lock() as manifest:
+            return evict(max_bytes, manifest)
+    current = set(manifest["outputs"].values())
+    entries = manifest["entries"]
+    total = sum(entry["bytes"] for entry in entries.values())
+    freed = 0
+    for key in sorted(entries, key=lambda key: entries[key]["last_used"]):
+        if total - freed <= max_bytes:
+            break
+        if key in current:
+            continue
+        _discard(key, manifest)
+        freed += entries.pop(key)["bytes"]
+    return freed
+
+
+def run_stage(
+    stage: Stage,
+    force: bool = False,
+    max_bytes: int = MAX_CACHE_BYTES,
+    verbose: bool = False,
+) -> StageStatus:
+    """Make the outputs of a stage up to date, building them only if needed.
+
+    Outputs are fresh when they were built from the current content of the
+    inputs with the same parameters. Otherwise a cached variant with the same
+    key is restored, and only as a last resort the stage is run and its outputs
+    are added to the cache.
+    """
+    with _manifest_lock() as manifest:
+        key = stage_key(stage, manifest["files"])
+        status: Optional[StageStatus] = None
+        if not force and is_fresh(stage, key, manifest):
+            status = "fresh"
+        elif not force and _restore(stage, key, manifest):
+            status = "restored"
+        if status is not None:
+            manifest["entries"][key]["last_used"] = time.time()
+        else:
+            for path in stage.outputs:
+                name = _relative(path)
+                resume = stage.resumable and manifest["pending"].get(name) == key
+                if not resume or force:
+                    _remove_artifact(path)
+                manifest["outputs"].pop(name, None)
+                manifest["pending"][name] = key
+    if status is not None:
+        if verbose:
+            print(f"{stage.name}: {status}")
+        return status
+
+    # The lock is released while the stage runs, so that independent stages
+    # can be built concurrently
+    start = time.perf_counter()
+    stage.func()
+    if verbose:
+        print(f"{stage.name}: built in {time.perf_counter() - start:.1f}s")
+    with _manifest_lock() as manifest:
+        _store(stage, key, manifest)
+        evict(max_bytes, manifest)
+    return "built"
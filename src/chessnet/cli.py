@@ -0,0 +1,102 @@
+import argparse
+import sys
+from typing import List, Optional
+
+from chessnet.utils import Database, get_databases, resolve_database
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="chessnet", description="Build the chess network artifacts"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Bring pipeline stages up to date")
+    run.add_argument(
+        "targets",
+        nargs="*",
+        help="Stages to build, with their dependencies, e.g. 'rich_club' or "
+        "'OM_OTB_201609/communities' (default: every stage)",
+    )
+    run.add_argument(
+        "--databases",
+        nargs="+",
+        default=["OTB", "Portal"],
+        help="Registered database names, or the OTB/Portal aliases",
+    )
+    run.add_argument("--workers", type=int, default=1, help="Process budget")
+    run.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    run.add_argument("--parser", choices=["chess", "scanner"], default="chess")
+    run.add_argument("--min-elo", type=int, default=500)
+    run.add_argument("--max-elo", type=int, default=4000)
+    run.add_argument("--nswap-frac", type=float, default=10.0)
+    run.add_argument("--seed", type=int, default=None)
+    run.add_argument("--samples", type=int, default=30)
+    run.add_argument(
+        "--exact", action="store_true", help="Use every distinct degree/Elo value"
+    )
+    run.add_argument("--min-res", type=float, default=0.1)
+    run.add_argument("--max-res", type=float, default=100)
+    run.add_argument("--community-samples", type=int, default=100)
+    run.add_argument("--force", action="store_true", help="Rebuild fresh stages")
+    run.add_argument("--max-cache-gb", type=float, default=50)
+    run.add_argument(
+        "--metrics",
+        default=None,
+        help="Write metrics to this .jsonl file (events) or .prom file "
+        "(Prometheus textfile)",
+    )
+    run.add_argument(
+        "--profile-dir", default=None, help="Dump a cProfile of every stage here"
+    )
+
+    subparsers.add_parser("list", help="Show the registered databases and stages")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = get_parser().parse_args(argv)
+
+    from chessnet import metrics
+    from chessnet.pipeline import format_reports, get_stages, run_pipeline
+
+    if args.command == "list":
+        for database, config in get_databases().items():
+            print(database, config)
+        print()
+        for stage in get_stages(Database.OTB):
+            print(stage.name.split("/", 1)[-1], "<-", [p.name for p in stage.inputs])
+        return
+
+    if args.metrics or args.profile_dir:
+        metrics.configure(args.metrics, args.profile_dir)
+    stages = []
+    for database in args.databases:
+        stages += get_stages(
+            resolve_database(database),
+            output_format=args.format,
+            parser=args.parser,
+            workers=args.workers,
+            min_elo=args.min_elo,
+            max_elo=args.max_elo,
+            nswap_ecount_times=args.nswap_frac,
+            seed=args.seed,
+            samples=None if args.exact else args.samples,
+            min_res=args.min_res,
+            max_res=args.max_res,
+            community_samples=args.community_samples,
+        )
+    reports = run_pipeline(
+        stages,
+        targets=args.targets or None,
+        workers=args.workers,
+        force=args.force,
+        max_bytes=int(args.max_cache_gb * 2**30),
+    )
+    print(format_reports(reports))
+    if any(report["status"] == "failed" for report in reports):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,407 @@
-from pathlib import Path
-from functools import partial
+from __future__ import annotations
+
+import fcntl
+import os
 import pickle
-from typing import Dict, Callable, List
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-from cdlib.algorithms import leiden, label_propagation, louvain
+
+from chessnet import metrics
 from chessnet.graphs import read_pickle
 from chessnet.utils import ARTIFACTS_DIR, Database
 
+if TYPE_CHECKING:
+    from cdlib import NodeClustering
+    from scipy.sparse import csr_matrix
 
-def get_algorithms(
+
+def get_louvain_resolutions(
     min_res: float = 0.1, max_res: float = 10, samples: int = 10
+) -> np.ndarray:
+    return np.logspace(np.log10(min_res), np.log10(max_res), samples)
+
+
+# Warm-started Louvain partitions are stored apart from the cold-started ones
+WARM_LOUVAIN_PREFIX = "louvain_warm_"
+
+
+def get_louvain_name(resolution: float, warm_start: bool = False) -> str:
+    prefix = WARM_LOUVAIN_PREFIX if warm_start else "louvain_"
+    return f"{prefix}{resolution:.4f}"
+
+
+def get_algorithm_names(
+    min_res: float = 0.1,
+    max_res: float = 10,
+    samples: int = 10,
+    warm_start: bool = False,
+) -> List[str]:
+    louvain_resolutions = get_louvain_resolutions(min_res, max_res, samples)
+    return ["leiden", "label_propagation"] + [
+        get_louvain_name(resolution, warm_start) for resolution in louvain_resolutions
+    ]
+
+
+def get_algorithms(
+    min_res: float = 0.1,
+    max_res: float = 10,
+    samples: int = 10,
+    warm_start: bool = False,
 ) -> Dict[str, Callable]:
+    from cdlib.algorithms import label_propagation, leiden, louvain
+
     algorithms: Dict[str, Callable] = {
         "leiden": leiden,
         "label_propagation": label_propagation,
     }
-    louvain_resolutions = np.logspace(np.log10(min_res), np.log10(max_res), samples)
+    louvain_resolutions = get_louvain_resolutions(min_res, max_res, samples)
     for resolution in louvain_resolutions:
-        algorithms[f"louvain_{resolution:.4f}"] = partial(
+        algorithms[get_louvain_name(resolution, warm_start)] = partial(
             louvain, resolution=resolution
         )
     return algorithms
 
 
+_community_graphs: Dict[Tuple[str, str], Any] = {}
+
+
+def _get_community_graph(database: str, package: str = "igraph"):
+    # Each worker process reads (and converts) a graph once and reuses it for
+    # every job of that database
+    key = (database, package)
+    if key not in _community_graphs:
+        g = read_pickle(database)
+        if package == "networkx":
+            import networkx as nx
+            from cdlib.utils import convert_graph_formats
+
+            g = convert_graph_formats(g, nx.Graph)
+        _community_graphs[key] = g
+    return _community_graphs[key]
+
+
+def get_membership_filename(database: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_memberships.int32"
+
+
+def get_membership_metadata_filename(database: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_memberships.csv"
+
+
+MEMBERSHIP_COLUMNS = [
+    "name",
+    "algorithm",
+    "resolution",
+    "modularity",
+    "runtime",
+    "vertices",
+    "row",
+]
+
+
+def read_membership_metadata(database: str) -> pd.DataFrame:
+    filename = get_membership_metadata_filename(database)
+    if not filename.is_file():
+        return pd.DataFrame(columns=MEMBERSHIP_COLUMNS)
+    return pd.read_csv(filename)
+
+
+def read_memberships(database: str) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Return the partition metadata (indexed by name) and a read-only memmap.
+
+    Row `metadata.loc[name, "row"]` of the array is the community of every
+    vertex of the graph, in vertex order, with -1 for unassigned vertices.
+    """
+    metadata = read_membership_metadata(database).set_index("name")
+    if metadata.empty:
+        return metadata, np.empty((0, 0), dtype=np.int32)
+    shape = (int(metadata["row"].max()) + 1, int(metadata["vertices"].iloc[0]))
+    memberships = np.memmap(
+        get_membership_filename(database), dtype=np.int32, mode="r", shape=shape
+    )
+    return metadata, memberships
+
+
+@contextmanager
+def _membership_lock(database: str) -> Iterator[None]:
+    with open(ARTIFACTS_DIR / f".{database}_memberships.lock", "w") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def append_membership(
+    database: str,
+    name: str,
+    membership: np.ndarray,
+    algorithm: str = "",
+    resolution: float = np.nan,
+    modularity: float = np.nan,
+    runtime: float = np.nan,
+) -> None:
+    """Add a partition to the membership store of a database.
+
+    The membership row is written first and the metadata is then replaced
+    atomically, so an interrupted write leaves the store unchanged. Worker
+    processes may append concurrently. A partition with the same name is
+    replaced by rewriting its row in place, so the store does not grow (an
+    interrupted overwrite leaves that row partly written).
+    """
+    membership = np.asarray(membership, dtype=np.int32)
+    with _membership_lock(database):
+        metadata = read_membership_metadata(database)
+        if len(metadata) and metadata["vertices"].iloc[0] != len(membership):
+            raise ValueError(
+                f"Membership of length {len(membership)} does not match the "
+                f"{metadata['vertices'].iloc[0]} vertices of the stored partitions"
+            )
+        n_rows = int(metadata["row"].max()) + 1 if len(metadata) else 0
+        existing = metadata.loc[metadata["name"] == name, "row"]
+        row = int(existing.iloc[0]) if len(existing) else n_rows
+        filename = get_membership_filename(database)
+        with open(filename, "r+b" if filename.is_file() else "wb") as file:
+            file.seek(row * membership.nbytes)
+            file.write(membership.tobytes())
+            # Rows past the last one referenced were left by interrupted writes
+            file.truncate(max(n_rows, row + 1) * membership.nbytes)
+        entry = pd.DataFrame(
+            [[name, algorithm, resolution, modularity, runtime, len(membership), row]],
+            columns=MEMBERSHIP_COLUMNS,
+        )
+        metadata = metadata[metadata["name"] != name]
+        metadata = pd.concat([metadata, entry]) if len(metadata) else entry
+        metadata_filename = get_membership_metadata_filename(database)
+        tmp_filename = metadata_filename.with_suffix(".csv.tmp")
+        metadata.to_csv(tmp_filename, index=False)
+        os.replace(tmp_filename, metadata_filename)
+
+
+def communities_to_membership(
+    communities: List[List[Any]], vertex_names: List[Any]
+) -> np.ndarray:
+    index = {name: i for i, name in enumerate(vertex_names)}
+    membership = np.full(len(vertex_names), -1, dtype=np.int32)
+    for label, community in enumerate(communities):
+        membership[[index[name] for name in community]] = label
+    return membership
+
+
+def membership_to_communities(
+    membership: np.ndarray, vertex_names: List[Any]
+) -> List[List[Any]]:
+    membership = np.asarray(membership)
+    order = np.argsort(membership, kind="stable")
+    labels = membership[order]
+    order, labels = order[labels >= 0], labels[labels >= 0]
+    splits = np.flatnonzero(np.diff(labels)) + 1
+    names = np.asarray(vertex_names, dtype=object)
+    return [list(names[vertices]) for vertices in np.split(order, splits)]
+
+
+class LazyCommunities(Mapping):
+    """Read-only mapping from algorithm names to cdlib `NodeClustering` objects.
+
+    Partitions are read from the membership store, and a `NodeClustering` is
+    only built when accessed. Pickles written by earlier versions are used for
+    names missing from the store.
+    """
+
+    def __init__(self, database: str, names: List[str]):
+        self.database = database
+        self.metadata, self.memberships = read_memberships(database)
+        self.names = [
+            name
+            for name in names
+            if name in self.metadata.index
+            or get_community_filename(database, name).is_file()
+        ]
+        self._graph = None
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = read_pickle(self.database)
+        return self._graph
+
+    def membership(self, name: str) -> np.ndarray:
+        if name in self.metadata.index:
+            return np.asarray(self.memberships[self.metadata.loc[name, "row"]])
+        return communities_to_membership(self[name].communities, self.graph.vs["name"])
+
+    def __getitem__(self, name: str) -> NodeClustering:
+        from cdlib import NodeClustering
+
+        if name not in self.names:
+            raise KeyError(name)
+        if name not in self.metadata.index:
+            with open(get_community_filename(self.database, name), "rb") as file:
+                return pickle.load(file)
+        entry = self.metadata.loc[name]
+        communities = membership_to_communities(
+            self.memberships[entry["row"]], self.graph.vs["name"]
+        )
+        return NodeClustering(
+            communities,
+            self.graph,
+            method_name=entry["algorithm"],
+            method_parameters={"resolution": entry["resolution"]},
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def _run_community_job(
+    database: str,
+    names: List[str],
+    algorithms: Dict[str, Callable],
+    overwrite: bool = False,
+    warm_start: bool = False,
+    verbose: bool = False,
+) -> List[str]:
+    """Run algorithms in order, optionally seeding Louvain with the last result.
+
+    The seed only lets python-louvain move vertices and merge communities, so
+    seeded runs must go from finer to coarser partitions, and their results are
+    close to, but not the same as, those of cold starts.
+    """
+    from cdlib import NodeClustering
+
+    stored = read_membership_metadata(database)["name"].tolist()
+    vertex_names = _get_community_graph(database).vs["name"]
+    computed = []
+    previous: Optional[np.ndarray] = None
+    for name in names:
+        if name in stored and not overwrite:
+            if warm_start:
+                metadata, memberships = read_memberships(database)
+                previous = np.array(memberships[metadata.loc[name, "row"]])
+            continue
+        if verbose:
+            print(database, name)
+        kwargs = {}
+        if name.startswith("louvain"):
+            # cdlib converts to networkx on every call otherwise
+            g = _get_community_graph(database, "networkx")
+            if warm_start and previous is not None:
+                kwargs["partition"] = NodeClustering(
+                    membership_to_communities(previous, vertex_names), g
+                )
+        else:
+            g = _get_community_graph(database)
+        func = algorithms[name]
+        start = time.perf_counter()
+        comms = func(g, **kwargs)
+        runtime = time.perf_counter() - start
+        membership = communities_to_membership(comms.communities, vertex_names)
+        modularity = np.nan
+        if (membership >= 0).all():
+            modularity = _get_community_graph(database).modularity(membership)
+        append_membership(
+            database,
+            name,
+            membership,
+            algorithm=comms.method_name,
+            resolution=getattr(func, "keywords", {}).get("resolution", np.nan),
+            modularity=modularity,
+            runtime=runtime,
+        )
+        metrics.count("community_partitions", algorithm=comms.method_name)
+        metrics.count("community_seconds", runtime, algorithm=comms.method_name)
+        previous = membership
+        computed.append(name)
+    # Pool workers exit without running atexit handlers
+    metrics.flush()
+    return computed
+
+
+def get_community_jobs(
+    database: str,
+    min_res: float = 0.1,
+    max_res: float = 10,
+    samples: int = 10,
+    chains: int = 1,
+    warm_start: bool = False,
+) -> List[Tuple[str, List[str]]]:
+    """Split the algorithms of a database into independent jobs.
+
+    Without warm starts every algorithm is a job. With warm starts the Louvain
+    resolutions are split into `chains` contiguous runs of decreasing resolution
+    (python-louvain finds fewer, larger communities at lower resolutions), where
+    each partition seeds the one of the next resolution and the first one starts
+    cold. Warm-started partitions are stored under their own names (see
+    `get_louvain_name`), as they are not equivalent to cold-started ones.
+    """
+    names = get_algorithm_names(min_res, max_res, samples, warm_start)
+    other_names = [name for name in names if not name.startswith("louvain")]
+    louvain_names = [name for name in names if name.startswith("louvain")]
+    if not warm_start:
+        return [(database, [name]) for name in other_names + louvain_names]
+    louvain_chains = np.array_split(louvain_names[::-1], max(chains, 1))
+    return [(database, [name]) for name in other_names] + [
+        (database, chain.tolist()) for chain in louvain_chains if len(chain)
+    ]
+
+
+def schedule_communities(
+    databases: List[str],
+    min_res: float = 0.1,
+    max_res: float = 10,
+    samples: int = 10,
+    overwrite: bool = False,
+    workers: int = 1,
+    warm_start: bool = False,
+    verbose: bool = False,
+) -> List[str]:
+    """Compute the communities of several databases on a process pool.
+
+    Every partition is added to the membership store as soon as it is found, so
+    an interrupted sweep resumes where it stopped unless `overwrite` is set.
+    With `warm_start`, Louvain partitions are seeded as `get_community_jobs`
+    describes and stored apart from the cold-started ones.
+    """
+    algorithms = get_algorithms(min_res, max_res, samples, warm_start)
+    jobs = []
+    for database in databases:
+        jobs += get_community_jobs(
+            database,
+            min_res=min_res,
+            max_res=max_res,
+            samples=samples,
+            chains=workers,
+            warm_start=warm_start,
+        )
+    run_job = partial(
+        _run_community_job,
+        algorithms=algorithms,
+        overwrite=overwrite,
+        warm_start=warm_start,
+        verbose=verbose,
+    )
+    computed = []
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as executor:
+        mapper = executor.map if workers > 1 else map
+        results = mapper(run_job, *zip(*jobs))
+        for done, ((database, _), names) in enumerate(zip(jobs, results), 1):
+            computed += names
+            metrics.count("community_jobs_completed", database=database)
+            metrics.gauge("community_jobs_pending", len(jobs) - done)
+    return computed
+
+
 def compute_communities(
     database: str,
     min_res: float = 0.1,
@@ -32,17 +409,19 @@ def compute_communities(
     samples: int = 10,
     overwrite: bool = False,
     verbose: bool = False,
+    workers: int = 1,
+    warm_start: bool = False,
 ):
-    g = read_pickle(database)
-    algorithms = get_algorithms(min_res=min_res, max_res=max_res, samples=samples)
-    for name, func in algorithms.items():
-        if verbose:
-            print(database, name)
-        filename = get_community_filename(database, name)
-        if filename.is_file() and not overwrite:
-            continue
-        comms = func(g)
-        pickle.dump(comms, open(filename, "wb"))
+    schedule_communities(
+        [database],
+        min_res=min_res,
+        max_res=max_res,
+        samples=samples,
+        overwrite=overwrite,
+        workers=workers,
+        warm_start=warm_start,
+        verbose=verbose,
+    )
 
 
 def load_communities(
@@ -51,18 +430,12 @@ def load_communities(
     max_res: float = 10,
     samples: int = 10,
     verbose: bool = False,
-):
-    algorithm_names = get_algorithms(
-        min_res=min_res, max_res=max_res, samples=samples
-    ).keys()
-    communities = {}
-    for name in algorithm_names:
-        if verbose:
-            print(name)
-        filename = get_community_filename(database, name)
-        if not filename.is_file():
-            continue
-        communities[name] = pickle.load(open(filename, "rb"))
+    warm_start: bool = False,
+) -> LazyCommunities:
+    algorithm_names = get_algorithm_names(min_res, max_res, samples, warm_start)
+    communities = LazyCommunities(database, list(algorithm_names))
+    if verbose:
+        print(f"{len(communities)}/{len(algorithm_names)} partitions available")
     return communities
 
 
@@ -81,38 +454,321 @@ def get_louvain_files(database: str, suffix: str) -> List[Path]:
     return lst
 
 
-def write_louvain_q_values(database):
-    modularity_file = ARTIFACTS_DIR / f"{database}_louvain_modularities.csv"
-    if modularity_file.is_file():
-        df = pd.read_csv(modularity_file)
-    else:
-        df = pd.DataFrame(columns=["resolution", "q"])
+def get_adjacency(g, weight: Optional[str] = None) -> csr_matrix:
+    """Symmetric sparse adjacency matrix of an undirected igraph graph."""
+    from scipy.sparse import coo_matrix
 
-    files = get_louvain_files(database, ".pickle")
-    for filename in files:
-        resolution = float(filename.stem.split("_")[-1])
-        if resolution in df.resolution:
-            continue
-        comms = pickle.load(open(filename, "rb"))
-        q = comms.newman_girvan_modularity().score
-        df = df.append({"resolution": resolution, "q": q}, ignore_index=True)
-    df.sort_values(by="resolution").to_csv(modularity_file)
+    edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weight is None else np.array(g.es[weight], float)
+    n = g.vcount()
+    rows = np.concatenate([edges[:, 0], edges[:, 1]])
+    cols = np.concatenate([edges[:, 1], edges[:, 0]])
+    return coo_matrix((np.tile(weights, 2), (rows, cols)), shape=(n, n)).tocsr()
 
 
-if __name__ == "__main__":
+def batch_modularity(
+    adjacency: csr_matrix,
+    memberships: np.ndarray,
+    resolution: Any = 1.0,
+    chunk_size: int = 2**26,
+) -> np.ndarray:
+    """Modularity of every row of `memberships` on the same graph.
 
-    min_res = 0.1
-    max_res = 100
-    samples = 100
-    overwrite = False
-    verbose = True
+    Q = sum_c [w_c / (2m) - resolution * (d_c / (2m))^2], with w_c the weight
+    of the links within community c (each counted from both ends), d_c its
+    total degree and m the total edge weight, as in `ig.Graph.modularity`.
+    `resolution` may be a scalar or one value per partition. Vertices labelled
+    -1 are treated as singletons.
+    """
+    memberships = np.atleast_2d(memberships)
+    k, n = memberships.shape
+    resolution = np.broadcast_to(np.asarray(resolution, dtype=float), (k,))
+    adjacency = adjacency.tocoo()
+    rows, cols, weights = adjacency.row, adjacency.col, adjacency.data
+    two_m = weights.sum()
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    vertices = np.arange(n)
 
-    for database in [Database.OTB, Database.Portal]:
-        compute_communities(
-            database,
-            min_res=min_res,
-            max_res=max_res,
-            samples=samples,
-            overwrite=overwrite,
-            verbose=verbose,
+    q = np.empty(k)
+    step = max(1, chunk_size // max(len(weights), n, 1))
+    for start in range(0, k, step):
+        end = min(start + step, k)
+        labels = np.asarray(memberships[start:end])
+        if labels.max(initial=-1) >= n:
+            raise ValueError(f"Community labels must be in [-1, {n})")
+        labels = np.where(labels >= 0, labels, n + vertices)
+        internal = (labels[:, rows] == labels[:, cols]) @ weights
+        # Community degrees of all partitions in one bincount, with the labels
+        # of partition i shifted to [2 n i, 2 n (i + 1))
+        shifted = labels + 2 * n * np.arange(end - start)[:, None]
+        community_degree = np.bincount(
+            shifted.ravel(),
+            weights=np.tile(degree, end - start),
+            minlength=2 * n * (end - start),
+        ).reshape(end - start, 2 * n)
+        expected = (community_degree**2).sum(axis=1)
+        q[start:end] = internal / two_m - resolution[start:end] * expected / two_m**2
+    return q
+
+
+def get_modularity_filename(database: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_louvain_modularities.csv"
+
+
+def write_louvain_q_values(
+    database: str, weight: Optional[str] = None, overwrite: bool = False
+) -> pd.DataFrame:
+    """Update the table of Louvain modularities with the missing resolutions.
+
+    `q` is the modularity at resolution 1. Partitions come from the membership
+    store, and from the legacy pickles of earlier sweeps. Warm-started
+    partitions are left out.
+    """
+    modularity_file = get_modularity_filename(database)
+    df = pd.DataFrame(columns=["resolution", "q"])
+    if modularity_file.is_file() and not overwrite:
+        df = pd.read_csv(modularity_file)[["resolution", "q"]]
+
+    metadata = read_membership_metadata(database)
+    names = [
+        name
+        for name in metadata["name"]
+        if name.startswith("louvain") and not name.startswith(WARM_LOUVAIN_PREFIX)
+    ]
+    names += [
+        "louvain_" + filename.stem.split("_louvain_")[-1]
+        for filename in get_louvain_files(database, ".pickle")
+    ]
+    names = [
+        name
+        for name in dict.fromkeys(names)
+        if round(float(name.split("_")[-1]), 4) not in df["resolution"].round(4).values
+    ]
+    if not names:
+        return df
+
+    communities = LazyCommunities(database, names)
+    memberships = np.array([communities.membership(name) for name in names])
+    q = batch_modularity(get_adjacency(communities.graph, weight), memberships)
+    new_df = pd.DataFrame(
+        {"resolution": [float(name.split("_")[-1]) for name in names], "q": q}
+    )
+    df = pd.concat([df, new_df]) if len(df) else new_df
+    df = df.sort_values(by="resolution").reset_index(drop=True)
+    tmp_filename = modularity_file.with_suffix(".csv.tmp")
+    df.to_csv(tmp_filename, index=False)
+    os.replace(tmp_filename, modularity_file)
+    return df
+
+
+def _compact_labels(membership: np.ndarray) -> np.ndarray:
+    # Unassigned vertices (-1) are compared as singletons
+    membership = np.asarray(membership)
+    n = len(membership)
+    labels = np.where(membership >= 0, membership, n + np.arange(n))
+    return np.unique(labels, return_inverse=True)[1].astype(np.int64)
+
+
+def _entropy(sizes: np.ndarray, n: int) -> float:
+    p = sizes / n
+    return float(-(p * np.log(p)).sum())
+
+
+def _expected_mutual_information(
+    sizes_a: np.ndarray, sizes_b: np.ndarray, n: int
+) -> float:
+    """Expected mutual information of two partitions under the permutation model.
+
+    This is the sum computed by scikit-learn for `adjusted_mutual_info_score`,
+    over the distinct cluster sizes of each partition weighted by how many
+    clusters have them, since many clusters share a size.
+    """
+    from scipy.special import gammaln
+
+    values_a, mult_a = np.unique(sizes_a, return_counts=True)
+    values_b, mult_b = np.unique(sizes_b, return_counts=True)
+    log_n = np.log(n)
+    emi = 0.0
+    for a, m_a in zip(values_a.astype(np.int64), mult_a):
+        # Every possible overlap n_ij of a cluster of size a and one of size b
+        lo = np.maximum(1, a + values_b - n)
+        hi = np.minimum(a, values_b)
+        lengths = np.maximum(hi - lo + 1, 0)
+        b = np.repeat(values_b, lengths).astype(float)
+        weights = np.repeat(mult_b, lengths)
+        offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        n_ij = (np.arange(lengths.sum()) - offsets + np.repeat(lo, lengths)).astype(
+            float
+        )
+        log_p = (
+            gammaln(a + 1)
+            + gammaln(b + 1)
+            + gammaln(n - a + 1)
+            + gammaln(n - b + 1)
+            - gammaln(n + 1)
+            - gammaln(n_ij + 1)
+            - gammaln(a - n_ij + 1)
+            - gammaln(b - n_ij + 1)
+            - gammaln(n - a - b + n_ij + 1)
         )
+        term = n_ij / n * (log_n + np.log(n_ij) - np.log(a) - np.log(b))
+        emi += m_a * float((weights * term * np.exp(log_p)).sum())
+    return emi
+
+
+_similarity_partitions: List[Tuple[np.ndarray, np.ndarray, float]] = []
+
+
+def _init_similarity_worker(memberships: np.ndarray) -> None:
+    global _similarity_partitions
+    _similarity_partitions = []
+    for membership in memberships:
+        labels = _compact_labels(membership)
+        sizes = np.bincount(labels)
+        _similarity_partitions.append((labels, sizes, _entropy(sizes, len(labels))))
+
+
+def _partition_similarity_row(i: int) -> List[Tuple[int, int, float, float, float]]:
+    """AMI, NMI and ARI of partition i against every later partition.
+
+    The scores follow scikit-learn's definitions (arithmetic normalization),
+    but share one sparse contingency table per pair and reuse the cluster
+    sizes and entropies of every partition.
+    """
+    from scipy.sparse import coo_matrix
+
+    eps = np.finfo("float64").eps
+    labels_a, sizes_a, h_a = _similarity_partitions[i]
+    n = len(labels_a)
+    rows = []
+    for j in range(i + 1, len(_similarity_partitions)):
+        labels_b, sizes_b, h_b = _similarity_partitions[j]
+        contingency = coo_matrix(
+            (np.ones(n, dtype=np.int64), (labels_a, labels_b)),
+            shape=(len(sizes_a), len(sizes_b)),
+        ).tocsr()
+        contingency.sum_duplicates()
+        coo = contingency.tocoo()
+        n_ij = coo.data.astype(float)
+        outer = sizes_a[coo.row].astype(float) * sizes_b[coo.col]
+        mi = max(float((n_ij / n * (np.log(n * n_ij) - np.log(outer))).sum()), 0.0)
+        normalizer = (h_a + h_b) / 2
+
+        if len(sizes_a) == len(sizes_b) == 1:
+            ami = nmi = 1.0
+        else:
+            nmi = 0.0 if mi == 0 else mi / normalizer
+            if len(sizes_a) == 1 or len(sizes_b) == 1:
+                ami = 0.0
+            else:
+                emi = _expected_mutual_information(sizes_a, sizes_b, n)
+                denominator = normalizer - emi
+                numerator = mi - emi
+                denominator = np.copysign(max(abs(denominator), eps), denominator)
+                numerator = np.copysign(max(abs(numerator), eps), numerator)
+                ami = float(numerator / denominator)
+
+        sum_squares = int((coo.data.astype(np.int64) ** 2).sum())
+        fp = int((sizes_b.astype(np.int64) ** 2).sum()) - sum_squares
+        fn = int((sizes_a.astype(np.int64) ** 2).sum()) - sum_squares
+        tp = sum_squares - n
+        tn = n * n - fp - fn - sum_squares
+        if fn == 0 and fp == 0:
+            ari = 1.0
+        else:
+            ari = (
+                2.0
+                * (tp * tn - fn * fp)
+                / ((tp + fn) * (fn + tn) + (tp + fp) * (fp + tn))
+            )
+        rows.append((i, j, ami, nmi, ari))
+    return rows
+
+
+def compute_partition_similarity(
+    database: str, names: Optional[List[str]] = None, workers: int = 1
+) -> pd.DataFrame:
+    """AMI, NMI and ARI between every pair of stored partitions of a database."""
+    if names is None:
+        names = read_membership_metadata(database)["name"].tolist()
+    communities = LazyCommunities(database, names)
+    names = list(communities)
+    partitions = np.array([communities.membership(name) for name in names])
+
+    rows = []
+    with ProcessPoolExecutor(
+        max_workers=max(workers, 1),
+        initializer=_init_similarity_worker,
+        initargs=(partitions,),
+    ) as executor:
+        if workers > 1:
+            results = executor.map(_partition_similarity_row, range(len(names)))
+        else:
+            _init_similarity_worker(partitions)
+            results = map(_partition_similarity_row, range(len(names)))
+        for result in results:
+            rows += result
+    df = pd.DataFrame(rows, columns=["a", "b", "ami", "nmi", "ari"])
+    df["a"] = [names[i] for i in df["a"]]
+    df["b"] = [names[j] for j in df["b"]]
+    return df
+
+
+def get_partition_similarity_filename(database: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_partition_similarity.csv"
+
+
+def write_partition_similarity(database: str, workers: int = 1) -> None:
+    df = compute_partition_similarity(database, workers=workers)
+    df.to_csv(get_partition_similarity_filename(database), index=False)
+
+
+def read_partition_similarity(database: str, metric: str = "ami") -> pd.DataFrame:
+    """Square, symmetric matrix of a similarity metric between partitions."""
+    df = pd.read_csv(get_partition_similarity_filename(database))
+    names = list(dict.fromkeys(df["a"].tolist() + df["b"].tolist()))
+    matrix = df.pivot(index="a", columns="b", values=metric)
+    matrix = matrix.reindex(index=names, columns=names)
+    matrix = matrix.fillna(matrix.T)
+    for name in names:
+        matrix.loc[name, name] = 1.0
+    return matrix
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-res", type=float, default=0.1)
+    parser.add_argument("--max-res", type=float, default=100)
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--overwrite", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help=(
+            "Seed each Louvain resolution with the partition of the next higher "
+            "one. Faster, but the results differ from cold starts and are "
+            "stored as louvain_warm_<resolution>"
+        ),
+    )
+    parser.add_argument(
+        "--similarity", action="store_true", help="Compare all pairs of partitions"
+    )
+    args = parser.parse_args()
+
+    schedule_communities(
+        [Database.OTB, Database.Portal],
+        min_res=args.min_res,
+        max_res=args.max_res,
+        samples=args.samples,
+        overwrite=args.overwrite,
+        workers=args.workers,
+        warm_start=args.warm_start,
+        verbose=True,
+    )
+    if args.similarity:
+        for database in [Database.OTB, Database.Portal]:
+            write_partition_similarity(database, workers=args.workers)
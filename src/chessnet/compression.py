@@ -0,0 +1,169 @@
+import bz2
+import gzip
+import io
+import lzma
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional, Union
+
+BUFFER_SIZE = 16 * 2**20
+COMPRESSED_SUFFIXES = [".gz", ".bgz", ".bz2", ".xz", ".zst"]
+
+ZSTD_MAGIC = 0xFD2FB528
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+
+
+def is_compressed(filename: Union[Path, str]) -> bool:
+    return Path(filename).suffix in COMPRESSED_SUFFIXES
+
+
+def strip_compression_suffix(filename: Union[Path, str]) -> Path:
+    filename = Path(filename)
+    return filename.with_suffix("") if is_compressed(filename) else filename
+
+
+class _IteratorReader(io.RawIOBase):
+    def __init__(self, blocks: Iterator[bytes], file: Optional[BinaryIO] = None):
+        self.blocks = blocks
+        self.file = file
+        self.buffer = b""
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+        super().close()
+
+    def readinto(self, b) -> int:
+        while not self.buffer:
+            self.buffer = next(self.blocks, b"")
+            if not self.buffer:
+                return 0
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        self.position += n
+        return n
+
+
+def _iter_bgzf_blocks(file: BinaryIO) -> Iterator[bytes]:
+    while True:
+        header = file.read(18)
+        if not header:
+            return
+        if len(header) < 18 or header[12:14] != b"BC":
+            raise ValueError("Not a BGZF block")
+        block_size = struct.unpack("<H", header[16:18])[0] + 1
+        yield header + file.read(block_size - 18)
+
+
+def _iter_zstd_frames(file: BinaryIO) -> Iterator[bytes]:
+    while True:
+        magic_bytes = file.read(4)
+        if not magic_bytes:
+            return
+        magic = struct.unpack("<I", magic_bytes)[0]
+        if magic & 0xFFFFFFF0 == ZSTD_SKIPPABLE_MAGIC:
+            size = struct.unpack("<I", file.read(4))[0]
+            file.seek(size, io.SEEK_CUR)
+            continue
+        if magic != ZSTD_MAGIC:
+            raise ValueError("Not a zstd frame")
+        descriptor = file.read(1)
+        flags = descriptor[0]
+        single_segment = (flags >> 5) & 1
+        content_size_bytes = [single_segment, 2, 4, 8][flags >> 6]
+        dictionary_bytes = [0, 1, 2, 4][flags & 3]
+        header_size = (1 - single_segment) + dictionary_bytes + content_size_bytes
+        frame = [magic_bytes, descriptor, file.read(header_size)]
+        last_block = False
+        while not last_block:
+            block_header = file.read(3)
+            value = int.from_bytes(block_header, "little")
+            last_block = bool(value & 1)
+            block_type = (value >> 1) & 3
+            block_size = value >> 3
+            frame += [block_header, file.read(1 if block_type == 1 else block_size)]
+        if (flags >> 2) & 1:
+            frame.append(file.read(4))
+        yield b"".join(frame)
+
+
+def _decompress_zstd_frame(frame: bytes) -> bytes:
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompressobj().decompress(frame)
+
+
+def _decompress_gzip_block(block: bytes) -> bytes:
+    return zlib.decompress(block, wbits=zlib.MAX_WBITS | 16)
+
+
+def _decompress_parallel(
+    blocks: Iterator[bytes], decompress: Callable[[bytes], bytes], threads: int
+) -> Iterator[bytes]:
+    # zlib and zstandard release the GIL, so threads decompress concurrently.
+    # Only a bounded number of blocks is in flight to keep memory in check.
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending: deque = deque()
+        for block in blocks:
+            pending.append(executor.submit(decompress, block))
+            if len(pending) >= 4 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _is_bgzf(filename: Union[Path, str]) -> bool:
+    with open(filename, "rb") as file:
+        header = file.read(18)
+    return header[:4] == b"\x1f\x8b\x08\x04" and header[12:14] == b"BC"
+
+
+def open_binary(
+    filename: Union[Path, str], threads: int = 1, buffer_size: int = BUFFER_SIZE
+) -> BinaryIO:
+    """Open a (possibly compressed) file as a buffered stream of plain bytes.
+
+    The codec is picked from the file extension. BGZF and zstd files are made of
+    independent blocks/frames, which are decompressed by `threads` threads.
+    """
+    suffix = Path(filename).suffix
+    if suffix in [".gz", ".bgz"]:
+        if threads > 1 and _is_bgzf(filename):
+            file = open(filename, "rb", buffering=buffer_size)
+            blocks = _decompress_parallel(
+                _iter_bgzf_blocks(file), _decompress_gzip_block, threads
+            )
+            raw = _IteratorReader(blocks, file)
+        else:
+            raw = gzip.open(filename, "rb")
+    elif suffix == ".bz2":
+        raw = bz2.open(filename, "rb")
+    elif suffix == ".xz":
+        raw = lzma.open(filename, "rb")
+    elif suffix == ".zst":
+        import zstandard
+
+        file = open(filename, "rb", buffering=buffer_size)
+        if threads > 1:
+            blocks = _decompress_parallel(
+                _iter_zstd_frames(file), _decompress_zstd_frame, threads
+            )
+            raw = _IteratorReader(blocks, file)
+        else:
+            raw = zstandard.ZstdDecompressor().stream_reader(
+                file, read_size=buffer_size, read_across_frames=True, closefd=True
+            )
+    else:
+        return open(filename, "rb", buffering=buffer_size)
+    return io.BufferedReader(raw, buffer_size=buffer_size)
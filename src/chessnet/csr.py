@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from chessnet.graphs import read_pickle, read_rewired_graph
+from chessnet.utils import ARTIFACTS_DIR
+
+if TYPE_CHECKING:
+    import igraph as ig
+    import networkx as nx
+    from scipy.sparse import csr_matrix
+
+CSR_VERSION = 1
+VERTEX_COLUMNS = {"MeanElo": "float64", "StdElo": "float64", "PlayerId": "int32"}
+WEIGHT_ATTRIBUTE = "NUMBER_OF_GAMES"
+
+
+class CSRGraph:
+    """A player graph stored as memory-mapped CSR arrays.
+
+    `offsets`/`neighbors` (int32) hold the adjacency of every vertex, sorted by
+    neighbor, and `weights` the NUMBER_OF_GAMES of every entry. Undirected edges
+    are stored in both directions (self-loops once). Vertex attributes are
+    arrays indexed by vertex and names are decoded from a UTF-8 table on first
+    use. Opening a graph only maps the files, and pickling it (e.g. to send it
+    to worker processes) pickles the path, so workers share the same pages.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        self.path = Path(path)
+        with open(self.path / "meta.json", "r") as file:
+            self.meta = json.load(file)
+        if self.meta["version"] != CSR_VERSION:
+            raise ValueError(f"{self.path} has CSR version {self.meta['version']}")
+        self.directed: bool = self.meta["directed"]
+        self.offsets = self._map("offsets", np.int32)
+        self.neighbors = self._map("neighbors", np.int32)
+        self.weights = self._map("weights", np.float64)
+        self.name_offsets = self._map("name_offsets", np.int64)
+        self.columns = {
+            column: self._map(column, dtype)
+            for column, dtype in self.meta["vertex_columns"].items()
+        }
+        self._names: Optional[List[str]] = None
+
+    def __reduce__(self):
+        return (CSRGraph, (self.path,))
+
+    def _map(self, name: str, dtype) -> np.ndarray:
+        filename = self.path / f"{name}.bin"
+        if os.path.getsize(filename) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode="r")
+
+    def vcount(self) -> int:
+        return self.meta["vertices"]
+
+    def ecount(self) -> int:
+        return self.meta["edges"]
+
+    def degree(self) -> np.ndarray:
+        """Number of adjacency entries per vertex (out-degree if directed)."""
+        return np.diff(self.offsets)
+
+    def neighbors_of(self, vertex: int) -> np.ndarray:
+        start, end = self.offsets[vertex], self.offsets[vertex + 1]
+        return self.neighbors[start:end]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    @property
+    def names(self) -> List[str]:
+        if self._names is None:
+            with open(self.path / "names.bin", "rb") as file:
+                table = file.read()
+            offsets = self.name_offsets.tolist()
+            self._names = [
+                table[start:end].decode("utf-8")
+                for start, end in zip(offsets[:-1], offsets[1:])
+            ]
+        return self._names
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Source, target and weight of every edge, each undirected edge once."""
+        source = np.repeat(np.arange(self.vcount(), dtype=np.int32), self.degree())
+        target = np.asarray(self.neighbors)
+        weights = np.asarray(self.weights)
+        if not self.directed:
+            mask = source <= target
+            source, target, weights = source[mask], target[mask], weights[mask]
+        return source, target, weights
+
+    def to_scipy(self) -> csr_matrix:
+        """Weighted adjacency matrix, sharing the mapped arrays."""
+        from scipy.sparse import csr_matrix
+
+        n = self.vcount()
+        return csr_matrix((self.weights, self.neighbors, self.offsets), shape=(n, n))
+
+    def to_igraph(self) -> ig.Graph:
+        import igraph as ig
+
+        source, target, weights = self.edges()
+        return ig.Graph(
+            n=self.vcount(),
+            edges=np.column_stack([source, target]).tolist(),
+            directed=self.directed,
+            vertex_attrs={
+                "name": self.names,
+                **{column: values.tolist() for column, values in self.columns.items()},
+            },
+            edge_attrs={WEIGHT_ATTRIBUTE: weights.tolist()},
+        )
+
+    def to_networkx(self) -> Union[nx.Graph, nx.DiGraph]:
+        """A networkx graph with player names as nodes, like `csv_to_networkx`."""
+        import networkx as nx
+
+        g = nx.DiGraph() if self.directed else nx.Graph()
+        names = self.names
+        columns = {column: values.tolist() for column, values in self.columns.items()}
+        g.add_nodes_from(
+            (name, {column: values[i] for column, values in columns.items()})
+            for i, name in enumerate(names)
+        )
+        source, target, weights = self.edges()
+        g.add_edges_from(
+            (names[u], names[v], {WEIGHT_ATTRIBUTE: w})
+            for u, v, w in zip(source.tolist(), target.tolist(), weights.tolist())
+        )
+        return g
+
+
+def _write_array(dirname: Path, name: str, values: np.ndarray, dtype) -> None:
+    np.ascontiguousarray(values, dtype=dtype).tofile(dirname / f"{name}.bin")
+
+
+def write_csr(g: ig.Graph, path: Union[Path, str]) -> None:
+    """Write an igraph graph in the CSR format, replacing `path` atomically."""
+    path = Path(path)
+    n = g.vcount()
+    edges = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    if WEIGHT_ATTRIBUTE in g.es.attributes():
+        weights = np.array(g.es[WEIGHT_ATTRIBUTE], dtype=np.float64)
+    else:
+        weights = np.ones(len(edges))
+    source, target = edges[:, 0], edges[:, 1]
+    if not g.is_directed():
+        loops = source == target
+        source, target = (
+            np.concatenate([source, target[~loops]]),
+            np.concatenate([target, source[~loops]]),
+        )
+        weights = np.concatenate([weights, weights[~loops]])
+    if len(source) >= 2**31:
+        raise ValueError("The graph has too many edges for int32 CSR offsets")
+    order = np.lexsort((target, source))
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(source, minlength=n))])
+
+    names = [str(name).encode("utf-8") for name in g.vs["name"]] if n else []
+    name_offsets = np.concatenate([[0], np.cumsum([len(name) for name in names])])
+    columns: Dict[str, str] = {
+        column: dtype
+        for column, dtype in VERTEX_COLUMNS.items()
+        if column in g.vs.attributes()
+    }
+
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+    _write_array(tmp_path, "offsets", offsets, np.int32)
+    _write_array(tmp_path, "neighbors", target[order], np.int32)
+    _write_array(tmp_path, "weights", weights[order], np.float64)
+    _write_array(tmp_path, "name_offsets", name_offsets, np.int64)
+    with open(tmp_path / "names.bin", "wb") as file:
+        file.write(b"".join(names))
+    for column, dtype in columns.items():
+        _write_array(tmp_path, column, g.vs[column], dtype)
+    meta = {
+        "version": CSR_VERSION,
+        "vertices": n,
+        "edges": g.ecount(),
+        "directed": g.is_directed(),
+        "vertex_columns": columns,
+    }
+    with open(tmp_path / "meta.json", "w") as file:
+        json.dump(meta, file, indent=2)
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def get_csr_filename(
+    database: str, rewired: bool = False, nswap_ecount_times: float = 10.0
+) -> Path:
+    if rewired:
+        return ARTIFACTS_DIR / f"{database}_rewired_f{nswap_ecount_times}.csr"
+    return ARTIFACTS_DIR / f"{database}_undirected.csr"
+
+
+def write_csr_graph(
+    database: str, rewired: bool = False, nswap_ecount_times: float = 10.0
+) -> None:
+    g = (
+        read_rewired_graph(database, nswap_ecount_times=nswap_ecount_times)
+        if rewired
+        else read_pickle(database)
+    )
+    write_csr(g, get_csr_filename(database, rewired, nswap_ecount_times))
+
+
+def read_csr_graph(
+    database: str, rewired: bool = False, nswap_ecount_times: float = 10.0
+) -> CSRGraph:
+    return CSRGraph(get_csr_filename(database, rewired, nswap_ecount_times))
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csr-otb", action="store_true")
+    parser.add_argument("--csr-portal", action="store_true")
+    parser.add_argument("--rewired", action="store_true")
+    parser.add_argument("--nswap-frac", type=float, default=10)
+    args = parser.parse_args()
+
+    if args.csr_otb:
+        write_csr_graph("OM_OTB_201609", args.rewired, args.nswap_frac)
+
+    if args.csr_portal:
+        write_csr_graph("OM_Portal_201510", args.rewired, args.nswap_frac)
@@ -0,0 +1,202 @@
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from chessnet import metrics
+from chessnet.games import Filter, iter_player_games, read_games_columns
+from chessnet.utils import ARTIFACTS_DIR, get_database_config
+
+# Fibonacci hashing spreads the packed (White, Black) keys over the partitions
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def get_edge_filters(
+    database: str,
+    drop_missing_elo: bool = True,
+    min_elo: int = 500,
+    max_elo: int = 4000,
+) -> List[Filter]:
+    """Game filters of the edges: the database site and both Elo values in range."""
+    filters = []
+    site = get_database_config(database)["site"]
+    if site is not None and "Site" in read_games_columns(database):
+        filters.append(("Site", "==", site))
+    if drop_missing_elo:
+        filters += [
+            ("WhiteElo", ">=", min_elo),
+            ("WhiteElo", "<=", max_elo),
+            ("BlackElo", ">=", min_elo),
+            ("BlackElo", "<=", max_elo),
+        ]
+    return filters
+
+
+def _sum_by_key(
+    keys: np.ndarray, counts: np.ndarray, first: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sorted unique keys, the total count and the earliest first game of each."""
+    if len(keys) == 0:
+        return keys, counts, first
+    order = np.argsort(keys, kind="stable")
+    keys, counts, first = keys[order], counts[order], first[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return (
+        keys[starts],
+        np.add.reduceat(counts, starts),
+        np.minimum.reduceat(first, starts),
+    )
+
+
+class PairCounter:
+    """Game counts of (White, Black) player ID pairs, spilled to disk if needed.
+
+    Pairs are packed in one int64 key (White in the high 32 bits), counted per
+    chunk with the position of their first game, and buffered. When the buffer
+    holds more than `max_pairs` entries it is consolidated, and if it is still
+    more than half full it is appended to `partitions` spill files, split by a
+    hash of the key. Every pair then lands in a single file, so `edge_ids`
+    merges the files one at a time and memory stays around `max_pairs` entries
+    plus the distinct pairs of the result.
+    """
+
+    def __init__(
+        self,
+        max_pairs: int = 10_000_000,
+        partitions: int = 16,
+        spill_dir: Union[None, Path, str] = None,
+    ):
+        self.max_pairs = max_pairs
+        self.partitions = partitions
+        self.spill_dir = ARTIFACTS_DIR if spill_dir is None else Path(spill_dir)
+        self.spills = 0
+        self._keys: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+        self._first: List[np.ndarray] = []
+        self._buffered = 0
+        self._n_games = 0
+        self._tmp_dir: Optional[tempfile.TemporaryDirectory] = None
+
+    def __enter__(self) -> "PairCounter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Delete the spill files."""
+        if self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
+            self._tmp_dir = None
+
+    def add(self, white: np.ndarray, black: np.ndarray) -> None:
+        """Count one game per (white[i], black[i]), skipping negative IDs.
+
+        Chunks must be added in the order of the games.
+        """
+        white = np.asarray(white, dtype=np.int64)
+        black = np.asarray(black, dtype=np.int64)
+        rows = np.flatnonzero((white >= 0) & (black >= 0))
+        keys, index, counts = np.unique(
+            (white[rows] << 32) | black[rows], return_index=True, return_counts=True
+        )
+        self._keys.append(keys)
+        self._counts.append(counts.astype(np.int64))
+        self._first.append(rows[index].astype(np.int64) + self._n_games)
+        self._n_games += len(white)
+        self._buffered += len(keys)
+        if self._buffered > self.max_pairs:
+            keys, counts, first = self._consolidate()
+            if len(keys) > self.max_pairs // 2:
+                self._spill(keys, counts, first)
+            else:
+                self._keys, self._counts, self._first = [keys], [counts], [first]
+                self._buffered = len(keys)
+
+    def _consolidate(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        empty = [np.zeros(0, dtype=np.int64)]
+        result = _sum_by_key(
+            np.concatenate(self._keys or empty),
+            np.concatenate(self._counts or empty),
+            np.concatenate(self._first or empty),
+        )
+        self._keys, self._counts, self._first, self._buffered = [], [], [], 0
+        return result
+
+    def _partition_filename(self, partition: int) -> Path:
+        return Path(self._tmp_dir.name) / f"{partition}.bin"
+
+    def _spill(self, keys: np.ndarray, counts: np.ndarray, first: np.ndarray) -> None:
+        if self._tmp_dir is None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._tmp_dir = tempfile.TemporaryDirectory(
+                prefix=".pairs-", dir=self.spill_dir
+            )
+        hashes = (keys.view(np.uint64) * HASH_MULTIPLIER) >> np.uint64(32)
+        partition = (hashes % np.uint64(self.partitions)).astype(np.int64)
+        order = np.argsort(partition, kind="stable")
+        bounds = np.searchsorted(partition[order], np.arange(self.partitions + 1))
+        records = np.column_stack([keys, counts, first])[order]
+        for i in range(self.partitions):
+            with open(self._partition_filename(i), "ab") as file:
+                records[bounds[i] : bounds[i + 1]].tofile(file)
+        self.spills += 1
+        metrics.count("edge_pairs_spilled", len(keys))
+
+    def _merged(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._tmp_dir is None:
+            return self._consolidate()
+        if self._buffered:
+            self._spill(*self._consolidate())
+        merged = []
+        for i in range(self.partitions):
+            records = np.fromfile(self._partition_filename(i), dtype=np.int64)
+            records = records.reshape(-1, 3)
+            merged.append(_sum_by_key(records[:, 0], records[:, 1], records[:, 2]))
+        keys, counts, first = (np.concatenate(arrays) for arrays in zip(*merged))
+        return keys, counts, first
+
+    def edge_ids(self) -> pd.DataFrame:
+        """Directed edges by player ID, as `graphs.edge_ids_from_games` orders them.
+
+        Edges are sorted by decreasing number of games, then by their first game,
+        which is the order of `value_counts` on the games.
+        """
+        keys, counts, first = self._merged()
+        order = np.lexsort((first, -counts))
+        keys, counts = keys[order], counts[order]
+        return pd.DataFrame(
+            {
+                "WhiteId": (keys >> 32).astype(np.int32),
+                "BlackId": (keys & 0xFFFFFFFF).astype(np.int32),
+                "NUMBER_OF_GAMES": counts,
+            }
+        )
+
+
+def stream_edge_ids(
+    database: str,
+    drop_missing_elo: bool = True,
+    min_elo: int = 500,
+    max_elo: int = 4000,
+    chunk_rows: int = 1_000_000,
+    max_pairs: int = 10_000_000,
+    partitions: int = 16,
+    spill_dir: Union[None, Path, str] = None,
+) -> pd.DataFrame:
+    """The edge table of a database, reading its games `chunk_rows` at a time.
+
+    Filters are pushed down to the reader chunk by chunk, and pair counts are
+    spilled to `spill_dir` (default: the artifacts directory) as `PairCounter`
+    does, so memory does not grow with the number of games.
+    """
+    filters = get_edge_filters(database, drop_missing_elo, min_elo, max_elo)
+    chunks = iter_player_games(
+        database, ["WhiteId", "BlackId"], filters=filters, chunk_rows=chunk_rows
+    )
+    with PairCounter(max_pairs, partitions, spill_dir) as counter:
+        for df in chunks:
+            counter.add(df.WhiteId.to_numpy(), df.BlackId.to_numpy())
+        return counter.edge_ids()
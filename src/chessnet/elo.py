@@ -1,19 +1,38 @@
+from typing import Sequence, Union
+
+import numpy as np
+
+# Lower Elo bound of every category but the first, and the category names
+ELO_BINS = (1400, 1600, 1800, 2000, 2200, 2300, 2400, 2500)
+ELO_CATEGORIES = ("CD", "CC", "CB", "CA", "E", "CM", "FM", "IM", "IG")
+
+
+def elo_to_codes(
+    elo: Union[float, Sequence[float], np.ndarray], bins: Sequence[float] = ELO_BINS
+) -> np.ndarray:
+    """Category code of every Elo value: the number of `bins` at or below it.
+
+    Codes go from 0 (below the first bin, and missing Elo values) to
+    len(bins), and index the category names, e.g. `ELO_CATEGORIES`.
+    """
+    bins = np.asarray(bins, dtype=float)
+    if np.any(np.diff(bins) <= 0):
+        raise ValueError("Elo bins must be strictly increasing")
+    elo = np.asarray(elo, dtype=float)
+    codes = np.searchsorted(bins, elo, side="right")
+    return np.where(np.isnan(elo), 0, codes)
+
+
+def elo_to_categories(
+    elo: Union[Sequence[float], np.ndarray],
+    bins: Sequence[float] = ELO_BINS,
+    categories: Sequence[str] = ELO_CATEGORIES,
+) -> np.ndarray:
+    """Category name of every Elo value, as an object array."""
+    if len(categories) != len(bins) + 1:
+        raise ValueError("There must be one more category than Elo bins")
+    return np.asarray(categories, dtype=object)[elo_to_codes(elo, bins)]
+
+
 def elo_to_category(elo: float) -> str:
-    if elo >= 2500:
-        return "IG"
-    elif 2400 <= elo < 2500:
-        return "IM"
-    elif 2300 <= elo < 2400:
-        return "FM"
-    elif 2200 <= elo < 2300:
-        return "CM"
-    elif 2000 <= elo < 2200:
-        return "E"
-    elif 1800 <= elo < 2200:
-        return "CA"
-    elif 1600 <= elo < 1800:
-        return "CB"
-    elif 1400 <= elo < 1600:
-        return "CC"
-    else:
-        return "CD"
\ No newline at end of file
+    return ELO_CATEGORIES[int(elo_to_codes(elo))]
@@ -0,0 +1,248 @@
+import os
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from chessnet.players import encode_players, register_games
+from chessnet.utils import ARTIFACTS_DIR
+
+Filter = Tuple[str, str, Any]
+
+PLAYER_COLUMNS = ["White", "Black"]
+PLAYER_ID_COLUMNS = ["WhiteId", "BlackId"]
+INT16_COLUMNS = ["WhiteElo", "BlackElo", "PlyCount"]
+CATEGORY_COLUMNS = ["Result", "ECO", "Site"]
+DATE_FORMAT = "%Y.%m.%d"
+
+
+def parse_dates(dates: pd.Series) -> pd.Series:
+    """Parse PGN dates, reading partial ones as the start of their period.
+
+    "1995.??.??" is 1995-01-01 and "1995.06.??" is 1995-06-01. Dates without a
+    year, or that do not parse, are NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    dates = dates.astype("string").str.replace(".??.??", ".01.01", regex=False)
+    dates = dates.str.replace(r"\.\?\?$", ".01", regex=True)
+    return pd.to_datetime(dates, format=DATE_FORMAT, errors="coerce")
+
+
+def to_typed_games(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    players = [col for col in PLAYER_COLUMNS if col in df.columns]
+    if players:
+        names = pd.concat([df[col] for col in players]).dropna().unique()
+        dtype = pd.CategoricalDtype(sorted(names))
+        for col in players:
+            df[col] = df[col].astype(dtype)
+    for col in INT16_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors="coerce").round()
+            values = values.where(values.between(-(2**15), 2**15 - 1))
+            df[col] = values.astype("Int16")
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if "Date" in df.columns:
+        df["Date"] = parse_dates(df["Date"])
+    return df
+
+
+def get_games_filename(database: str, file_format: str = "parquet") -> Path:
+    return ARTIFACTS_DIR / f"{database}.{file_format}"
+
+
+def _to_arrow_table(df: pd.DataFrame):
+    import pyarrow as pa
+
+    types = {}
+    for col in df.columns:
+        if col in PLAYER_COLUMNS or col in CATEGORY_COLUMNS:
+            types[col] = pa.dictionary(pa.int32(), pa.string())
+        elif col in INT16_COLUMNS:
+            types[col] = pa.int16()
+        elif col in PLAYER_ID_COLUMNS:
+            types[col] = pa.int32()
+        elif col == "Date":
+            types[col] = pa.timestamp("ms")
+        else:
+            types[col] = pa.string()
+    schema = pa.schema([(col, types[col]) for col in df.columns])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _to_games_table(df: pd.DataFrame, database: str):
+    registry = register_games(database, df)
+    df = to_typed_games(df)
+    for col, id_col in zip(PLAYER_COLUMNS, PLAYER_ID_COLUMNS):
+        if col in df.columns:
+            df[id_col] = encode_players(df[col], registry)
+    return _to_arrow_table(df)
+
+
+def write_games(df: pd.DataFrame, database: str) -> None:
+    import pyarrow.parquet as pq
+
+    pq.write_table(_to_games_table(df, database), get_games_filename(database))
+
+
+def write_games_partition(df: pd.DataFrame, database: str, partition: str) -> None:
+    import pyarrow.parquet as pq
+
+    dirname = get_games_filename(database)
+    if dirname.is_file():
+        raise ValueError(f"{dirname} is a single file, not a partitioned artifact")
+    dirname.mkdir(parents=True, exist_ok=True)
+    # Hidden temporary names are ignored by parquet dataset readers
+    tmp_filename = dirname / f".{partition}.tmp"
+    pq.write_table(_to_games_table(df, database), tmp_filename)
+    os.replace(tmp_filename, dirname / f"{partition}.parquet")
+
+
+def _apply_filters(df: pd.DataFrame, filters: List[Filter]) -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if op in ["==", "="]:
+            mask &= df[col] == value
+        elif op == "!=":
+            mask &= df[col] != value
+        elif op == "<":
+            mask &= df[col] < value
+        elif op == "<=":
+            mask &= df[col] <= value
+        elif op == ">":
+            mask &= df[col] > value
+        elif op == ">=":
+            mask &= df[col] >= value
+        elif op == "in":
+            mask &= df[col].isin(value)
+        elif op == "not in":
+            mask &= ~df[col].isin(value)
+        else:
+            raise ValueError(f"Filter operator {op} not supported")
+    return df[mask.fillna(False)]
+
+
+def read_games_columns(database: str) -> List[str]:
+    filename = get_games_filename(database)
+    if filename.exists():
+        import pyarrow.parquet as pq
+
+        return pq.ParquetDataset(filename).schema.names
+    return list(pd.read_csv(get_games_filename(database, "csv"), nrows=0).columns)
+
+
+def read_games(
+    database: str,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Filter]] = None,
+) -> pd.DataFrame:
+    """Read the parsed games of a database.
+
+    The typed parquet artifact is preferred, with the column projection and the
+    filters pushed down to the reader. The CSV artifact is used as a fallback.
+    """
+    filename = get_games_filename(database)
+    if filename.exists():
+        return pd.read_parquet(filename, columns=columns, filters=filters or None)
+
+    usecols = None
+    if columns is not None:
+        usecols = list(columns)
+        usecols += [col for col, _, _ in filters or [] if col not in usecols]
+    df = pd.read_csv(get_games_filename(database, "csv"), usecols=usecols)
+    if filters:
+        df = _apply_filters(df, filters)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def iter_games(
+    database: str,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Filter]] = None,
+    chunk_rows: int = 1_000_000,
+) -> Iterator[pd.DataFrame]:
+    """Like `read_games`, but yield the games in chunks of at most `chunk_rows`.
+
+    Only one chunk (and, for parquet, one batch of the reader) is in memory at
+    a time, so databases larger than the memory can be scanned.
+    """
+    filename = get_games_filename(database)
+    if filename.exists():
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        expression = pq.filters_to_expression(filters) if filters else None
+        batches = ds.dataset(filename, format="parquet").to_batches(
+            columns=columns, filter=expression, batch_size=chunk_rows
+        )
+        for batch in batches:
+            yield batch.to_pandas()
+        return
+
+    usecols = None
+    if columns is not None:
+        usecols = list(columns)
+        usecols += [col for col, _, _ in filters or [] if col not in usecols]
+    reader = pd.read_csv(
+        get_games_filename(database, "csv"), usecols=usecols, chunksize=chunk_rows
+    )
+    with reader:
+        for df in reader:
+            if filters:
+                df = _apply_filters(df, filters)
+            yield df if columns is None else df[columns]
+
+
+def _player_columns(
+    database: str, columns: List[str]
+) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Columns to read, and the (name, ID) columns to encode on the fly."""
+    available = read_games_columns(database)
+    missing = [
+        (col, id_col)
+        for col, id_col in zip(PLAYER_COLUMNS, PLAYER_ID_COLUMNS)
+        if id_col in columns and id_col not in available
+    ]
+    read_columns = [col for col in columns if col not in dict(missing).values()]
+    read_columns += [col for col, _ in missing if col not in read_columns]
+    return read_columns, missing
+
+
+def _encode_missing(
+    database: str, df: pd.DataFrame, missing: List[Tuple[str, str]]
+) -> pd.DataFrame:
+    if missing:
+        registry = register_games(database, df[[col for col, _ in missing]])
+        for col, id_col in missing:
+            df[id_col] = encode_players(df[col], registry)
+    return df
+
+
+def read_player_games(
+    database: str, columns: List[str], filters: Optional[List[Filter]] = None
+) -> pd.DataFrame:
+    """Like `read_games`, but WhiteId/BlackId columns are always available.
+
+    Artifacts written before the player registry existed only hold names, which
+    are then encoded (and registered) on the fly.
+    """
+    read_columns, missing = _player_columns(database, columns)
+    df = read_games(database, columns=read_columns, filters=filters)
+    return _encode_missing(database, df, missing)[columns]
+
+
+def iter_player_games(
+    database: str,
+    columns: List[str],
+    filters: Optional[List[Filter]] = None,
+    chunk_rows: int = 1_000_000,
+) -> Iterator[pd.DataFrame]:
+    """Like `read_player_games`, chunk by chunk as `iter_games` reads them."""
+    read_columns, missing = _player_columns(database, columns)
+    for df in iter_games(database, read_columns, filters, chunk_rows=chunk_rows):
+        yield _encode_missing(database, df, missing)[columns]
@@ -1,100 +1,295 @@
-from typing import Literal, Union
-from black import InvalidInput
+from __future__ import annotations
 
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, Optional, Union
+
+import numpy as np
 import pandas as pd
-import igraph as ig
-import networkx as nx
 
-from chessnet.statistics import read_elo_data
-from chessnet.utils import ARTIFACTS_DIR, Database
-from chessnet.elo import elo_to_category
+from chessnet import metrics
+from chessnet.edges import stream_edge_ids
+from chessnet.elo import elo_to_categories
+from chessnet.games import get_games_filename
+from chessnet.players import read_player_registry
+from chessnet.rewiring import double_edge_swap
+from chessnet.statistics import get_elo_arrays, read_elo_data
+from chessnet.utils import ARTIFACTS_DIR, InvalidInput
 
+if TYPE_CHECKING:
+    import igraph as ig
+    import networkx as nx
 
-def edges_from_csv(
+
+def get_edges_filename(database: str, min_elo: int = 500, max_elo: int = 4000) -> Path:
+    return ARTIFACTS_DIR / f"{database}_edges_{min_elo}_{max_elo}.csv"
+
+
+def _is_newer_than_games(filename: Path, database: str) -> bool:
+    games_filename = get_games_filename(database)
+    if not games_filename.exists():
+        games_filename = get_games_filename(database, "csv")
+    if not games_filename.exists():
+        return True
+    return filename.stat().st_mtime_ns >= games_filename.stat().st_mtime_ns
+
+
+def edge_ids_from_games(
     database: str,
     drop_missing_elo: bool = True,
     min_elo: int = 500,
     max_elo: int = 4000,
+    chunk_rows: int = 1_000_000,
+    max_pairs: int = 10_000_000,
 ) -> pd.DataFrame:
-    df = pd.read_csv(ARTIFACTS_DIR / (database + ".csv"))
-    if (database == Database.Portal) and ("Site" in df.columns):
-        df = df[df.Site == "FICS freechess.org"]
-    cols_to_dropna = ["White", "Black"]
-    if drop_missing_elo:
-        mask = (
-            (df.WhiteElo >= min_elo)
-            & (df.WhiteElo <= max_elo)
-            & (df.BlackElo >= min_elo)
-            & (df.BlackElo <= max_elo)
+    """Directed edges by player ID, by decreasing number of games, then first game.
+
+    This is the order of `value_counts` on the games, which numbers the vertices
+    of the graph by first appearance. The edge table written during ingestion is
+    read if there is one and it is not older than the games artifact (see
+    `accumulators.GameAccumulator`). Otherwise the games are aggregated out of
+    core, `chunk_rows` at a time, see `edges.stream_edge_ids`.
+    """
+    filename = get_edges_filename(database, min_elo, max_elo)
+    if (
+        drop_missing_elo
+        and filename.is_file()
+        and _is_newer_than_games(filename, database)
+    ):
+        return pd.read_csv(
+            filename,
+            dtype={
+                "WhiteId": np.int32,
+                "BlackId": np.int32,
+                "NUMBER_OF_GAMES": np.int64,
+            },
         )
-        df = df[mask]
-        cols_to_dropna += ["WhiteElo", "BlackElo"]
-    df = df[cols_to_dropna].dropna()
-    counts = df[["White", "Black"]].value_counts()
-    counts.name = "NUMBER_OF_GAMES"
-    edges = counts.reset_index()
-    return edges
 
+    return stream_edge_ids(
+        database,
+        drop_missing_elo=drop_missing_elo,
+        min_elo=min_elo,
+        max_elo=max_elo,
+        chunk_rows=chunk_rows,
+        max_pairs=max_pairs,
+    )
 
-def csv_to_igraph(
-    database: str, directed: bool = False, drop_missing_elo: bool = True
+
+def edges_from_csv(
+    database: str,
+    drop_missing_elo: bool = True,
+    min_elo: int = 500,
+    max_elo: int = 4000,
+    chunk_rows: int = 1_000_000,
+    max_pairs: int = 10_000_000,
+) -> pd.DataFrame:
+    edges = edge_ids_from_games(
+        database,
+        drop_missing_elo=drop_missing_elo,
+        min_elo=min_elo,
+        max_elo=max_elo,
+        chunk_rows=chunk_rows,
+        max_pairs=max_pairs,
+    )
+    registry = read_player_registry(database)
+    return pd.DataFrame(
+        {
+            "White": registry.take(edges.WhiteId),
+            "Black": registry.take(edges.BlackId),
+            "NUMBER_OF_GAMES": edges.NUMBER_OF_GAMES,
+        }
+    )
+
+
+def _print_stage(stage: str, start: float, n: int, m: int) -> float:
+    now = time.perf_counter()
+    print(f"{stage}: {now - start:.2f}s ({n} vertices, {m} edges)")
+    return now
+
+
+def _record_filter(step: str, n: int, m: int, kept_n: int, kept_m: int) -> None:
+    metrics.gauge("graph_vertices_dropped", n - kept_n, filter=step)
+    metrics.gauge("graph_edges_dropped", m - kept_m, filter=step)
+
+
+def build_igraph(
+    edges: pd.DataFrame,
+    mean_elo: np.ndarray,
+    std_elo: np.ndarray,
+    registry: pd.Index,
+    directed: bool = False,
+    verbose: bool = False,
 ) -> ig.Graph:
-    edges = edges_from_csv(database, drop_missing_elo=drop_missing_elo)
-    g = ig.Graph.DataFrame(edges, directed=True)
-    g = g.simplify(combine_edges="sum")
+    """Build the player graph from integer edges in a single igraph call.
+
+    Equivalent to simplifying the multigraph (summing NUMBER_OF_GAMES), dropping
+    players without Elo and isolates, and taking the giant weak component, with
+    the same vertex and edge order igraph would produce doing it step by step.
+    """
+    import igraph as ig
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    start = time.perf_counter()
+    source = edges.WhiteId.to_numpy(dtype=np.int64)
+    target = edges.BlackId.to_numpy(dtype=np.int64)
+    weight = edges.NUMBER_OF_GAMES.to_numpy(dtype=float)
+
+    # Vertices are numbered by first appearance, as in ig.Graph.DataFrame
+    ids = pd.unique(np.column_stack([source, target]).ravel())
+    index = np.full(len(registry), -1, dtype=np.int64)
+    index[ids] = np.arange(len(ids))
+    source, target = index[source], index[target]
     if not directed:
-        g.to_undirected(combine_edges="sum")
-    print(g.vcount(), g.ecount())
-    elo_data = read_elo_data(database)
-    players = elo_data.index
-    no_elo_players = [v.index for v in g.vs() if v["name"] not in players]
-    g.delete_vertices(no_elo_players)
-    print(g.vcount(), g.ecount())
-    g.vs.select(_degree=0).delete()  # Remove isolates
-    print(g.vcount(), g.ecount())
-    players_elo = dict(elo_data.to_dict())
-    g.vs["MeanElo"] = [players_elo["MeanElo"][v["name"]] for v in g.vs()]
-    g.vs["StdElo"] = [players_elo["StdElo"][v["name"]] for v in g.vs()]
-    g = g.components(mode="WEAK").giant()
+        # igraph orders undirected edges by (larger, smaller) endpoint
+        source, target = np.maximum(source, target), np.minimum(source, target)
+    loops = source == target
+    n = len(ids)
+    keys, inverse = np.unique(source[~loops] * n + target[~loops], return_inverse=True)
+    weight = np.bincount(inverse, weights=weight[~loops], minlength=len(keys))
+    _record_filter("simplify", n, len(loops), n, len(keys))
+    source, target = keys // n, keys % n
+    if not directed:
+        source, target = target, source
+    if verbose:
+        start = _print_stage("simplify", start, n, len(keys))
+
+    has_elo = ~np.isnan(mean_elo[ids])
+    mask = has_elo[source] & has_elo[target]
+    source, target, weight = source[mask], target[mask], weight[mask]
+    keep = np.zeros(n, dtype=bool)
+    keep[source] = True
+    keep[target] = True
+    _record_filter("elo", n, len(keys), keep.sum(), len(source))
+    if verbose:
+        start = _print_stage("elo and isolates", start, keep.sum(), len(source))
+
+    adjacency = coo_matrix((np.ones(len(source)), (source, target)), shape=(n, n))
+    _, labels = connected_components(adjacency, directed=directed, connection="weak")
+    sizes = np.bincount(labels[keep], minlength=n)
+    keep &= labels == np.argmax(sizes)
+    mask = keep[source]
+    _record_filter("giant_component", sizes.sum(), len(mask), keep.sum(), mask.sum())
+    source, target, weight = source[mask], target[mask], weight[mask]
+    new_index = np.cumsum(keep) - 1
+    if verbose:
+        start = _print_stage("giant component", start, keep.sum(), len(source))
+
+    ids = ids[keep]
+    g = ig.Graph(
+        n=len(ids),
+        edges=np.column_stack([new_index[source], new_index[target]]).tolist(),
+        directed=directed,
+        vertex_attrs={
+            "name": registry.take(ids).tolist(),
+            "PlayerId": ids.tolist(),
+            "MeanElo": mean_elo[ids].tolist(),
+            "StdElo": std_elo[ids].tolist(),
+        },
+        edge_attrs={"NUMBER_OF_GAMES": weight.tolist()},
+    )
+    metrics.gauge("graph_vertices", g.vcount())
+    metrics.gauge("graph_edges", g.ecount())
+    if verbose:
+        _print_stage("build graph", start, g.vcount(), g.ecount())
     return g
 
 
+def csv_to_igraph(
+    database: str,
+    directed: bool = False,
+    drop_missing_elo: bool = True,
+    verbose: bool = True,
+    min_elo: int = 500,
+    max_elo: int = 4000,
+) -> ig.Graph:
+    start = time.perf_counter()
+    edges = edge_ids_from_games(
+        database, drop_missing_elo=drop_missing_elo, min_elo=min_elo, max_elo=max_elo
+    )
+    registry = read_player_registry(database)
+    mean_elo, std_elo = get_elo_arrays(read_elo_data(database), registry)
+    if verbose:
+        _print_stage("read edges and elo", start, len(registry), len(edges))
+    return build_igraph(
+        edges, mean_elo, std_elo, registry, directed=directed, verbose=verbose
+    )
+
+
 def csv_to_networkx(
-    database: str, directed: bool = False, drop_missing_elo: bool = True
+    database: str,
+    directed: bool = False,
+    drop_missing_elo: bool = True,
+    verbose: bool = True,
 ) -> Union[nx.Graph, nx.DiGraph]:
+    import networkx as nx
+
+    start = time.perf_counter()
     edges = edges_from_csv(database, drop_missing_elo=drop_missing_elo)
     g = nx.from_edgelist(
-        edges.values, create_using=nx.DiGraph if directed else nx.Graph
+        edges[["White", "Black"]].values,
+        create_using=nx.DiGraph if directed else nx.Graph,
     )
-    print(g.number_of_nodes(), g.number_of_edges())
-    elo_data = read_elo_data(database)
-    players = elo_data.index
-    no_elo_players = [v for v in g.nodes() if v not in players]
-    g.remove_nodes_from(no_elo_players)
-    print(g.number_of_nodes(), g.number_of_edges())
+    n, m = g.number_of_nodes(), g.number_of_edges()
+    if verbose:
+        start = _print_stage("simplify", start, n, m)
+    registry = read_player_registry(database)
+    mean_elo, std_elo = get_elo_arrays(read_elo_data(database), registry)
+    nodes = np.array(g.nodes(), dtype=object)
+    ids = registry.get_indexer(nodes)
+    has_elo = ids >= 0
+    has_elo[has_elo] = ~np.isnan(mean_elo[ids[has_elo]])
+    g.remove_nodes_from(nodes[~has_elo])
     g.remove_nodes_from(list(nx.isolates(g)))
-    print(g.number_of_nodes(), g.number_of_edges())
-    nx.set_node_attributes(g, elo_data["MeanElo"].to_dict(), "MeanElo")
-    nx.set_node_attributes(g, elo_data["StdElo"].to_dict(), "StdElo")
+    _record_filter("elo", n, m, g.number_of_nodes(), g.number_of_edges())
+    n, m = g.number_of_nodes(), g.number_of_edges()
+    if verbose:
+        start = _print_stage("elo and isolates", start, n, m)
+    nodes, ids = nodes[has_elo], ids[has_elo]
+    nx.set_node_attributes(g, dict(zip(nodes, mean_elo[ids].tolist())), "MeanElo")
+    nx.set_node_attributes(g, dict(zip(nodes, std_elo[ids].tolist())), "StdElo")
+    nx.set_node_attributes(g, dict(zip(nodes, ids.tolist())), "PlayerId")
     gcc = sorted(nx.connected_components(g), key=len, reverse=True)[0]
     g = g.subgraph(gcc)
+    _record_filter("giant_component", n, m, g.number_of_nodes(), g.number_of_edges())
+    if verbose:
+        _print_stage("giant component", start, g.number_of_nodes(), g.number_of_edges())
     return g
 
 
-def write_pickle(
+def get_pickle_filename(
     database: str,
     directed: bool = False,
     package: Literal["igraph", "networkx"] = "igraph",
-):
+) -> Path:
     name = (
         database + ("_directed" if directed else "_undirected_") + package + ".pickle"
     )
+    return ARTIFACTS_DIR / name
+
+
+def write_pickle(
+    database: str,
+    directed: bool = False,
+    package: Literal["igraph", "networkx"] = "igraph",
+    min_elo: int = 500,
+    max_elo: int = 4000,
+):
+    filename = get_pickle_filename(database, directed, package)
     if package == "igraph":
-        g = csv_to_igraph(database, directed=directed, drop_missing_elo=True)
-        g.write_pickle(ARTIFACTS_DIR / name)
+        g = csv_to_igraph(
+            database,
+            directed=directed,
+            drop_missing_elo=True,
+            min_elo=min_elo,
+            max_elo=max_elo,
+        )
+        g.write_pickle(filename)
     elif package == "networkx":
+        import networkx as nx
+
         g = csv_to_networkx(database, directed=directed)
-        nx.write_gpickle(g, ARTIFACTS_DIR / name)
+        nx.write_gpickle(g, filename)
     else:
         raise InvalidInput("Package must be in ['igraph', 'networkx']")
 
@@ -104,34 +299,47 @@ def read_pickle(
     directed: bool = False,
     package: Literal["igraph", "networkx"] = "igraph",
 ) -> Union[ig.Graph, nx.Graph, nx.DiGraph]:
-    name = (
-        database + ("_directed" if directed else "_undirected_") + package + ".pickle"
-    )
+    filename = get_pickle_filename(database, directed, package)
     if package == "igraph":
-        return ig.Graph.Read_Pickle(ARTIFACTS_DIR / name)
+        import igraph as ig
+
+        return ig.Graph.Read_Pickle(filename)
     elif package == "networkx":
-        return nx.read_gpickle(ARTIFACTS_DIR / name)
+        import networkx as nx
+
+        return nx.read_gpickle(filename)
     else:
         raise InvalidInput("Package must be in ['igraph', 'networkx']")
 
 
 def get_players_degree(database: str, directed: bool = False) -> pd.DataFrame:
     g = read_pickle(database, directed=directed)
-    node_df = pd.DataFrame(
-        {
-            "Player": [v["name"] for v in g.vs()],
-            "k": [v.degree() for v in g.vs()],
-        }
-    ).set_index("Player")
+    node_df = pd.DataFrame({"Player": g.vs["name"], "k": g.degree()}).set_index(
+        "Player"
+    )
     return node_df
 
 
+def get_edgelist_filename(database: str, directed: bool = False) -> Path:
+    name = database + ("_directed" if directed else "_undirected") + ".edgelist"
+    return ARTIFACTS_DIR / name
+
+
 def csv_to_edgelist(
-    database: str, directed: bool = False, drop_missing_elo: bool = True
+    database: str,
+    directed: bool = False,
+    drop_missing_elo: bool = True,
+    min_elo: int = 500,
+    max_elo: int = 4000,
 ) -> None:
-    g = csv_to_igraph(database, directed=directed, drop_missing_elo=drop_missing_elo)
-    name = database + ("_directed" if directed else "_undirected") + ".edgelist"
-    g.write_edgelist(str(ARTIFACTS_DIR / name))
+    g = csv_to_igraph(
+        database,
+        directed=directed,
+        drop_missing_elo=drop_missing_elo,
+        min_elo=min_elo,
+        max_elo=max_elo,
+    )
+    g.write_edgelist(str(get_edgelist_filename(database, directed)))
 
 
 def read_edgelist(
@@ -139,11 +347,14 @@ def read_edgelist(
     directed: bool = False,
     package: Literal["igraph", "networkx"] = "igraph",
 ) -> Union[ig.Graph, nx.Graph]:
-    name = database + ("_directed" if directed else "_undirected") + ".edgelist"
-    filename = str(ARTIFACTS_DIR / name)
+    filename = str(get_edgelist_filename(database, directed))
     if package == "igraph":
+        import igraph as ig
+
         return ig.Graph.Read_Edgelist(filename, directed=directed)
     elif package == "networkx":
+        import networkx as nx
+
         return nx.read_edgelist(
             filename, create_using=nx.DiGraph if directed else nx.Graph
         )
@@ -151,25 +362,39 @@ def read_edgelist(
         raise InvalidInput("package must be in ['igraph', 'networkx']")
 
 
+def get_randomized_filename(
+    database: str, mode: Literal["fabien-viger"] = "fabien-viger"
+) -> Path:
+    return ARTIFACTS_DIR / f"{database}_randomized_{mode}.edgelist"
+
+
 def read_randomized_edgelist(
     database: str, mode: Literal["fabien-viger"] = "fabien-viger"
 ) -> ig.Graph:
-    name = f"{database}_randomized_{mode}.edgelist"
-    filename = str(ARTIFACTS_DIR / name)
+    import igraph as ig
+
+    filename = str(get_randomized_filename(database, mode))
     g = ig.Graph.Read_Edgelist(filename, directed=False)
     return g
 
 
 def read_rewired_edgelist(database: str, nswap_ecount_times: float = 10.0) -> ig.Graph:
+    import igraph as ig
+
     name = f"{database}_rewired_f{nswap_ecount_times}.edgelist"
     filename = str(ARTIFACTS_DIR / name)
     g = ig.Graph.Read_Edgelist(filename, directed=False)
     return g
 
 
+def get_rewired_filename(database: str, nswap_ecount_times: float = 10.0) -> Path:
+    return ARTIFACTS_DIR / f"{database}_rewired_f{nswap_ecount_times}.pickle"
+
+
 def read_rewired_graph(database: str, nswap_ecount_times: float = 10.0) -> ig.Graph:
-    name = f"{database}_rewired_f{nswap_ecount_times}.pickle"
-    filename = str(ARTIFACTS_DIR / name)
+    import igraph as ig
+
+    filename = str(get_rewired_filename(database, nswap_ecount_times))
     g = ig.Graph.Read_Pickle(filename)
     return g
 
@@ -177,16 +402,19 @@ def read_rewired_graph(database: str, nswap_ecount_times: float = 10.0) -> ig.Gr
 def create_randomized_graph(
     database: str, mode: Literal["fabien-viger"] = "fabien-viger"
 ) -> None:
+    import igraph as ig
+
     g = read_edgelist(database, directed=False)
     if mode == "fabien-viger":
         g = ig.Graph.Degree_Sequence(g.degree(), method="vl")
     g = g.simplify()
     g.vs.select(_degree=0).delete()  # Remove isolates
-    name = f"{database}_randomized_{mode}.edgelist"
-    g.write_edgelist(str(ARTIFACTS_DIR / name))
+    g.write_edgelist(str(get_randomized_filename(database, mode)))
 
 
 def _create_rewired_graph(database: str, nswap_ecount_times: float = 10.0):
+    import networkx as nx
+
     g = read_edgelist(database, directed=False, package="networkx")
     nswap = nswap_ecount_times * g.number_of_edges()
     max_tries = 10 * nswap
@@ -195,42 +423,78 @@ def _create_rewired_graph(database: str, nswap_ecount_times: float = 10.0):
     nx.write_edgelist(h, ARTIFACTS_DIR / name, data=False)
 
 
-def create_rewired_graph(database: str, nswap_ecount_times: int = 10):
+def create_rewired_graph(
+    database: str,
+    nswap_ecount_times: float = 10,
+    engine: Literal["numpy", "networkx"] = "numpy",
+    seed: Optional[int] = None,
+    verbose: bool = True,
+):
+    import igraph as ig
+
     g = read_pickle(database, directed=False, package="igraph")
-    g = g.to_networkx()
-    nswap = nswap_ecount_times * g.number_of_edges()
-    max_tries = 10 * nswap
-    g = nx.double_edge_swap(g, nswap=nswap, max_tries=max_tries)
-    g = ig.Graph.from_networkx(g)
-    name = f"{database}_rewired_f{nswap_ecount_times}.pickle"
-    g.write_pickle(ARTIFACTS_DIR / name)
+    filename = get_rewired_filename(database, nswap_ecount_times)
+    nswap = int(nswap_ecount_times * g.ecount())
+    if engine == "networkx":
+        import networkx as nx
+
+        g = g.to_networkx()
+        max_tries = 10 * nswap
+        g = nx.double_edge_swap(g, nswap=nswap, max_tries=max_tries)
+        g = ig.Graph.from_networkx(g)
+    elif engine == "numpy":
+        edges, _ = double_edge_swap(
+            np.array(g.get_edgelist()),
+            nswap,
+            seed=seed,
+            checkpoint=filename.with_name(filename.name + ".checkpoint.npz"),
+            verbose=verbose,
+        )
+        g = ig.Graph(
+            n=g.vcount(),
+            edges=edges.tolist(),
+            directed=False,
+            vertex_attrs={attr: g.vs[attr] for attr in g.vs.attributes()},
+            edge_attrs={attr: g.es[attr] for attr in g.es.attributes()},
+        )
+    else:
+        raise InvalidInput("engine must be in ['numpy', 'networkx']")
+    g.write_pickle(filename)
+
+
+def get_degree_and_elo_filename(database: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_degree_and_elo.csv"
 
 
 def write_degree_and_elo(database: str) -> None:
     df = get_players_degree(database).join(read_elo_data(database), how="inner")
-    filename = ARTIFACTS_DIR / f"{database}_degree_and_elo.csv"
-    df.to_csv(filename)
+    df.to_csv(get_degree_and_elo_filename(database))
 
 
 def read_degree_and_elo(database: str) -> pd.DataFrame:
-    filename = ARTIFACTS_DIR / f"{database}_degree_and_elo.csv"
-    return pd.read_csv(filename)
+    return pd.read_csv(get_degree_and_elo_filename(database))
+
 
+def get_gml_filename(database: str, rewired: bool = False) -> Path:
+    return ARTIFACTS_DIR / (database + ("_rewired" if rewired else "") + ".gml")
 
-def write_gml(database: str, rewired: bool = False) -> None:
+
+def write_gml(
+    database: str, rewired: bool = False, nswap_ecount_times: float = 10.0
+) -> None:
     g = (
-        read_rewired_graph(database, nswap_ecount_times=10.0)
+        read_rewired_graph(database, nswap_ecount_times=nswap_ecount_times)
         if rewired
         else read_pickle(database)
     )
-    gml_filename = database + ("_rewired" if rewired else "") + ".gml"
-    g.vs["label"] = [elo_to_category(elo) for elo in g.vs["MeanElo"]]
-    g.write_gml(str(ARTIFACTS_DIR / gml_filename))
+    g.vs["label"] = elo_to_categories(g.vs["MeanElo"]).tolist()
+    g.write_gml(str(get_gml_filename(database, rewired)))
 
 
 def read_gml(database: str, rewired: bool = False) -> ig.Graph:
-    gml_filename = database + ("_rewired" if rewired else "") + ".gml"
-    return ig.Graph.Read_GML(str(ARTIFACTS_DIR / gml_filename))
+    import igraph as ig
+
+    return ig.Graph.Read_GML(str(get_gml_filename(database, rewired)))
 
 
 if __name__ == "__main__":
@@ -254,6 +518,10 @@ if __name__ == "__main__":
     parser.add_argument("--gml-rewired-otb", action="store_true")
     parser.add_argument("--gml-rewired-portal", action="store_true")
     parser.add_argument("--nswap-frac", type=float, default=10)
+    parser.add_argument(
+        "--rewire-engine", choices=["numpy", "networkx"], default="numpy"
+    )
+    parser.add_argument("--seed", type=int, default=None)
     args = parser.parse_args()
 
     if args.pickle_otb:
@@ -284,11 +552,21 @@ if __name__ == "__main__":
 
     if args.rewire_otb:
         print("Rewiring OTB")
-        create_rewired_graph("OM_OTB_201609", nswap_ecount_times=args.nswap_frac)
+        create_rewired_graph(
+            "OM_OTB_201609",
+            nswap_ecount_times=args.nswap_frac,
+            engine=args.rewire_engine,
+            seed=args.seed,
+        )
 
     if args.rewire_portal:
         print("Rewiring Portal")
-        create_rewired_graph("OM_Portal_201510", nswap_ecount_times=args.nswap_frac)
+        create_rewired_graph(
+            "OM_Portal_201510",
+            nswap_ecount_times=args.nswap_frac,
+            engine=args.rewire_engine,
+            seed=args.seed,
+        )
 
     if args.gml_otb:
         write_gml("OM_OTB_201609")
@@ -0,0 +1,249 @@
+"""Counters, gauges and timers for long runs, off unless a sink is configured.
+
+Set `CHESSNET_METRICS` (or call `configure`) to a `.jsonl` file to append one
+JSON line per event, or to a `.prom` file to keep a Prometheus textfile with
+the totals of every process. Set `CHESSNET_PROFILE_DIR` to dump a cProfile of
+every pipeline stage. Both are inherited by the stage and worker processes.
+
+When no sink is configured, `count` and `gauge` return after one check and
+`timer` returns a shared no-op context manager.
+"""
+
+import atexit
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+METRICS_ENV = "CHESSNET_METRICS"
+PROFILE_DIR_ENV = "CHESSNET_PROFILE_DIR"
+NAME_REGEX = re.compile(r"[^a-zA-Z0-9_]")
+
+_sink: Optional[Path] = None
+_profile_dir: Optional[Path] = None
+_labels: Dict[str, str] = {}
+# Prometheus series of this process not yet flushed, by (name, labels)
+_series: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, Any]] = {}
+_NULL_CONTEXT = nullcontext()
+
+
+def configure(
+    sink: Union[None, Path, str] = None,
+    profile_dir: Union[None, Path, str] = None,
+) -> None:
+    """Enable (or, with None, disable) the metrics sink and stage profiles."""
+    global _sink, _profile_dir
+    _sink = None if sink is None else Path(sink)
+    _profile_dir = None if profile_dir is None else Path(profile_dir)
+    for env, value in [(METRICS_ENV, _sink), (PROFILE_DIR_ENV, _profile_dir)]:
+        if value is None:
+            os.environ.pop(env, None)
+        else:
+            os.environ[env] = str(value)
+
+
+def enabled() -> bool:
+    return _sink is not None
+
+
+def _is_prometheus() -> bool:
+    return _sink is not None and _sink.suffix == ".prom"
+
+
+def _record(kind: str, name: str, value: float, labels: Dict[str, Any]) -> None:
+    labels = {**_labels, **{key: str(label) for key, label in labels.items()}}
+    # Values are often numpy scalars, which json cannot encode
+    value = float(value)
+    if _is_prometheus():
+        key = (name, tuple(sorted(labels.items())))
+        series = _series.setdefault(key, {"kind": kind, "value": 0.0, "count": 0})
+        series["value"] = value if kind == "gauge" else series["value"] + value
+        series["count"] += 1
+        return
+    event = {
+        "time": time.time(),
+        "pid": os.getpid(),
+        "kind": kind,
+        "name": name,
+        "value": value,
+        "labels": labels,
+    }
+    # One append per event, so that processes can share the file
+    with open(_sink, "a") as file:
+        file.write(json.dumps(event) + "\n")
+
+
+def count(name: str, value: float = 1, **labels: Any) -> None:
+    if _sink is None:
+        return
+    _record("counter", name, value, labels)
+
+
+def gauge(name: str, value: float, **labels: Any) -> None:
+    if _sink is None:
+        return
+    _record("gauge", name, value, labels)
+
+
+class _Timer:
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _record("timer", self.name, time.perf_counter() - self.start, self.labels)
+
+
+def timer(name: str, **labels: Any):
+    """Context manager that records its wall time in seconds."""
+    if _sink is None:
+        return _NULL_CONTEXT
+    return _Timer(name, labels)
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process and its waited children, in bytes."""
+    import resource
+
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def memory(name: str = "peak_rss_bytes", **labels: Any) -> None:
+    if _sink is None:
+        return
+    _record("gauge", name, peak_rss(), labels)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = [
+        (key, value.replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels
+    ]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _prometheus_text(series: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    by_name: Dict[str, list] = {}
+    for key, entry in sorted(series.items()):
+        name, labels = json.loads(key)
+        by_name.setdefault(name, []).append((tuple(map(tuple, labels)), entry))
+    for name, entries in by_name.items():
+        metric = "chessnet_" + NAME_REGEX.sub("_", name)
+        kind = entries[0][1]["kind"]
+        if kind == "timer":
+            lines.append(f"# TYPE {metric}_seconds summary")
+            for labels, entry in entries:
+                text = _format_labels(labels)
+                lines.append(f"{metric}_seconds_sum{text} {entry['value']!r}")
+                lines.append(f"{metric}_seconds_count{text} {entry['count']}")
+        else:
+            lines.append(f"# TYPE {metric} {kind}")
+            for labels, entry in entries:
+                lines.append(f"{metric}{_format_labels(labels)} {entry['value']!r}")
+    return "\n".join(lines) + "\n"
+
+
+def flush() -> None:
+    """Merge the series of this process into the Prometheus textfile.
+
+    Counters and timers are added to the totals of other processes and gauges
+    replace them. The totals are kept in a hidden JSON file next to the sink,
+    and the textfile is replaced atomically, as the node exporter expects.
+    """
+    if not _is_prometheus() or not _series:
+        return
+    state_filename = _sink.with_name(f".{_sink.name}.json")
+    with open(_sink.with_name(f".{_sink.name}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state: Dict[str, Dict[str, Any]] = {}
+            if state_filename.is_file():
+                with open(state_filename, "r") as file:
+                    state = json.load(file)
+            for (name, labels), entry in _series.items():
+                key = json.dumps([name, list(labels)])
+                total = state.setdefault(key, {**entry, "value": 0.0, "count": 0})
+                if entry["kind"] == "gauge":
+                    total["value"] = entry["value"]
+                else:
+                    total["value"] += entry["value"]
+                total["count"] += entry["count"]
+            for filename, text in [
+                (state_filename, json.dumps(state)),
+                (_sink, _prometheus_text(state)),
+            ]:
+                tmp_filename = filename.with_name(filename.name + ".tmp")
+                with open(tmp_filename, "w") as file:
+                    file.write(text)
+                os.replace(tmp_filename, filename)
+            _series.clear()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextmanager
+def with_labels(**values: Any) -> Iterator[None]:
+    """Add labels to every metric recorded inside the block."""
+    global _labels
+    previous = _labels
+    _labels = {**_labels, **{key: str(label) for key, label in values.items()}}
+    try:
+        yield
+    finally:
+        _labels = previous
+
+
+@contextmanager
+def profile(name: str) -> Iterator[None]:
+    """Dump a cProfile of the block to `{profile_dir}/{name}.prof` if enabled."""
+    if _profile_dir is None:
+        yield
+        return
+    import cProfile
+
+    _profile_dir.mkdir(parents=True, exist_ok=True)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(_profile_dir / (NAME_REGEX.sub("_", name) + ".prof"))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Label, time, profile and record the peak memory of a pipeline stage.
+
+    The stage start is recorded with the process ID, to attach py-spy to it.
+    """
+    with with_labels(stage=name):
+        gauge("stage_pid", os.getpid())
+        try:
+            with timer("stage"), profile(name):
+                yield
+        finally:
+            memory()
+            flush()
+
+
+configure(os.environ.get(METRICS_ENV), os.environ.get(PROFILE_DIR_ENV))
+atexit.register(flush)
+# Forked processes flush their own series, not the ones of their parent
+os.register_at_fork(after_in_child=_series.clear)
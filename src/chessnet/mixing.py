@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chessnet.csr import CSRGraph, read_csr_graph
+from chessnet.elo import ELO_BINS, ELO_CATEGORIES, elo_to_codes
+from chessnet.utils import ARTIFACTS_DIR
+
+if TYPE_CHECKING:
+    import igraph as ig
+
+
+def mixing_matrix(
+    codes: np.ndarray,
+    source: np.ndarray,
+    target: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+    n_categories: Optional[int] = None,
+    directed: bool = False,
+) -> np.ndarray:
+    """Total weight of the edges between every pair of vertex categories.
+
+    `codes` holds the category of every vertex and edges are given as arrays
+    of vertex indices. Undirected edges count in both directions, so the
+    matrix is symmetric (and self-loops count twice).
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    k = int(codes.max(initial=-1)) + 1 if n_categories is None else n_categories
+    weights = np.ones(len(source)) if weights is None else np.asarray(weights)
+    a, b = codes[source], codes[target]
+    matrix = np.bincount(a * k + b, weights=weights, minlength=k * k).reshape(k, k)
+    return matrix if directed else matrix + matrix.T
+
+
+def assortativity(matrix: np.ndarray) -> float:
+    """Newman's assortativity coefficient of a (weighted) mixing matrix."""
+    e = matrix / matrix.sum()
+    ab = e.sum(axis=1) @ e.sum(axis=0)
+    return (np.trace(e) - ab) / (1 - ab)
+
+
+def quotient_edges(
+    codes: np.ndarray,
+    source: np.ndarray,
+    target: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+    n_categories: Optional[int] = None,
+    directed: bool = False,
+) -> pd.DataFrame:
+    """Edges of the graph of categories: number of player edges and their weight.
+
+    Undirected edges are stored once, from the lower to the higher code.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    k = int(codes.max(initial=-1)) + 1 if n_categories is None else n_categories
+    weights = np.ones(len(source)) if weights is None else np.asarray(weights)
+    a, b = codes[source], codes[target]
+    if not directed:
+        a, b = np.minimum(a, b), np.maximum(a, b)
+    keys = a * k + b
+    counts = np.bincount(keys, minlength=k * k)
+    totals = np.bincount(keys, weights=weights, minlength=k * k)
+    present = np.flatnonzero(counts)
+    return pd.DataFrame(
+        {
+            "source": present // k,
+            "target": present % k,
+            "edges": counts[present],
+            "weight": totals[present],
+        }
+    )
+
+
+def category_arrays(
+    g: CSRGraph, bins: Sequence[float] = ELO_BINS
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Category code of every vertex and the edge arrays of a CSR graph."""
+    source, target, weights = g.edges()
+    return elo_to_codes(g["MeanElo"], bins), source, target, weights
+
+
+def _category_matrix(
+    g: CSRGraph, bins: Sequence[float] = ELO_BINS, weighted: bool = True
+) -> np.ndarray:
+    codes, source, target, weights = category_arrays(g, bins)
+    return mixing_matrix(
+        codes,
+        source,
+        target,
+        weights if weighted else None,
+        n_categories=len(bins) + 1,
+        directed=g.directed,
+    )
+
+
+def category_mixing(
+    g: CSRGraph,
+    bins: Sequence[float] = ELO_BINS,
+    categories: Sequence[str] = ELO_CATEGORIES,
+    weighted: bool = True,
+) -> pd.DataFrame:
+    """Mixing matrix of the Elo categories, weighted by NUMBER_OF_GAMES."""
+    if len(categories) != len(bins) + 1:
+        raise ValueError("There must be one more category than Elo bins")
+    return pd.DataFrame(
+        _category_matrix(g, bins, weighted),
+        index=list(categories),
+        columns=list(categories),
+    )
+
+
+def category_assortativity(
+    g: CSRGraph, bins: Sequence[float] = ELO_BINS, weighted: bool = True
+) -> float:
+    return assortativity(_category_matrix(g, bins, weighted))
+
+
+def quotient_graph(
+    g: CSRGraph,
+    bins: Sequence[float] = ELO_BINS,
+    categories: Sequence[str] = ELO_CATEGORIES,
+) -> ig.Graph:
+    """Graph of the Elo categories, with the number of players of each.
+
+    Edges (and self-loops, for games within a category) hold the number of
+    player edges between the categories (`edges`) and their NUMBER_OF_GAMES.
+    """
+    import igraph as ig
+
+    if len(categories) != len(bins) + 1:
+        raise ValueError("There must be one more category than Elo bins")
+    codes, source, target, weights = category_arrays(g, bins)
+    k = len(categories)
+    edges = quotient_edges(codes, source, target, weights, k, g.directed)
+    return ig.Graph(
+        n=k,
+        edges=edges[["source", "target"]].to_numpy().tolist(),
+        directed=g.directed,
+        vertex_attrs={
+            "name": list(categories),
+            "players": np.bincount(codes, minlength=k).tolist(),
+        },
+        edge_attrs={
+            "edges": edges["edges"].tolist(),
+            "NUMBER_OF_GAMES": edges["weight"].tolist(),
+        },
+    )
+
+
+def get_mixing_filename(
+    database: str, rewired: bool = False, nswap_ecount_times: float = 10.0
+) -> Path:
+    if rewired:
+        return ARTIFACTS_DIR / f"{database}_rewired_f{nswap_ecount_times}_mixing.csv"
+    return ARTIFACTS_DIR / f"{database}_mixing.csv"
+
+
+def write_category_mixing(
+    database: str, rewired: bool = False, nswap_ecount_times: float = 10.0
+) -> None:
+    g = read_csr_graph(database, rewired, nswap_ecount_times)
+    df = category_mixing(g)
+    df.to_csv(get_mixing_filename(database, rewired, nswap_ecount_times))
+
+
+def read_category_mixing(
+    database: str, rewired: bool = False, nswap_ecount_times: float = 10.0
+) -> pd.DataFrame:
+    return pd.read_csv(
+        get_mixing_filename(database, rewired, nswap_ecount_times), index_col=0
+    )
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mixing-otb", action="store_true")
+    parser.add_argument("--mixing-portal", action="store_true")
+    parser.add_argument("--rewired", action="store_true")
+    parser.add_argument("--nswap-frac", type=float, default=10)
+    args = parser.parse_args()
+
+    if args.mixing_otb:
+        write_category_mixing("OM_OTB_201609", args.rewired, args.nswap_frac)
+
+    if args.mixing_portal:
+        write_category_mixing("OM_Portal_201510", args.rewired, args.nswap_frac)
@@ -1,18 +1,63 @@
+import io
+import json
+import mmap
+import os
+import re
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
-from typing import Union, List
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
-from chess.pgn import read_headers
 import pandas as pd
 
-from chessnet.utils import ARTIFACTS_DIR, DATA_DIR
+from chessnet import metrics
+from chessnet.accumulators import GameAccumulator, write_accumulated
+from chessnet.compression import is_compressed, open_binary, strip_compression_suffix
+from chessnet.games import write_games, write_games_partition
+from chessnet.players import register_games
+from chessnet.statistics import write_elo_data
+from chessnet.utils import ARTIFACTS_DIR, DATA_DIR, get_database_config
 
+GAME_START = b"\n[Event "
+CHUNK_SIZE = 64 * 2**20
+TAG_REGEX = re.compile(
+    rb"^(?:\xef\xbb\xbf)?\[([A-Za-z0-9][A-Za-z0-9_+#=:-]*)"
+    rb'[ \t]+"([^\r\n]*)"\][ \t\r]*$',
+    re.MULTILINE,
+)
+NON_SPACE_REGEX = re.compile(rb"\S")
+
+OM_OTB_FIELDS = [
+    "White",
+    "Black",
+    "WhiteElo",
+    "BlackElo",
+    "Result",
+    "ECO",
+    "PlyCount",
+    "Date",
+]
+OM_PORTAL_FIELDS = OM_OTB_FIELDS + ["Site"]
 
-def pgn_to_dataframe(
-    pgn_filename: Union[Path, str], fields: List[str], verbose: bool = False
-) -> pd.DataFrame:
 
-    file = open(pgn_filename, "r")
+def read_headers_columns(
+    file: TextIO, fields: List[str], verbose: bool = False
+) -> Dict[str, list]:
+    from chess.pgn import read_headers
 
     data = defaultdict(list)
 
@@ -28,53 +73,534 @@ def pgn_to_dataframe(
         try:
             pgn = read_headers(file)
         except UnicodeDecodeError:
+            metrics.count("pgn_decode_errors", parser="chess")
             if verbose:
                 print("Unidecode error:", i)
                 print(pgn)
             pass
+    return data
+
+
+def _decode_value(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        metrics.count("pgn_latin1_values", parser="scanner")
+        return value.decode("latin-1")
+
+
+def scan_headers_columns(
+    buffer: Union[bytes, mmap.mmap],
+    fields: List[str],
+    start: int = 0,
+    end: Optional[int] = None,
+    verbose: bool = False,
+) -> Dict[str, list]:
+    """Collect tag values from the header lines of a PGN buffer.
+
+    Movetext is skipped by the regex engine without being decoded, and only the
+    requested values are decoded, falling back to latin-1 field by field.
+    """
+    end = len(buffer) if end is None else end
+    tags = {field.encode(): field for field in fields}
+    data: Dict[str, list] = {field: [] for field in fields}
+
+    def append_game(game: Dict[str, bytes]) -> None:
+        for field in fields:
+            value = game.get(field)
+            data[field].append(None if value is None else _decode_value(value))
+
+    game: Optional[Dict[str, bytes]] = None
+    has_event = False
+    previous_end = start
+    for match in TAG_REGEX.finditer(buffer, start, end):
+        tag = match.group(1)
+        new_game = (
+            game is None
+            or (tag == b"Event" and has_event)
+            or NON_SPACE_REGEX.search(buffer, previous_end, match.start()) is not None
+        )
+        if new_game:
+            if game is not None:
+                append_game(game)
+            if verbose and len(data[fields[0]]) % 100000 == 0:
+                print(f"Parsed {len(data[fields[0]])} lines")
+            game = {}
+            has_event = False
+        has_event = has_event or tag == b"Event"
+        previous_end = match.end()
+        if tag in tags:
+            game[tags[tag]] = match.group(2)
+    if game is not None:
+        append_game(game)
+    return data
+
+
+def scan_pgn_headers(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    start: int = 0,
+    end: Optional[int] = None,
+    verbose: bool = False,
+) -> Dict[str, list]:
+    with open(pgn_filename, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return {field: [] for field in fields}
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return scan_headers_columns(buffer, fields, start, end, verbose=verbose)
+
+
+def iter_game_blocks(stream: BinaryIO, block_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    buffer = b""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        buffer += block
+        end = buffer.rfind(GAME_START) + 1
+        if end > 0:
+            yield buffer[:end]
+            buffer = buffer[end:]
+    if buffer:
+        yield buffer
+
+
+def stream_headers_columns(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    verbose: bool = False,
+    threads: int = 1,
+    parser: Literal["chess", "scanner"] = "chess",
+    accumulator: Optional[GameAccumulator] = None,
+) -> Dict[str, list]:
+    start = time.perf_counter()
+    with open_binary(pgn_filename, threads=threads) as stream:
+        if parser == "chess":
+            text = io.TextIOWrapper(stream)
+            data = read_headers_columns(text, fields, verbose)
+            text.detach()
+            if accumulator is not None:
+                accumulator.update(data)
+        else:
+            data = {field: [] for field in fields}
+            for block in iter_game_blocks(stream):
+                chunk = scan_headers_columns(block, fields)
+                for field in fields:
+                    data[field].extend(chunk[field])
+                if accumulator is not None:
+                    accumulator.update(chunk)
+                if verbose:
+                    print(f"Parsed {len(data[fields[0]])} lines")
+        n_bytes = stream.tell()
+    if verbose:
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(pgn_filename) / 1e6
+        print(
+            f"Read {size:.1f} MB ({n_bytes / 1e6:.1f} MB uncompressed) in "
+            f"{elapsed:.1f}s: {size / elapsed:.1f} MB/s compressed, "
+            f"{n_bytes / 1e6 / elapsed:.1f} MB/s uncompressed"
+        )
+    return data
+
+
+def _next_game_offset(file, position: int, block_size: int = 2**20) -> int:
+    if position == 0:
+        return 0
+    # Start one byte early so that a game starting exactly at `position` is found
+    offset = position - 1
+    file.seek(offset)
+    buffer = b""
+    while True:
+        block = file.read(block_size)
+        if not block:
+            return file.tell()
+        buffer += block
+        index = buffer.find(GAME_START)
+        if index >= 0:
+            return offset + index + 1
+        tail = len(GAME_START) - 1
+        offset += len(buffer) - tail
+        buffer = buffer[-tail:]
+
+
+def find_game_offsets(
+    pgn_filename: Union[Path, str], n_chunks: int, start: int = 0
+) -> List[int]:
+    size = os.path.getsize(pgn_filename)
+    offsets = [start]
+    with open(pgn_filename, "rb") as file:
+        for i in range(1, n_chunks):
+            position = max(start + (size - start) * i // n_chunks, offsets[-1] + 1)
+            if position >= size:
+                break
+            offset = _next_game_offset(file, position)
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    offsets.append(size)
+    return offsets
+
+
+def _parse_chunk(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    parser: Literal["chess", "scanner"],
+    start: int,
+    end: int,
+) -> Dict[str, list]:
+    if parser == "scanner":
+        data = scan_pgn_headers(pgn_filename, fields, start, end)
+    else:
+        with open(pgn_filename, "rb") as file:
+            file.seek(start)
+            raw = file.read(end - start)
+        data = read_headers_columns(io.TextIOWrapper(io.BytesIO(raw)), fields)
+    # Pool workers exit without running atexit handlers
+    metrics.flush()
+    return data
+
+
+def _parse_and_accumulate_chunk(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    parser: Literal["chess", "scanner"],
+    accumulator: GameAccumulator,
+    start: int,
+    end: int,
+) -> Tuple[Dict[str, list], GameAccumulator]:
+    chunk = _parse_chunk(pgn_filename, fields, parser, start, end)
+    return chunk, accumulator.empty().update(chunk)
+
+
+def pgn_to_dataframe(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    verbose: bool = False,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    parser: Literal["chess", "scanner"] = "chess",
+    accumulator: Optional[GameAccumulator] = None,
+) -> pd.DataFrame:
+    """Parse the header fields of every game into a DataFrame.
+
+    With `accumulator`, the Elo moments and pair counts of the games are added
+    to it as chunks are parsed (in the workers, when there are several).
+    """
+
+    if parser not in ["chess", "scanner"]:
+        raise ValueError("parser must be in ['chess', 'scanner']")
+
+    start = time.perf_counter()
+    df = _pgn_to_dataframe(
+        pgn_filename, fields, verbose, workers, chunk_size, parser, accumulator
+    )
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(pgn_filename)
+    metrics.count("pgn_games", len(df), parser=parser)
+    metrics.count("pgn_bytes", size, parser=parser)
+    if elapsed > 0:
+        metrics.gauge("pgn_games_per_second", len(df) / elapsed, parser=parser)
+        metrics.gauge("pgn_bytes_per_second", size / elapsed, parser=parser)
+    return df
+
+
+def _pgn_to_dataframe(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    verbose: bool,
+    workers: int,
+    chunk_size: int,
+    parser: Literal["chess", "scanner"],
+    accumulator: Optional[GameAccumulator],
+) -> pd.DataFrame:
+
+    if is_compressed(pgn_filename):
+        return pd.DataFrame(
+            stream_headers_columns(
+                pgn_filename,
+                fields,
+                verbose=verbose,
+                threads=workers,
+                parser=parser,
+                accumulator=accumulator,
+            )
+        )
+
+    if workers <= 1:
+        if parser == "scanner":
+            data = scan_pgn_headers(pgn_filename, fields, verbose=verbose)
+        else:
+            with open(pgn_filename, "r") as file:
+                data = read_headers_columns(file, fields, verbose=verbose)
+        if accumulator is not None:
+            accumulator.update(data)
+        return pd.DataFrame(data)
+
+    size = os.path.getsize(pgn_filename)
+    n_chunks = max(workers, -(-size // chunk_size))
+    offsets = find_game_offsets(pgn_filename, n_chunks)
+    starts, ends = offsets[:-1], offsets[1:]
+
+    data: Dict[str, list] = {field: [] for field in fields}
+    if accumulator is None:
+        parse_chunk = partial(_parse_chunk, pgn_filename, fields, parser)
+    else:
+        parse_chunk = partial(
+            _parse_and_accumulate_chunk,
+            pgn_filename,
+            fields,
+            parser,
+            accumulator.empty(),
+        )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for i, chunk in enumerate(executor.map(parse_chunk, starts, ends)):
+            if accumulator is not None:
+                chunk, chunk_accumulator = chunk
+                accumulator.merge(chunk_accumulator)
+            for field in fields:
+                data[field].extend(chunk[field])
+            metrics.count("pgn_chunks", parser=parser)
+            metrics.gauge("pgn_chunks_pending", len(starts) - i - 1, parser=parser)
+            if verbose:
+                n_games = len(data[fields[0]])
+                print(f"Parsed chunk {i + 1}/{len(starts)} ({n_games} games)")
     return pd.DataFrame(data)
 
 
+def _get_accumulator(name: str, min_elo: int, max_elo: int) -> GameAccumulator:
+    site = get_database_config(name)["site"]
+    return GameAccumulator(min_elo=min_elo, max_elo=max_elo, site=site)
+
+
 def pgn_to_csv(
-    pgn_filename: Union[Path, str], fields: List[str], verbose: bool = False
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    verbose: bool = False,
+    workers: int = 1,
+    parser: Literal["chess", "scanner"] = "chess",
+    min_elo: int = 500,
+    max_elo: int = 4000,
 ) -> None:
 
-    name = Path(pgn_filename).stem
-    df = pgn_to_dataframe(pgn_filename, fields, verbose=verbose)
+    name = strip_compression_suffix(pgn_filename).stem
+    accumulator = _get_accumulator(name, min_elo, max_elo)
+    df = pgn_to_dataframe(
+        pgn_filename,
+        fields,
+        verbose=verbose,
+        workers=workers,
+        parser=parser,
+        accumulator=accumulator,
+    )
     df.to_csv(ARTIFACTS_DIR / (name + ".csv"), index=False)
+    register_games(name, df)
+    write_accumulated(name, accumulator)
+
+
+def pgn_to_parquet(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    verbose: bool = False,
+    workers: int = 1,
+    parser: Literal["chess", "scanner"] = "chess",
+    min_elo: int = 500,
+    max_elo: int = 4000,
+) -> None:
+
+    name = strip_compression_suffix(pgn_filename).stem
+    accumulator = _get_accumulator(name, min_elo, max_elo)
+    df = pgn_to_dataframe(
+        pgn_filename,
+        fields,
+        verbose=verbose,
+        workers=workers,
+        parser=parser,
+        accumulator=accumulator,
+    )
+    write_games(df, name)
+    write_accumulated(name, accumulator)
+
+
+def pgn_to_artifact(
+    pgn_filename: Union[Path, str],
+    fields: List[str],
+    verbose: bool = False,
+    workers: int = 1,
+    parser: Literal["chess", "scanner"] = "chess",
+    output_format: Literal["csv", "parquet"] = "csv",
+    min_elo: int = 500,
+    max_elo: int = 4000,
+) -> None:
+    """Write the games, player registry, `_elo_data` and edge artifacts of a PGN.
+
+    All of them come out of a single pass over the games.
+    """
+    if output_format == "csv":
+        to_artifact = pgn_to_csv
+    elif output_format == "parquet":
+        to_artifact = pgn_to_parquet
+    else:
+        raise ValueError("output_format must be in ['csv', 'parquet']")
+    to_artifact(
+        pgn_filename,
+        fields,
+        verbose,
+        workers=workers,
+        parser=parser,
+        min_elo=min_elo,
+        max_elo=max_elo,
+    )
+
+
+def get_checkpoint_filename(name: str) -> Path:
+    return ARTIFACTS_DIR / f"{name}_checkpoint.json"
+
+
+def read_checkpoint(name: str) -> Dict[str, Any]:
+    filename = get_checkpoint_filename(name)
+    if not filename.is_file():
+        return {"files": {}}
+    with open(filename, "r") as file:
+        return json.load(file)
+
+
+def write_checkpoint(name: str, checkpoint: Dict[str, Any]) -> None:
+    filename = get_checkpoint_filename(name)
+    tmp_filename = filename.with_suffix(".json.tmp")
+    with open(tmp_filename, "w") as file:
+        json.dump(checkpoint, file, indent=2)
+    os.replace(tmp_filename, filename)
+
+
+def ingest_incremental(
+    pgn_path: Union[Path, str],
+    fields: List[str],
+    name: Optional[str] = None,
+    verbose: bool = False,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    parser: Literal["chess", "scanner"] = "scanner",
+) -> int:
+    """Append the games not yet parsed to the partitioned parquet artifact.
+
+    `pgn_path` is either a PGN file that only grows by appending games, or a
+    directory of PGN files. The byte offset and game count reached in each file
+    are checkpointed after every partition, so an interrupted run resumes from
+    the last partition written. The `_elo_data` artifact is then recomputed
+    from every game, and edge tables are left to be rebuilt from the games.
+    Returns the number of new games.
+    """
+    pgn_path = Path(pgn_path)
+    if is_compressed(pgn_path):
+        raise ValueError("Incremental ingestion needs an uncompressed PGN")
+    name = pgn_path.stem if name is None else name
+    if pgn_path.is_dir():
+        pgn_filenames = sorted(p for p in pgn_path.iterdir() if p.suffix == ".pgn")
+    else:
+        pgn_filenames = [pgn_path]
+
+    checkpoint = read_checkpoint(name)
+    new_games = 0
+    for pgn_filename in pgn_filenames:
+        state = checkpoint["files"].get(pgn_filename.name, {"offset": 0, "games": 0})
+        size = os.path.getsize(pgn_filename)
+        if size < state["offset"]:
+            raise ValueError(
+                f"{pgn_filename} is smaller than its checkpoint, was it rewritten?"
+            )
+        if size == state["offset"]:
+            continue
+        n_chunks = -(-(size - state["offset"]) // chunk_size)
+        offsets = find_game_offsets(pgn_filename, n_chunks, start=state["offset"])
+        starts, ends = offsets[:-1], offsets[1:]
+        parse_chunk = partial(_parse_chunk, pgn_filename, fields, parser)
+
+        with ExitStack() as stack:
+            mapper = map
+            if workers > 1:
+                mapper = stack.enter_context(ProcessPoolExecutor(workers)).map
+            for start, end, chunk in zip(
+                starts, ends, mapper(parse_chunk, starts, ends)
+            ):
+                df = pd.DataFrame(chunk, columns=fields)
+                write_games_partition(df, name, f"{pgn_filename.stem}-{start:015d}")
+                state = {"offset": end, "games": state["games"] + len(df)}
+                checkpoint["files"][pgn_filename.name] = state
+                write_checkpoint(name, checkpoint)
+                new_games += len(df)
+                if verbose:
+                    print(f"{pgn_filename.name}: {state['games']} games, offset {end}")
+    if new_games:
+        # Edges written by a full ingestion no longer cover every game, so they
+        # are rebuilt from the games artifact instead, and so is the Elo data
+        for filename in ARTIFACTS_DIR.glob(f"{name}_edges_*.csv"):
+            filename.unlink()
+        write_elo_data(name)
+    return new_games
+
+
+def get_pgn_filename(database: str) -> Path:
+    return DATA_DIR / get_database_config(database)["pgn"]
+
+
+def get_fields(database: str) -> List[str]:
+    site = get_database_config(database)["site"]
+    return OM_OTB_FIELDS if site is None else OM_PORTAL_FIELDS
 
 
-def parse_om_otb():
-    fields = [
-        "White",
-        "Black",
-        "WhiteElo",
-        "BlackElo",
-        "Result",
-        "ECO",
-        "PlyCount",
-        "Date",
-    ]
+def parse_om(
+    database: str,
+    fields: List[str],
+    workers: int = 1,
+    parser: Literal["chess", "scanner"] = "chess",
+    output_format: Literal["csv", "parquet"] = "csv",
+    incremental: bool = False,
+):
+    pgn_filename = get_pgn_filename(database)
+    if incremental:
+        ingest_incremental(
+            pgn_filename, fields, verbose=True, workers=workers, parser=parser
+        )
+        return
+    pgn_to_artifact(
+        pgn_filename,
+        fields,
+        verbose=True,
+        workers=workers,
+        parser=parser,
+        output_format=output_format,
+    )
 
-    pgn_filename = DATA_DIR / "om_datasets" / "OM_OTB_201609.pgn"
-    pgn_to_csv(pgn_filename, fields, verbose=True)
 
+def parse_om_otb(
+    workers: int = 1,
+    parser: Literal["chess", "scanner"] = "chess",
+    output_format: Literal["csv", "parquet"] = "csv",
+    incremental: bool = False,
+):
+    parse_om(
+        "OM_OTB_201609",
+        OM_OTB_FIELDS,
+        workers=workers,
+        parser=parser,
+        output_format=output_format,
+        incremental=incremental,
+    )
 
-def parse_om_portal():
-    fields = [
-        "White",
-        "Black",
-        "WhiteElo",
-        "BlackElo",
-        "Result",
-        "ECO",
-        "PlyCount",
-        "Date",
-        "Site",
-    ]
 
-    pgn_filename = DATA_DIR / "om_datasets" / "OM_Portal_201510.pgn"
-    pgn_to_csv(pgn_filename, fields, verbose=True)
+def parse_om_portal(
+    workers: int = 1,
+    parser: Literal["chess", "scanner"] = "chess",
+    output_format: Literal["csv", "parquet"] = "csv",
+    incremental: bool = False,
+):
+    parse_om(
+        "OM_Portal_201510",
+        OM_PORTAL_FIELDS,
+        workers=workers,
+        parser=parser,
+        output_format=output_format,
+        incremental=incremental,
+    )
 
 
 if __name__ == "__main__":
@@ -84,10 +610,24 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--parse-portal", action="store_true")
     parser.add_argument("--parse-otb", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--parser", choices=["chess", "scanner"], default="chess")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--incremental", action="store_true")
     args = parser.parse_args()
 
     if args.parse_otb:
-        parse_om_otb()
+        parse_om_otb(
+            workers=args.workers,
+            parser=args.parser,
+            output_format=args.format,
+            incremental=args.incremental,
+        )
 
     if args.parse_portal:
-        parse_om_portal()
+        parse_om_portal(
+            workers=args.workers,
+            parser=args.parser,
+            output_format=args.format,
+            incremental=args.incremental,
+        )
@@ -0,0 +1,395 @@
+import multiprocessing
+import time
+import traceback
+from functools import partial
+from multiprocessing.connection import wait
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chessnet import metrics
+from chessnet.cache import MAX_CACHE_BYTES, Stage, run_stage
+from chessnet.communities import (
+    get_membership_filename,
+    get_membership_metadata_filename,
+    get_modularity_filename,
+    schedule_communities,
+    write_louvain_q_values,
+)
+from chessnet.csr import get_csr_filename, write_csr_graph
+from chessnet.games import get_games_filename
+from chessnet.graphs import (
+    create_randomized_graph,
+    create_rewired_graph,
+    csv_to_edgelist,
+    get_degree_and_elo_filename,
+    get_edgelist_filename,
+    get_edges_filename,
+    get_gml_filename,
+    get_pickle_filename,
+    get_randomized_filename,
+    get_rewired_filename,
+    write_degree_and_elo,
+    write_gml,
+    write_pickle,
+)
+from chessnet.mixing import get_mixing_filename, write_category_mixing
+from chessnet.pgn import get_fields, get_pgn_filename, pgn_to_artifact
+from chessnet.players import get_player_registry_filename
+from chessnet.rich_club import (
+    get_rich_club_filename,
+    write_rich_club,
+    write_rich_club_elo,
+)
+from chessnet.statistics import get_elo_data_filename
+
+FAILED = ["failed", "skipped"]
+
+
+def get_stages(
+    database: str,
+    output_format: Literal["csv", "parquet"] = "csv",
+    parser: Literal["chess", "scanner"] = "chess",
+    workers: int = 1,
+    min_elo: int = 500,
+    max_elo: int = 4000,
+    nswap_ecount_times: float = 10.0,
+    seed: Optional[int] = None,
+    samples: Optional[int] = 30,
+    min_res: float = 0.1,
+    max_res: float = 100,
+    community_samples: int = 100,
+) -> List[Stage]:
+    """Stages that take a database from its PGN file to the analysis artifacts.
+
+    Stages are named `{database}/{step}`. Everything a stage reads is one of its
+    inputs, so changing a parameter only invalidates the stages downstream.
+    """
+    fields = get_fields(database)
+    pgn = get_pgn_filename(database)
+    games = get_games_filename(database, output_format)
+    players = get_player_registry_filename(database)
+    elo_data = get_elo_data_filename(database)
+    edges = get_edges_filename(database, min_elo, max_elo)
+    graph = get_pickle_filename(database)
+    rewired = get_rewired_filename(database, nswap_ecount_times)
+    memberships = [
+        get_membership_filename(database),
+        get_membership_metadata_filename(database),
+    ]
+    stages = [
+        Stage(
+            "games",
+            partial(
+                pgn_to_artifact,
+                pgn,
+                fields,
+                verbose=True,
+                workers=workers,
+                parser=parser,
+                output_format=output_format,
+                min_elo=min_elo,
+                max_elo=max_elo,
+            ),
+            inputs=[pgn],
+            outputs=[games, players, elo_data, edges],
+            params={
+                "fields": fields,
+                "output_format": output_format,
+                "min_elo": min_elo,
+                "max_elo": max_elo,
+            },
+            workers=workers,
+        ),
+        Stage(
+            "graph",
+            partial(write_pickle, database, min_elo=min_elo, max_elo=max_elo),
+            inputs=[edges, players, elo_data],
+            outputs=[graph],
+            params={"min_elo": min_elo, "max_elo": max_elo},
+        ),
+        Stage(
+            "degree_and_elo",
+            partial(write_degree_and_elo, database),
+            inputs=[graph, elo_data],
+            outputs=[get_degree_and_elo_filename(database)],
+        ),
+        Stage(
+            "rewired",
+            partial(
+                create_rewired_graph,
+                database,
+                nswap_ecount_times=nswap_ecount_times,
+                seed=seed,
+            ),
+            inputs=[graph],
+            outputs=[rewired],
+            params={"nswap_ecount_times": nswap_ecount_times, "seed": seed},
+        ),
+        Stage(
+            "edgelist",
+            partial(csv_to_edgelist, database, min_elo=min_elo, max_elo=max_elo),
+            inputs=[edges, players, elo_data],
+            outputs=[get_edgelist_filename(database)],
+            params={"min_elo": min_elo, "max_elo": max_elo},
+        ),
+        Stage(
+            "randomized",
+            partial(create_randomized_graph, database),
+            inputs=[get_edgelist_filename(database)],
+            outputs=[get_randomized_filename(database)],
+        ),
+        Stage(
+            "gml",
+            partial(write_gml, database),
+            inputs=[graph],
+            outputs=[get_gml_filename(database)],
+        ),
+        Stage(
+            "gml_rewired",
+            partial(
+                write_gml,
+                database,
+                rewired=True,
+                nswap_ecount_times=nswap_ecount_times,
+            ),
+            inputs=[rewired],
+            outputs=[get_gml_filename(database, rewired=True)],
+        ),
+        Stage(
+            "csr",
+            partial(write_csr_graph, database),
+            inputs=[graph],
+            outputs=[get_csr_filename(database)],
+        ),
+        Stage(
+            "csr_rewired",
+            partial(
+                write_csr_graph,
+                database,
+                rewired=True,
+                nswap_ecount_times=nswap_ecount_times,
+            ),
+            inputs=[rewired],
+            outputs=[get_csr_filename(database, True, nswap_ecount_times)],
+        ),
+        Stage(
+            "mixing",
+            partial(write_category_mixing, database),
+            inputs=[get_csr_filename(database)],
+            outputs=[get_mixing_filename(database)],
+        ),
+        Stage(
+            "rich_club",
+            partial(
+                write_rich_club,
+                database,
+                samples=samples,
+                nswap_ecount_times=nswap_ecount_times,
+            ),
+            inputs=[graph, rewired],
+            outputs=[get_rich_club_filename(database, samples)],
+            params={"samples": samples},
+        ),
+        Stage(
+            "rich_club_elo",
+            partial(
+                write_rich_club_elo,
+                database,
+                samples=samples,
+                nswap_ecount_times=nswap_ecount_times,
+            ),
+            inputs=[graph, rewired],
+            outputs=[get_rich_club_filename(database, samples, elo=True)],
+            params={"samples": samples},
+        ),
+        Stage(
+            "communities",
+            partial(
+                schedule_communities,
+                [database],
+                min_res=min_res,
+                max_res=max_res,
+                samples=community_samples,
+                workers=workers,
+            ),
+            inputs=[graph],
+            outputs=memberships,
+            params={
+                "min_res": min_res,
+                "max_res": max_res,
+                "samples": community_samples,
+            },
+            resumable=True,
+            workers=workers,
+        ),
+        Stage(
+            "modularities",
+            partial(write_louvain_q_values, database),
+            inputs=memberships + [graph],
+            outputs=[get_modularity_filename(database)],
+        ),
+    ]
+    for stage in stages:
+        stage.name = f"{database}/{stage.name}"
+    return stages
+
+
+def get_stage_dependencies(stages: List[Stage]) -> Dict[str, List[str]]:
+    """Names of the stages that produce the inputs of every stage."""
+    producers = {path: stage.name for stage in stages for path in stage.outputs}
+    return {
+        stage.name: list(
+            dict.fromkeys(
+                producers[path]
+                for path in stage.inputs
+                if path in producers and producers[path] != stage.name
+            )
+        )
+        for stage in stages
+    }
+
+
+def select_stages(stages: List[Stage], targets: Optional[List[str]]) -> List[Stage]:
+    """The target stages and everything they depend on, in dependency order.
+
+    A target matches a stage name or its step, e.g. `rich_club` selects the
+    rich-club stage of every database.
+    """
+    dependencies = get_stage_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    if targets is None:
+        wanted = list(by_name)
+    else:
+        wanted = [
+            name
+            for name in by_name
+            if name in targets or name.split("/", 1)[-1] in targets
+        ]
+        unknown = [
+            target
+            for target in targets
+            if not any(target in (name, name.split("/", 1)[-1]) for name in by_name)
+        ]
+        if unknown:
+            raise ValueError(f"Unknown stages: {unknown}")
+
+    ordered: List[str] = []
+
+    def visit(name: str, path: tuple) -> None:
+        if name in ordered:
+            return
+        if name in path:
+            raise ValueError(f"Stage cycle: {' -> '.join(path + (name,))}")
+        for dependency in dependencies[name]:
+            visit(dependency, path + (name,))
+        ordered.append(name)
+
+    for name in wanted:
+        visit(name, ())
+    return [by_name[name] for name in ordered]
+
+
+def _run_stage_process(stage: Stage, force: bool, max_bytes: int, connection) -> None:
+    start = time.perf_counter()
+    report: Dict[str, Any] = {"stage": stage.name, "error": None}
+    try:
+        with metrics.stage(stage.name):
+            report["status"] = run_stage(stage, force=force, max_bytes=max_bytes)
+            metrics.count("stages", status=report["status"])
+    except Exception:
+        report["status"] = "failed"
+        report["error"] = traceback.format_exc()
+        metrics.count("stages", stage=stage.name, status="failed")
+        metrics.flush()
+    report["seconds"] = time.perf_counter() - start
+    report["peak_rss"] = metrics.peak_rss()
+    connection.send(report)
+    connection.close()
+
+
+def format_reports(reports: List[Dict[str, Any]]) -> str:
+    df = pd.DataFrame(reports, columns=["stage", "status", "seconds", "peak_rss"])
+    df["seconds"] = df["seconds"].round(1)
+    df["peak_rss"] = (df["peak_rss"] / 2**20).round(0).astype("Int64")
+    return df.rename(columns={"peak_rss": "peak_rss_mb"}).to_string(index=False)
+
+
+def run_pipeline(
+    stages: List[Stage],
+    targets: Optional[List[str]] = None,
+    workers: int = 1,
+    force: bool = False,
+    max_bytes: int = MAX_CACHE_BYTES,
+    verbose: bool = True,
+) -> List[Dict[str, Any]]:
+    """Bring the target stages up to date, running independent stages concurrently.
+
+    Each stage runs in its own process, and stages are started as soon as the
+    stages they depend on are done, as long as their `workers` fit in the budget
+    of `workers` processes. Stages downstream of a failure are skipped. Returns
+    the status, wall time and peak RSS (in bytes) of every stage.
+    """
+    selected = select_stages(stages, targets)
+    dependencies = get_stage_dependencies(selected)
+    budget = max(workers, 1)
+    context = multiprocessing.get_context()
+    pending = {stage.name: stage for stage in selected}
+    running: Dict[Any, Tuple[Any, Stage, int]] = {}
+    reports: Dict[str, Dict[str, Any]] = {}
+    used = 0
+    while pending or running:
+        for name, stage in list(pending.items()):
+            done = [reports.get(dependency) for dependency in dependencies[name]]
+            if any(report and report["status"] in FAILED for report in done):
+                reports[name] = {
+                    "stage": name,
+                    "status": "skipped",
+                    "error": None,
+                    "seconds": 0.0,
+                    "peak_rss": 0,
+                }
+                del pending[name]
+                continue
+            cost = min(max(stage.workers, 1), budget)
+            if not all(done) or used + cost > budget:
+                continue
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_stage_process,
+                args=(stage, force, max_bytes, sender),
+            )
+            process.start()
+            sender.close()
+            running[receiver] = (process, stage, cost)
+            used += cost
+            del pending[name]
+
+        # Skipping the last pending stages can leave nothing to wait for
+        if not running:
+            continue
+        for receiver in wait(list(running)):
+            process, stage, cost = running.pop(receiver)
+            try:
+                report = receiver.recv()
+            except EOFError:
+                report = {
+                    "stage": stage.name,
+                    "status": "failed",
+                    "error": "The stage process died",
+                    "seconds": np.nan,
+                    "peak_rss": 0,
+                }
+            process.join()
+            used -= cost
+            reports[stage.name] = report
+            if verbose:
+                seconds, peak_rss = report["seconds"], report["peak_rss"] / 2**20
+                print(
+                    f"{stage.name}: {report['status']} "
+                    f"({seconds:.1f}s, peak RSS {peak_rss:.0f} MB)"
+                )
+                if report["error"]:
+                    print(report["error"])
+    return [reports[stage.name] for stage in selected]
@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from chessnet.utils import ARTIFACTS_DIR
+
+
+def get_player_registry_filename(database: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_players.csv"
+
+
+def read_player_registry(database: str) -> pd.Index:
+    filename = get_player_registry_filename(database)
+    if not filename.is_file():
+        return pd.Index([], dtype=object, name="Player")
+    players = pd.read_csv(filename, keep_default_na=False, dtype={"Player": object})
+    return pd.Index(players["Player"], name="Player")
+
+
+def update_player_registry(database: str, names: Iterable) -> pd.Index:
+    """Append unseen player names to the registry of a database.
+
+    The position of a name in the registry is its dense int32 player ID, so IDs
+    are never reassigned: new names are appended in order of first appearance.
+    """
+    registry = read_player_registry(database)
+    names = pd.Index(pd.unique(pd.Series(list(names), dtype=object).dropna()))
+    new_names = names[~names.isin(registry)]
+    if len(new_names) == 0:
+        return registry
+    registry = registry.append(new_names).rename("Player")
+    filename = get_player_registry_filename(database)
+    tmp_filename = filename.with_suffix(".csv.tmp")
+    pd.DataFrame({"Player": registry}).to_csv(tmp_filename, index=False)
+    os.replace(tmp_filename, filename)
+    return registry
+
+
+def register_games(database: str, df: pd.DataFrame) -> pd.Index:
+    columns = [col for col in ["White", "Black"] if col in df.columns]
+    return update_player_registry(database, df[columns].to_numpy().ravel())
+
+
+def encode_players(names: pd.Series, registry: pd.Index) -> np.ndarray:
+    """Map player names to their IDs, with -1 for missing or unknown names."""
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        codes = names.cat.codes.to_numpy()
+        category_ids = registry.get_indexer(names.cat.categories)
+        ids = np.where(codes >= 0, category_ids[codes], -1)
+    else:
+        ids = registry.get_indexer(names)
+    return ids.astype(np.int32)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from chessnet import metrics
+
+
+def _edge_keys(source: np.ndarray, target: np.ndarray, n: int) -> np.ndarray:
+    return np.minimum(source, target) * n + np.maximum(source, target)
+
+
+def _in_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    position = np.searchsorted(sorted_values, values)
+    position[position == len(sorted_values)] = 0
+    return sorted_values[position] == values
+
+
+def _run_key(edges: np.ndarray, nswap: int, seed) -> str:
+    """Hash of the input edges, `nswap` and the seed, which a checkpoint must match."""
+    if seed is not None:
+        seed = np.random.default_rng(seed).bit_generator.state
+    digest = hashlib.sha256(np.ascontiguousarray(edges).tobytes())
+    digest.update(json.dumps({"nswap": nswap, "seed": seed}).encode())
+    return digest.hexdigest()
+
+
+def _load_checkpoint(filename: Path, run_key: str) -> Optional[Dict]:
+    """The saved state, or None if it belongs to a different run."""
+    with np.load(filename) as state:
+        if "run_key" not in state.files or str(state["run_key"]) != run_key:
+            return None
+        return {name: state[name] for name in state.files}
+
+
+def _save_checkpoint(
+    filename: Path, run_key: str, edges: np.ndarray, swaps: int, tries: int, rng
+) -> None:
+    tmp_filename = filename.with_name(filename.name + ".tmp")
+    with open(tmp_filename, "wb") as file:
+        np.savez(
+            file,
+            run_key=np.array(run_key),
+            edges=edges,
+            swaps=swaps,
+            tries=tries,
+            rng_state=np.array(json.dumps(rng.bit_generator.state)),
+        )
+    os.replace(tmp_filename, filename)
+
+
+def double_edge_swap(
+    edges: np.ndarray,
+    nswap: int,
+    max_tries: Optional[int] = None,
+    seed: Union[None, int, np.random.Generator] = None,
+    batch_size: Optional[int] = None,
+    checkpoint: Optional[Path] = None,
+    checkpoint_interval: float = 600.0,
+    verbose: bool = False,
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Degree-preserving rewiring of an undirected simple graph.
+
+    Swaps (u, v), (x, y) -> (u, y), (x, v) are proposed in batches of disjoint
+    edge pairs and accepted when they create neither self-loops nor multi-edges,
+    checked against the sorted array of edge keys. Row i of the returned array
+    is the rewired version of row i of `edges`, so edge attributes stay aligned.
+    With `checkpoint`, progress is saved periodically and resumed from there,
+    provided it was saved for the same input edges, `nswap` and `seed`; any
+    other checkpoint is ignored and overwritten.
+    """
+    edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    run_key = _run_key(edges, nswap, seed)
+    rng = np.random.default_rng(seed)
+    m = len(edges)
+    n = int(edges.max()) + 1 if m else 0
+    max_tries = 10 * nswap if max_tries is None else max_tries
+    batch_size = max(1, m // 10) if batch_size is None else batch_size
+    swaps = tries = 0
+    state = None
+    if checkpoint is not None and Path(checkpoint).is_file():
+        state = _load_checkpoint(Path(checkpoint), run_key)
+        if state is None and verbose:
+            print(f"Ignoring checkpoint {checkpoint} of a different run")
+    if state is not None:
+        edges, swaps, tries = state["edges"], int(state["swaps"]), int(state["tries"])
+        rng.bit_generator.state = json.loads(str(state["rng_state"]))
+
+    resumed_swaps = swaps
+    start = last_checkpoint = time.perf_counter()
+    keys = np.sort(_edge_keys(edges[:, 0], edges[:, 1], n))
+    while swaps < nswap and tries < max_tries and m >= 2:
+        b = min(batch_size, m // 2, max_tries - tries)
+        pairs = rng.choice(m, 2 * b, replace=False)
+        i, j = pairs[:b], pairs[b:]
+        u, v = edges[i, 0], edges[i, 1]
+        x, y = edges[j, 0], edges[j, 1]
+        flip = rng.random(b) < 0.5
+        x, y = np.where(flip, y, x), np.where(flip, x, y)
+        new_i = _edge_keys(u, y, n)
+        new_j = _edge_keys(x, v, n)
+        valid = (u != y) & (x != v) & (new_i != new_j)
+        valid &= ~_in_sorted(new_i, keys) & ~_in_sorted(new_j, keys)
+        # Two proposals in the same batch must not create the same edge
+        new_keys = np.concatenate([new_i[valid], new_j[valid]])
+        unique_keys, counts = np.unique(new_keys, return_counts=True)
+        repeated = unique_keys[counts > 1]
+        valid &= ~np.isin(new_i, repeated) & ~np.isin(new_j, repeated)
+        accepted = np.flatnonzero(valid)[: nswap - swaps]
+
+        edges[i[accepted], 1] = y[accepted]
+        edges[j[accepted], 0] = x[accepted]
+        edges[j[accepted], 1] = v[accepted]
+        keys = np.sort(_edge_keys(edges[:, 0], edges[:, 1], n))
+        swaps += len(accepted)
+        tries += b
+
+        now = time.perf_counter()
+        if checkpoint is not None and now - last_checkpoint > checkpoint_interval:
+            _save_checkpoint(Path(checkpoint), run_key, edges, swaps, tries, rng)
+            last_checkpoint = now
+            metrics.gauge("rewiring_progress", swaps / nswap)
+            if verbose:
+                print(f"Checkpoint: {swaps}/{nswap} swaps, {tries} tries")
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "swaps": swaps,
+        "tries": tries,
+        "acceptance_rate": swaps / tries if tries else np.nan,
+        "swaps_per_second": (swaps - resumed_swaps) / elapsed if elapsed else np.nan,
+    }
+    metrics.count("rewiring_swaps", swaps - resumed_swaps)
+    metrics.count("rewiring_seconds", elapsed)
+    for name in ["acceptance_rate", "swaps_per_second"]:
+        metrics.gauge(f"rewiring_{name}", stats[name])
+    if verbose:
+        print(
+            f"{swaps} swaps in {tries} tries "
+            f"(acceptance rate {stats['acceptance_rate']:.3f}, "
+            f"{stats['swaps_per_second']:.0f} swaps/s)"
+        )
+    if checkpoint is not None and Path(checkpoint).is_file():
+        os.remove(checkpoint)
+    return edges, stats
@@ -1,15 +1,25 @@
-import copy
-from typing import List, Tuple, Optional
+from __future__ import annotations
+
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Literal, Optional, Sequence, Tuple
 
-import igraph as ig
 import numpy as np
 import pandas as pd
 
+from chessnet import metrics
 from chessnet.graphs import read_pickle, read_rewired_graph
 from chessnet.utils import ARTIFACTS_DIR
 
+if TYPE_CHECKING:
+    import igraph as ig
+
 
-def compute_rich_club(g: ig.Graph, g_ran: ig.Graph, samples: int = 100) -> pd.DataFrame:
+def compute_rich_club(
+    g: ig.Graph, g_ran: ig.Graph, samples: Optional[int] = 100
+) -> pd.DataFrame:
     degrees, densities = rich_club(g, samples=samples)
     _, rand_densities = rich_club(
         g_ran,
@@ -22,7 +32,7 @@ def compute_rich_club(g: ig.Graph, g_ran: ig.Graph, samples: int = 100) -> pd.Da
 
 
 def compute_rich_club_elo(
-    g: ig.Graph, g_ran: ig.Graph, samples: int = 100
+    g: ig.Graph, g_ran: ig.Graph, samples: Optional[int] = 100
 ) -> pd.DataFrame:
     # degree_and_elo = [(v.degree(), v["MeanElo"]) for v in g.vs()]
     # sorted_elo = list(zip(*sorted(degree_and_elo, key=lambda x: x[0])))[1]
@@ -34,13 +44,11 @@ def compute_rich_club_elo(
     # for index, elo in zip(sorted_nodes, sorted_elo):
     #    mean_elo[index] = elo
     # h.vs["MeanElo"] = mean_elo
-    g_ran_elo = copy.deepcopy(g)
-    shuffled_elo = g.vs["MeanElo"]
-    np.random.shuffle(shuffled_elo)
-    g_ran_elo.vs["MeanElo"] = shuffled_elo
+    g_ran_elo = g.copy()
+    g_ran_elo.vs["MeanElo"] = np.random.permutation(g.vs["MeanElo"]).tolist()
     elo_values, densities = rich_club_elo(g, samples=samples)
-    _, ran_densities = rich_club_elo(g_ran, samples=samples)
-    _, ran_elo_densities = rich_club_elo(g_ran_elo, samples=samples)
+    _, ran_densities = rich_club_elo(g_ran, elo_values=elo_values)
+    _, ran_elo_densities = rich_club_elo(g_ran_elo, elo_values=elo_values)
     df = pd.DataFrame(
         {
             "elo": elo_values,
@@ -54,66 +62,286 @@ def compute_rich_club_elo(
     return df
 
 
+def rich_club_counts(
+    values: np.ndarray, edges: np.ndarray, thresholds: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Number of vertices and edges of the subgraphs induced by values > threshold.
+
+    An edge belongs to the subgraph iff the smaller value of its endpoints is
+    above the threshold, so both counts are cumulative counts over sorted values.
+    """
+    values = np.asarray(values)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    unique_values, value_counts = np.unique(values, return_counts=True)
+    edge_min = np.minimum(values[edges[:, 0]], values[edges[:, 1]])
+    edge_counts = np.bincount(
+        np.searchsorted(unique_values, edge_min), minlength=len(unique_values)
+    )
+    n_le = np.concatenate([[0], np.cumsum(value_counts)])
+    m_le = np.concatenate([[0], np.cumsum(edge_counts)])
+    position = np.searchsorted(unique_values, thresholds, side="right")
+    return len(values) - n_le[position], len(edges) - m_le[position]
+
+
+def rich_club_density(n: np.ndarray, m: np.ndarray) -> np.ndarray:
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(n > 1, m / (n * (n - 1) / 2), np.nan)
+
+
+def rich_club_curve(
+    g: ig.Graph, attribute: Optional[str] = None, thresholds=None
+) -> pd.DataFrame:
+    values = np.array(g.degree() if attribute is None else g.vs[attribute])
+    if thresholds is None:
+        thresholds = np.unique(values)
+    n, m = rich_club_counts(values, np.array(g.get_edgelist()), thresholds)
+    return pd.DataFrame(
+        {"threshold": thresholds, "n": n, "m": m, "phi": rich_club_density(n, m)}
+    )
+
+
+def get_thresholds(
+    g: ig.Graph, attribute: Optional[str] = None, samples: Optional[int] = 100
+) -> np.ndarray:
+    values = g.degree() if attribute is None else g.vs[attribute]
+    if samples is None:
+        return np.unique(values)
+    if attribute is None:
+        return np.logspace(
+            np.log10(min(values)), np.log10(max(values) - 1), samples, endpoint=True
+        )
+    return np.linspace(min(values), max(values) - 1, samples, endpoint=True)
+
+
 def rich_club(
-    g: ig.Graph, samples: int = 100, degrees: Optional[List[int]] = None
+    g: ig.Graph, samples: Optional[int] = 100, degrees: Optional[List[int]] = None
 ) -> Tuple[List[int], List[float]]:
-    mink = min(g.degree())
-    maxk = max(g.degree())
-    density_values = []
     if degrees is None:
-        degrees = list(
-            np.logspace(np.log10(mink), np.log10(maxk - 1), samples, endpoint=True)
-        )
-    for k in degrees:
-        subgraph_nodes = g.vs.select(_degree_gt=k)
-        h = g.subgraph(subgraph_nodes)
-        m = h.ecount()
-        n = h.vcount()
-        density = m / (n * (n - 1) / 2) if n > 1 else np.nan
-        density_values.append(density)
-    return degrees, density_values
+        degrees = list(get_thresholds(g, samples=samples))
+    density_values = rich_club_curve(g, thresholds=np.array(degrees))["phi"]
+    return degrees, density_values.tolist()
 
 
 def rich_club_elo(
-    g: ig.Graph, samples: int = 100, elo_values: Optional[List[int]] = None
+    g: ig.Graph, samples: Optional[int] = 100, elo_values: Optional[List[int]] = None
 ) -> Tuple[List[int], List[float]]:
-    min_elo = min(g.vs["MeanElo"])
-    max_elo = max(g.vs["MeanElo"])
-    density_values = []
     if elo_values is None:
-        elo_values = list(np.linspace(min_elo, max_elo - 1, samples, endpoint=True))
-    for elo in elo_values:
-        subgraph_nodes = g.vs.select(MeanElo_gt=elo)
-        h = g.subgraph(subgraph_nodes)
-        m = h.ecount()
-        n = h.vcount()
-        density = m / (n * (n - 1) / 2) if n > 1 else np.nan
-        density_values.append(density)
-    return elo_values, density_values
-
-
-def write_rich_club(database: str, samples: int = 100) -> None:
+        elo_values = list(get_thresholds(g, "MeanElo", samples=samples))
+    density_values = rich_club_curve(g, "MeanElo", np.array(elo_values))["phi"]
+    return elo_values, density_values.tolist()
+
+
+NullModel = Literal["rewire", "elo_shuffle"]
+
+_ensemble_graph: Optional[ig.Graph] = None
+
+
+class NullCurveAccumulator:
+    """Running mean/std (Welford) and quantiles of null-model rich-club curves.
+
+    Only the curves are kept for the quantiles, never the null graphs.
+    """
+
+    def __init__(self, n_samples: int, n_thresholds: int):
+        self.count = 0
+        self.mean = np.zeros(n_thresholds)
+        self.m2 = np.zeros(n_thresholds)
+        self.curves = np.full((n_samples, n_thresholds), np.nan)
+
+    def add(self, curve: np.ndarray) -> None:
+        self.curves[self.count] = curve
+        self.count += 1
+        delta = curve - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (curve - self.mean)
+
+    @property
+    def std(self) -> np.ndarray:
+        if self.count < 2:
+            return np.full_like(self.m2, np.nan)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+    def quantile(self, q: float) -> np.ndarray:
+        return np.quantile(self.curves[: self.count], q, axis=0)
+
+
+def _init_ensemble_worker(g: Optional[ig.Graph]) -> None:
+    global _ensemble_graph
+    _ensemble_graph = g
+
+
+def _null_rich_club(
+    attribute: Optional[str],
+    null_model: NullModel,
+    thresholds: np.ndarray,
+    nswap_ecount_times: float,
+    seed_sequence: np.random.SeedSequence,
+) -> np.ndarray:
+    g = _ensemble_graph
+    rng = np.random.default_rng(seed_sequence)
+    values = np.array(g.degree() if attribute is None else g.vs[attribute])
+    if null_model == "rewire":
+        h = g.copy()
+        # igraph draws its random numbers from the `random` module, whose state
+        # belongs to the caller
+        state = random.getstate()
+        try:
+            random.seed(int(rng.integers(2**63)))
+            h.rewire(n=int(nswap_ecount_times * g.ecount()), mode="simple")
+        finally:
+            random.setstate(state)
+        edges = np.array(h.get_edgelist())
+    elif null_model == "elo_shuffle":
+        values = rng.permutation(values)
+        edges = np.array(g.get_edgelist())
+    else:
+        raise ValueError("null_model must be in ['rewire', 'elo_shuffle']")
+    n, m = rich_club_counts(values, edges, thresholds)
+    return rich_club_density(n, m)
+
+
+def compute_rich_club_ensemble(
+    g: ig.Graph,
+    attribute: Optional[str] = None,
+    null_model: NullModel = "rewire",
+    n_null: int = 100,
+    seed: int = 0,
+    samples: Optional[int] = 100,
+    nswap_ecount_times: float = 10.0,
+    quantiles: Sequence[float] = (0.025, 0.975),
+    workers: int = 1,
+) -> pd.DataFrame:
+    """Normalize the rich-club curve against an ensemble of seeded null models.
+
+    Each null sample gets its own child of the master `seed`, so the result does
+    not depend on the number of workers.
+    """
+    thresholds = get_thresholds(g, attribute, samples)
+    phi = rich_club_curve(g, attribute, thresholds)["phi"].to_numpy()
+    accumulator = NullCurveAccumulator(n_null, len(thresholds))
+    seeds = np.random.SeedSequence(seed).spawn(n_null)
+    null_rich_club = partial(
+        _null_rich_club, attribute, null_model, thresholds, nswap_ecount_times
+    )
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_ensemble_worker,
+            initargs=(g,),
+        ) as executor:
+            for curve in executor.map(null_rich_club, seeds):
+                accumulator.add(curve)
+                metrics.count("rich_club_null_samples", null_model=null_model)
+    else:
+        _init_ensemble_worker(g)
+        try:
+            for curve in map(null_rich_club, seeds):
+                accumulator.add(curve)
+                metrics.count("rich_club_null_samples", null_model=null_model)
+        finally:
+            # Do not keep the graph alive after the call
+            _init_ensemble_worker(None)
+
+    df = pd.DataFrame(
+        {
+            "threshold": thresholds,
+            "phi": phi,
+            "null_mean": accumulator.mean,
+            "null_std": accumulator.std,
+        }
+    )
+    df["rho"] = df.phi / df.null_mean
+    for q in quantiles:
+        df[f"null_q{q}"] = accumulator.quantile(q)
+        df[f"rho_q{q}"] = df.phi / df[f"null_q{q}"]
+    return df
+
+
+def get_rich_club_filename(
+    database: str, samples: Optional[int] = 100, elo: bool = False
+) -> Path:
+    kind = "rich_club_elo" if elo else "rich_club"
+    suffix = "exact" if samples is None else f"samples{samples}"
+    return ARTIFACTS_DIR / f"{database}_{kind}_{suffix}.csv"
+
+
+def write_rich_club(
+    database: str, samples: Optional[int] = 100, nswap_ecount_times: float = 10.0
+) -> None:
     g = read_pickle(database)
-    g_ran = read_rewired_graph(database, nswap_ecount_times=10.0)
+    g_ran = read_rewired_graph(database, nswap_ecount_times=nswap_ecount_times)
     df = compute_rich_club(g, g_ran, samples=samples)
-    df.to_csv(ARTIFACTS_DIR / f"{database}_rich_club_samples{samples}.csv")
+    df.to_csv(get_rich_club_filename(database, samples))
 
 
-def read_rich_club(database: str, samples: int = 100) -> pd.DataFrame:
-    return pd.read_csv(
-        ARTIFACTS_DIR / f"{database}_rich_club_samples{samples}.csv"
-    ).dropna()
+def read_rich_club(database: str, samples: Optional[int] = 100) -> pd.DataFrame:
+    return pd.read_csv(get_rich_club_filename(database, samples)).dropna()
 
 
-def write_rich_club_elo(database: str, samples: int = 100) -> None:
+def write_rich_club_elo(
+    database: str, samples: Optional[int] = 100, nswap_ecount_times: float = 10.0
+) -> None:
     g = read_pickle(database)
-    g_ran = read_rewired_graph(database, nswap_ecount_times=10.0)
+    g_ran = read_rewired_graph(database, nswap_ecount_times=nswap_ecount_times)
     df = compute_rich_club_elo(g, g_ran, samples=samples)
-    df.to_csv(ARTIFACTS_DIR / f"{database}_rich_club_elo_samples{samples}.csv")
+    df.to_csv(get_rich_club_filename(database, samples, elo=True))
+
 
+def read_rich_club_elo(database: str, samples: Optional[int] = 100) -> pd.DataFrame:
+    return pd.read_csv(get_rich_club_filename(database, samples, elo=True))
 
-def read_rich_club_elo(database: str, samples: int = 100) -> pd.DataFrame:
-    return pd.read_csv(ARTIFACTS_DIR / f"{database}_rich_club_elo_samples{samples}.csv")
+
+def get_rich_club_ensemble_filename(
+    database: str,
+    elo: bool = False,
+    null_model: NullModel = "rewire",
+    n_null: int = 100,
+    seed: int = 0,
+    samples: Optional[int] = 100,
+) -> Path:
+    stem = get_rich_club_filename(database, samples, elo=elo).stem
+    return ARTIFACTS_DIR / f"{stem}_{null_model}_ensemble{n_null}_seed{seed}.csv"
+
+
+def write_rich_club_ensemble(
+    database: str,
+    elo: bool = False,
+    null_model: NullModel = "rewire",
+    n_null: int = 100,
+    seed: int = 0,
+    samples: Optional[int] = 100,
+    workers: int = 1,
+) -> None:
+    g = read_pickle(database)
+    df = compute_rich_club_ensemble(
+        g,
+        attribute="MeanElo" if elo else None,
+        null_model=null_model,
+        n_null=n_null,
+        seed=seed,
+        samples=samples,
+        workers=workers,
+    )
+    filename = get_rich_club_ensemble_filename(
+        database, elo, null_model, n_null, seed, samples
+    )
+    df.to_csv(filename, index=False)
+
+
+def read_rich_club_ensemble(
+    database: str,
+    elo: bool = False,
+    null_model: NullModel = "rewire",
+    n_null: int = 100,
+    seed: int = 0,
+    samples: Optional[int] = 100,
+) -> pd.DataFrame:
+    return pd.read_csv(
+        get_rich_club_ensemble_filename(
+            database, elo, null_model, n_null, seed, samples
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -126,16 +354,42 @@ if __name__ == "__main__":
     parser.add_argument("--rich-club-elo-otb", action="store_true")
     parser.add_argument("--rich-club-elo-portal", action="store_true")
     parser.add_argument("--samples", type=int, default=30)
+    parser.add_argument(
+        "--exact", action="store_true", help="Use every distinct degree/Elo value"
+    )
+    parser.add_argument("--ensemble", type=int, default=0, help="Null samples")
+    parser.add_argument(
+        "--null-model", choices=["rewire", "elo_shuffle"], default="rewire"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
     args = parser.parse_args()
+    samples = None if args.exact else args.samples
 
-    if args.rich_club_otb:
-        write_rich_club("OM_OTB_201609", samples=args.samples)
+    def run(database: str, elo: bool) -> None:
+        if args.ensemble:
+            write_rich_club_ensemble(
+                database,
+                elo=elo,
+                null_model=args.null_model,
+                n_null=args.ensemble,
+                seed=args.seed,
+                samples=samples,
+                workers=args.workers,
+            )
+        elif elo:
+            write_rich_club_elo(database, samples=samples)
+        else:
+            write_rich_club(database, samples=samples)
 
     if args.rich_club_otb:
-        write_rich_club("OM_Portal_201510", samples=args.samples)
+        run("OM_OTB_201609", elo=False)
 
-    if args.rich_club_elo_otb:
-        write_rich_club_elo("OM_OTB_201609", samples=args.samples)
+    if args.rich_club_portal:
+        run("OM_Portal_201510", elo=False)
 
     if args.rich_club_elo_otb:
-        write_rich_club_elo("OM_Portal_201510", samples=args.samples)
+        run("OM_OTB_201609", elo=True)
+
+    if args.rich_club_elo_portal:
+        run("OM_Portal_201510", elo=True)
@@ -1,37 +1,64 @@
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
 import pandas as pd
 
+from chessnet.games import read_player_games
+from chessnet.players import read_player_registry
 from chessnet.utils import ARTIFACTS_DIR
 
 
 def get_players_elo(
     database: str, min_elo: int = 500, max_elo: int = 4000
 ) -> pd.DataFrame:
-    df = pd.read_csv(ARTIFACTS_DIR / f"{database}.csv")
-    players = pd.concat(
-        [
-            df[["White", "WhiteElo"]].rename(
-                columns={"White": "Player", "WhiteElo": "Elo"}
-            ),
-            df[["Black", "BlackElo"]].rename(
-                columns={"Black": "Player", "BlackElo": "Elo"}
+    df = read_player_games(database, ["WhiteId", "BlackId", "WhiteElo", "BlackElo"])
+    players = pd.DataFrame(
+        {
+            "PlayerId": np.concatenate([df.WhiteId, df.BlackId]),
+            "Elo": np.concatenate(
+                [
+                    df.WhiteElo.to_numpy(dtype=float, na_value=np.nan),
+                    df.BlackElo.to_numpy(dtype=float, na_value=np.nan),
+                ]
             ),
-        ],
-        ignore_index=True,
+        }
     ).dropna()
-    mask = (players.Elo >= min_elo) & (players.Elo <= max_elo)
-    grouped = players[mask].groupby(by="Player").agg(["mean", "std"]).dropna()
-    grouped.columns = grouped.columns.droplevel()
+    mask = (players.PlayerId >= 0) & (players.Elo >= min_elo) & (players.Elo <= max_elo)
+    grouped = players[mask].groupby(by="PlayerId").Elo.agg(["mean", "std"]).dropna()
     grouped = grouped.rename(columns={"mean": "MeanElo", "std": "StdElo"})
-    return grouped
+    grouped = grouped.reset_index()
+    grouped.index = read_player_registry(database)[grouped.PlayerId]
+    return grouped[["MeanElo", "StdElo", "PlayerId"]]
+
+
+def get_elo_data_filename(database: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_elo_data.csv"
 
 
 def write_elo_data(database: str) -> None:
     elo_data = get_players_elo(database)
-    elo_data.to_csv(ARTIFACTS_DIR / f"{database}_elo_data.csv")
+    elo_data.to_csv(get_elo_data_filename(database))
 
 
 def read_elo_data(database: str) -> pd.DataFrame:
-    return pd.read_csv(ARTIFACTS_DIR / f"{database}_elo_data.csv").set_index("Player")
+    return pd.read_csv(get_elo_data_filename(database)).set_index("Player")
+
+
+def get_elo_arrays(
+    elo_data: pd.DataFrame, registry: pd.Index
+) -> Tuple[np.ndarray, np.ndarray]:
+    """MeanElo and StdElo indexed by player ID, NaN for players without Elo."""
+    if "PlayerId" in elo_data.columns:
+        ids = elo_data["PlayerId"].to_numpy()
+    else:
+        ids = registry.get_indexer(elo_data.index)
+    known = ids >= 0
+    mean_elo = np.full(len(registry), np.nan)
+    std_elo = np.full(len(registry), np.nan)
+    mean_elo[ids[known]] = elo_data["MeanElo"].to_numpy()[known]
+    std_elo[ids[known]] = elo_data["StdElo"].to_numpy()[known]
+    return mean_elo, std_elo
 
 
 if __name__ == "__main__":
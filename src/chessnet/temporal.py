@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chessnet import metrics
+from chessnet.games import parse_dates, read_games_columns, read_player_games
+from chessnet.graphs import build_igraph
+from chessnet.players import read_player_registry
+from chessnet.rich_club import rich_club_curve
+from chessnet.utils import ARTIFACTS_DIR, get_database_config
+
+if TYPE_CHECKING:
+    import igraph as ig
+
+# Elo values are accumulated as exact integer sums around this value
+ELO_SHIFT = 2000
+
+
+def read_dated_games(database: str, verbose: bool = False) -> pd.DataFrame:
+    """Games with a date, sorted by date (ties keep the file order).
+
+    Dates without a month or day count from the start of the year or month, see
+    `games.parse_dates`. Games without a year are dropped and counted in the
+    `undated_games` metric. `Game` is the position of a game in the file.
+    `OnSite` tells whether a game counts for the edges of a database restricted
+    to one site. Games on other sites still count for the Elo of the players.
+    """
+    columns = ["WhiteId", "BlackId", "WhiteElo", "BlackElo", "Date"]
+    site = get_database_config(database)["site"]
+    filter_site = site is not None and "Site" in read_games_columns(database)
+    df = read_player_games(database, columns + (["Site"] if filter_site else []))
+    df["OnSite"] = (df["Site"] == site).to_numpy() if filter_site else True
+    df["Game"] = np.arange(len(df))
+    df["Date"] = parse_dates(df["Date"])
+    undated = int(df["Date"].isna().sum())
+    if undated:
+        metrics.count("undated_games", undated, database=database)
+        if verbose:
+            print(f"Dropped {undated} games without a year in their date")
+    df = df[df["Date"].notna()]
+    return df.sort_values("Date", kind="stable").reset_index(drop=True)
+
+
+class SlidingWindowGraph:
+    """The player graph of the games played in a moving time window.
+
+    Games are sorted by date once. Moving the window forward adds the games that
+    enter it and removes the ones that expire, updating the weight of every
+    (White, Black) pair and the Elo count/sum/sum of squares of every player in
+    place, so each step costs in proportion to the games that changed. Sums are
+    kept as integers, so no error builds up however long the window slides.
+
+    Filters match the static graph: a game adds to a player's Elo when that Elo
+    is in [min_elo, max_elo], and to a pair only when both Elo values are and
+    the game is on the site of the database.
+    """
+
+    def __init__(
+        self,
+        games: pd.DataFrame,
+        registry: pd.Index,
+        min_elo: int = 500,
+        max_elo: int = 4000,
+    ):
+        self.registry = registry
+        self.dates = games["Date"].to_numpy(dtype="datetime64[ns]")
+        if "Game" in games.columns:
+            self.games = games["Game"].to_numpy(dtype=np.int64)
+        else:
+            self.games = np.arange(len(games))
+        n = len(registry)
+        players = np.column_stack(
+            [
+                games["WhiteId"].to_numpy(dtype=np.int64),
+                games["BlackId"].to_numpy(dtype=np.int64),
+            ]
+        )
+        elo = np.column_stack(
+            [
+                games["WhiteElo"].to_numpy(dtype=float, na_value=np.nan),
+                games["BlackElo"].to_numpy(dtype=float, na_value=np.nan),
+            ]
+        )
+        valid = (players >= 0) & (elo >= min_elo) & (elo <= max_elo)
+        self.players = np.where(valid, players, -1)
+        self.elo = np.where(valid, np.round(elo), ELO_SHIFT).astype(np.int64)
+        self.elo -= ELO_SHIFT
+
+        paired = valid.all(axis=1) & games["OnSite"].to_numpy(dtype=bool)
+        keys = players[paired, 0] * n + players[paired, 1]
+        pair_keys, pair_index = np.unique(keys, return_inverse=True)
+        self.pair = np.full(len(games), -1, dtype=np.int64)
+        self.pair[paired] = pair_index
+        self.pair_white = pair_keys // n
+        self.pair_black = pair_keys % n
+
+        self.weights = np.zeros(len(pair_keys), dtype=np.int64)
+        self.elo_count = np.zeros(n, dtype=np.int64)
+        self.elo_sum = np.zeros(n, dtype=np.int64)
+        self.elo_sum_sq = np.zeros(n, dtype=np.int64)
+        self.lo = self.hi = 0
+
+    @classmethod
+    def from_database(
+        cls,
+        database: str,
+        min_elo: int = 500,
+        max_elo: int = 4000,
+        verbose: bool = False,
+    ) -> "SlidingWindowGraph":
+        return cls(
+            read_dated_games(database, verbose=verbose),
+            read_player_registry(database),
+            min_elo=min_elo,
+            max_elo=max_elo,
+        )
+
+    def _apply(self, lo: int, hi: int, sign: int) -> None:
+        if hi <= lo:
+            return
+        pair = self.pair[lo:hi]
+        np.add.at(self.weights, pair[pair >= 0], sign)
+        players = self.players[lo:hi].ravel()
+        elo = self.elo[lo:hi].ravel()
+        mask = players >= 0
+        players, elo = players[mask], elo[mask]
+        np.add.at(self.elo_count, players, sign)
+        np.add.at(self.elo_sum, players, sign * elo)
+        np.add.at(self.elo_sum_sq, players, sign * elo**2)
+
+    def move(self, start, end) -> None:
+        """Make the window hold the games played in [start, end).
+
+        Windows are expected to move forward; moving backwards is correct but
+        costs as much as building the window from scratch.
+        """
+        lo, hi = np.searchsorted(
+            self.dates, np.array([start, end], dtype="datetime64[ns]")
+        )
+        if lo < self.lo or hi < self.hi:
+            self._apply(self.lo, self.hi, -1)
+            self.lo = self.hi = lo
+        self._apply(self.lo, min(self.hi, lo), -1)
+        self._apply(max(self.hi, lo), hi, 1)
+        self.lo, self.hi = lo, hi
+
+    @property
+    def n_games(self) -> int:
+        return self.hi - self.lo
+
+    def edges(self) -> pd.DataFrame:
+        """Edges of the window, in the order of `graphs.edge_ids_from_games`.
+
+        That is by decreasing weight, then by the first game of the pair in the
+        window, in file order.
+        """
+        lo, hi = self.lo, self.hi
+        pair, games = self.pair[lo:hi], self.games[lo:hi]
+        games, pair = games[pair >= 0], pair[pair >= 0]
+        order = np.lexsort((games, pair))
+        pair, games = pair[order], games[order]
+        starts = np.flatnonzero(np.diff(pair, prepend=-1))
+        active, first = pair[starts], games[starts]
+        active = active[np.lexsort((first, -self.weights[active]))]
+        return pd.DataFrame(
+            {
+                "WhiteId": self.pair_white[active],
+                "BlackId": self.pair_black[active],
+                "NUMBER_OF_GAMES": self.weights[active],
+            }
+        )
+
+    def elo_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """MeanElo and StdElo in the window, indexed by player ID.
+
+        As in the `_elo_data` table, players need two Elo values to have one.
+        """
+        count = self.elo_count.astype(float)
+        total = self.elo_sum.astype(float)
+        has_elo = self.elo_count >= 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_elo = np.where(has_elo, total / count + ELO_SHIFT, np.nan)
+            variance = (self.elo_sum_sq - total * total / count) / (count - 1)
+        std_elo = np.where(has_elo, np.sqrt(np.maximum(variance, 0)), np.nan)
+        return mean_elo, std_elo
+
+    def snapshot(self, directed: bool = False) -> ig.Graph:
+        """The graph of the window, built as `graphs.csv_to_igraph` does."""
+        mean_elo, std_elo = self.elo_arrays()
+        return build_igraph(
+            self.edges(), mean_elo, std_elo, self.registry, directed=directed
+        )
+
+    def windows(
+        self,
+        window: str = "365D",
+        step: str = "365D",
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+    ) -> Iterator[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """Move the window along the games, yielding its [start, end) bounds.
+
+        `window` and `step` are pandas offsets, e.g. "YS"/"YS" for calendar
+        years or "12MS"/"MS" for twelve months sliding by one month. By default
+        windows start at the step boundary before the first game.
+        """
+        if len(self.dates) == 0:
+            return
+        length = pd.tseries.frequencies.to_offset(window)
+        offset = pd.tseries.frequencies.to_offset(step)
+        first, last = pd.Timestamp(self.dates[0]), pd.Timestamp(self.dates[-1])
+        start = offset.rollback(first.normalize()) if start is None else start
+        end = last if end is None else end
+        for window_start in pd.date_range(start, end, freq=offset):
+            window_end = window_start + length
+            self.move(window_start, window_end)
+            yield window_start, window_end
+
+
+def window_metrics(
+    g: ig.Graph, thresholds: Optional[np.ndarray] = None
+) -> Tuple[Dict[str, float], pd.DataFrame, pd.DataFrame]:
+    """Summary, degree distribution and rich-club curve of a window graph."""
+    degrees = np.array(g.degree(), dtype=np.int64)
+    mean_elo = np.array(g.vs["MeanElo"]) if g.vcount() else np.array([])
+    summary = {
+        "vertices": g.vcount(),
+        "edges": g.ecount(),
+        "games": float(np.sum(g.es["NUMBER_OF_GAMES"])) if g.ecount() else 0.0,
+        "mean_degree": degrees.mean() if len(degrees) else np.nan,
+        "max_degree": degrees.max(initial=0),
+        "mean_elo": mean_elo.mean() if len(mean_elo) else np.nan,
+    }
+    counts = np.bincount(degrees)
+    k = np.flatnonzero(counts)
+    degree_distribution = pd.DataFrame({"k": k, "count": counts[k]})
+    if g.vcount():
+        rich_club = rich_club_curve(g, thresholds=thresholds)
+    else:
+        rich_club = pd.DataFrame(columns=["threshold", "n", "m", "phi"])
+    return summary, degree_distribution, rich_club
+
+
+def compute_temporal_metrics(
+    database: str,
+    window: str = "365D",
+    step: str = "365D",
+    min_elo: int = 500,
+    max_elo: int = 4000,
+    thresholds: Optional[np.ndarray] = None,
+    verbose: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """Metrics of the giant component of the graph of every time window.
+
+    Returns a `summary` table with one row per window, and the `degrees` and
+    `rich_club` tables in long format, keyed by the window start. With
+    `thresholds`, every rich-club curve uses the same degree thresholds.
+    """
+    start = time.perf_counter()
+    graph = SlidingWindowGraph.from_database(database, min_elo, max_elo, verbose)
+    if verbose:
+        print(
+            f"Read {len(graph.dates)} dated games: {time.perf_counter() - start:.2f}s"
+        )
+    summaries, degrees, rich_clubs = [], [], []
+    for window_start, window_end in graph.windows(window, step):
+        g = graph.snapshot()
+        summary, degree_distribution, rich_club = window_metrics(g, thresholds)
+        summaries.append(
+            {
+                "start": window_start,
+                "end": window_end,
+                "window_games": graph.n_games,
+                "window_pairs": int(np.count_nonzero(graph.weights)),
+                **summary,
+            }
+        )
+        degree_distribution.insert(0, "start", window_start)
+        rich_club.insert(0, "start", window_start)
+        degrees.append(degree_distribution)
+        rich_clubs.append(rich_club)
+        if verbose:
+            print(
+                f"{window_start.date()} - {window_end.date()}: {graph.n_games} "
+                f"games, giant component {g.vcount()} vertices, {g.ecount()} edges"
+            )
+    if not summaries:
+        raise ValueError(f"{database} has no dated games")
+    return {
+        "summary": pd.DataFrame(summaries),
+        "degrees": pd.concat(degrees, ignore_index=True),
+        "rich_club": pd.concat(rich_clubs, ignore_index=True),
+    }
+
+
+def get_temporal_filename(database: str, window: str, step: str, kind: str) -> Path:
+    return ARTIFACTS_DIR / f"{database}_temporal_{window}_{step}_{kind}.csv"
+
+
+def write_temporal_metrics(
+    database: str,
+    window: str = "365D",
+    step: str = "365D",
+    min_elo: int = 500,
+    max_elo: int = 4000,
+    thresholds: Optional[np.ndarray] = None,
+    verbose: bool = True,
+) -> None:
+    tables = compute_temporal_metrics(
+        database, window, step, min_elo, max_elo, thresholds, verbose=verbose
+    )
+    for kind, df in tables.items():
+        df.to_csv(get_temporal_filename(database, window, step, kind), index=False)
+
+
+def read_temporal_metrics(
+    database: str, window: str = "365D", step: str = "365D", kind: str = "summary"
+) -> pd.DataFrame:
+    return pd.read_csv(
+        get_temporal_filename(database, window, step, kind), parse_dates=["start"]
+    )
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--temporal-otb", action="store_true")
+    parser.add_argument("--temporal-portal", action="store_true")
+    parser.add_argument("--window", default="365D", help="Window length offset")
+    parser.add_argument("--step", default="365D", help="Window step offset")
+    parser.add_argument(
+        "--thresholds",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Degree thresholds of the rich-club curves (default: every degree)",
+    )
+    args = parser.parse_args()
+    thresholds = None if args.thresholds is None else np.array(args.thresholds)
+
+    if args.temporal_otb:
+        write_temporal_metrics(
+            "OM_OTB_201609", args.window, args.step, thresholds=thresholds
+        )
+
+    if args.temporal_portal:
+        write_temporal_metrics(
+            "OM_Portal_201510", args.window, args.step, thresholds=thresholds
+        )
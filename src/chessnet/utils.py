@@ -1,11 +1,59 @@
+import json
+import os
 from pathlib import Path
+from typing import Any, Dict
 
 ROOT_DIR = Path(__file__).resolve().parent.parent.parent
-DATA_DIR = ROOT_DIR / "data"
-ARTIFACTS_DIR = ROOT_DIR / "artifacts"
+# Overridable so that benchmarks and scratch runs do not touch the real data
+DATA_DIR = Path(os.environ.get("CHESSNET_DATA_DIR", ROOT_DIR / "data"))
+ARTIFACTS_DIR = Path(os.environ.get("CHESSNET_ARTIFACTS_DIR", ROOT_DIR / "artifacts"))
 FIGS_DIR = ROOT_DIR / "figures"
+DATABASES_FILE = ROOT_DIR / "databases.json"
+
+
+class InvalidInput(ValueError):
+    """An argument is not one of the supported values."""
 
 
 class Database:
     OTB = "OM_OTB_201609"
     Portal = "OM_Portal_201510"
+
+
+BUILTIN_DATABASES: Dict[str, Dict[str, Any]] = {
+    Database.OTB: {"pgn": "om_datasets/OM_OTB_201609.pgn", "site": None},
+    Database.Portal: {
+        "pgn": "om_datasets/OM_Portal_201510.pgn",
+        "site": "FICS freechess.org",
+    },
+}
+
+
+def get_databases() -> Dict[str, Dict[str, Any]]:
+    """Registered databases: the built-in ones plus those in `databases.json`.
+
+    The file maps database names to their settings, e.g.
+    {"OM_Portal_201511": {"pgn": "om_datasets/OM_Portal_201511.pgn",
+    "site": "FICS freechess.org"}}. `pgn` is relative to DATA_DIR and `site`, if
+    set, keeps only the games played on that site when building graphs.
+    """
+    databases = {name: dict(config) for name, config in BUILTIN_DATABASES.items()}
+    if DATABASES_FILE.is_file():
+        with open(DATABASES_FILE, "r") as file:
+            for name, config in json.load(file).items():
+                databases[name] = {**databases.get(name, {}), **config}
+    return databases
+
+
+def get_database_config(database: str) -> Dict[str, Any]:
+    config = {"pgn": f"om_datasets/{database}.pgn", "site": None}
+    config.update(get_databases().get(database, {}))
+    return config
+
+
+def resolve_database(name: str) -> str:
+    """Accept `Database` attribute names (OTB, Portal) as database aliases."""
+    aliases = {
+        key: value for key, value in vars(Database).items() if not key.startswith("_")
+    }
+    return aliases.get(name, name)
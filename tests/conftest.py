@@ -0,0 +1,28 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+FIXTURE_PGN = ROOT_DIR / "data" / "onlineolymtopd21.pgn"
+
+# Set before chessnet is imported, so tests never write to the project directories
+TMP_DIR = Path(tempfile.mkdtemp(prefix="chessnet-tests-"))
+os.environ["CHESSNET_DATA_DIR"] = str(TMP_DIR / "data")
+os.environ["CHESSNET_ARTIFACTS_DIR"] = str(TMP_DIR / "artifacts")
+(TMP_DIR / "data" / "om_datasets").mkdir(parents=True)
+(TMP_DIR / "artifacts").mkdir()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def database(request) -> str:
+    """A database of its own for the test, holding a copy of the fixture PGN."""
+    name = "test_" + "".join(c if c.isalnum() else "_" for c in request.node.name)
+    shutil.copy(FIXTURE_PGN, TMP_DIR / "data" / "om_datasets" / f"{name}.pgn")
+    return name
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from chessnet.auxiliary import bootstrap_regression
+
+
+@pytest.mark.parametrize("scale", ["loglog", "logx", "logy", "linear", "powerlaw"])
+def test_bootstrap_regression_matches_polyfit(scale):
+    rng = np.random.default_rng(0)
+    x = rng.uniform(1, 100, 50)
+    y = 3 * x**0.7 * rng.lognormal(0, 0.1, 50)
+    indices = rng.integers(0, 50, size=(23, 50))
+    # Small chunks split the index matrix in uneven parts
+    slope, intercept = bootstrap_regression(
+        x, y, scale, indices=indices, max_elements=200
+    )
+    X = np.log(x) if scale in ["loglog", "logx", "powerlaw"] else x
+    Y = np.log(y) if scale in ["loglog", "logy", "powerlaw"] else y
+    expected = np.array([np.polyfit(X[row], Y[row], 1) for row in indices])
+    np.testing.assert_allclose(slope, expected[:, 0])
+    if scale == "powerlaw":
+        intercept = np.log(intercept)
+    np.testing.assert_allclose(intercept, expected[:, 1])
+
+
+def test_bootstrap_regression_does_not_depend_on_workers():
+    x = np.arange(1, 31, dtype=float)
+    y = 2 * x + np.sin(x)
+    serial = bootstrap_regression(x, y, "linear", 100, seed=1, max_elements=300)
+    parallel = bootstrap_regression(
+        x, y, "linear", 100, seed=1, workers=2, max_elements=300
+    )
+    assert len(serial[0]) == 100
+    np.testing.assert_array_equal(serial, parallel)
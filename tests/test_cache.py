@@ -0,0 +1,80 @@
+import pytest
+
+from chessnet import cache
+from chessnet.cache import Stage, evict, read_manifest, run_stage
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    return tmp_path / "cache"
+
+
+def copy_stage(source, destination, suffix="", calls=None):
+    """A stage that writes its input to its output, with `suffix` appended."""
+
+    def func():
+        if calls is not None:
+            calls.append(suffix)
+        destination.write_text(source.read_text() + suffix)
+
+    return Stage(
+        "copy", func, inputs=[source], outputs=[destination], params={"s": suffix}
+    )
+
+
+def test_run_stage_rebuilds_on_stale_inputs(tmp_path):
+    source, destination = tmp_path / "in.txt", tmp_path / "out.txt"
+    source.write_text("a")
+    calls = []
+    stage = copy_stage(source, destination, calls=calls)
+
+    assert run_stage(stage) == "built"
+    assert run_stage(stage) == "fresh"
+    assert calls == [""]
+
+    source.write_text("b")
+    assert run_stage(stage) == "built"
+    assert destination.read_text() == "b"
+
+    # The variant built from the previous content is still in the cache
+    source.write_text("a")
+    assert run_stage(stage) == "restored"
+    assert destination.read_text() == "a"
+    assert len(calls) == 2
+
+
+def test_run_stage_rebuilds_on_new_params_and_modified_outputs(tmp_path):
+    source, destination = tmp_path / "in.txt", tmp_path / "out.txt"
+    source.write_text("a")
+    calls = []
+    assert run_stage(copy_stage(source, destination, "x", calls)) == "built"
+    assert run_stage(copy_stage(source, destination, "y", calls)) == "built"
+    assert destination.read_text() == "ay"
+
+    stage = copy_stage(source, destination, "y", calls)
+    key = cache.stage_key(stage)
+    assert cache.is_fresh(stage, key, read_manifest())
+    destination.write_text("edited by hand")
+    assert not cache.is_fresh(stage, key, read_manifest())
+    assert run_stage(stage) == "built"
+    assert destination.read_text() == "ay"
+    assert calls == ["x", "y", "y"]
+
+
+def test_evict_keeps_current_variants_under_max_bytes(tmp_path, cache_dir):
+    source, destination = tmp_path / "in.txt", tmp_path / "out.txt"
+    source.write_text("a" * 1000)
+    for suffix in ["1", "2", "3", "4"]:
+        run_stage(copy_stage(source, destination, suffix), max_bytes=2500)
+
+    # Variants of 1001 bytes: the oldest ones go first, the current one stays
+    entries = read_manifest()["entries"]
+    assert sorted(entry["params"]["s"] for entry in entries.values()) == ["3", "4"]
+    assert len(list(cache_dir.glob("*/0_out.txt"))) == 2
+
+    assert evict(max_bytes=0) == 1001
+    entries = read_manifest()["entries"]
+    assert [entry["params"]["s"] for entry in entries.values()] == ["4"]
+    assert run_stage(copy_stage(source, destination, "4")) == "fresh"
+    assert run_stage(copy_stage(source, destination, "3")) == "built"
@@ -0,0 +1,152 @@
+import igraph as ig
+import numpy as np
+import pandas as pd
+import pytest
+
+from chessnet import communities
+from chessnet.communities import (
+    _init_similarity_worker,
+    _partition_similarity_row,
+    append_membership,
+    batch_modularity,
+    get_adjacency,
+    get_algorithm_names,
+    get_community_jobs,
+    get_membership_filename,
+    read_memberships,
+    write_louvain_q_values,
+)
+from chessnet.graphs import get_pickle_filename
+
+metrics = pytest.importorskip("sklearn.metrics")
+
+
+def test_partition_similarity_matches_sklearn():
+    rng = np.random.default_rng(0)
+    n = 2000
+    memberships = np.array(
+        [
+            rng.integers(0, 5, n),
+            rng.integers(0, 40, n),
+            np.minimum(rng.geometric(0.02, n), 300),
+            np.arange(n) // 100,
+            np.zeros(n, dtype=np.int64),
+        ]
+    )
+    _init_similarity_worker(memberships)
+    rows = [
+        row for i in range(len(memberships)) for row in _partition_similarity_row(i)
+    ]
+    assert len(rows) == len(memberships) * (len(memberships) - 1) // 2
+    for i, j, ami, nmi, ari in rows:
+        a, b = memberships[i], memberships[j]
+        assert ami == pytest.approx(metrics.adjusted_mutual_info_score(a, b))
+        assert nmi == pytest.approx(metrics.normalized_mutual_info_score(a, b))
+        assert ari == pytest.approx(metrics.adjusted_rand_score(a, b))
+
+
+def test_warm_start_jobs_are_separate_chains_of_decreasing_resolution():
+    cold = get_community_jobs("db", 0.1, 10, samples=6)
+    assert [names for _, names in cold] == [
+        [name] for name in get_algorithm_names(0.1, 10, 6)
+    ]
+
+    warm = get_community_jobs("db", 0.1, 10, samples=6, chains=2, warm_start=True)
+    chains = [names for _, names in warm if names[0].startswith("louvain")]
+    assert len(chains) == 2
+    names = [name for chain in chains for name in chain]
+    resolutions = [float(name.split("_")[-1]) for name in names]
+    assert all(name.startswith("louvain_warm_") for name in names)
+    assert resolutions == sorted(resolutions, reverse=True)
+    assert not set(names) & set(get_algorithm_names(0.1, 10, 6))
+
+
+def test_overwriting_a_membership_keeps_the_store_size():
+    database = "test_overwrite_membership"
+    a, b, c = np.arange(10) % 3, np.arange(10) % 2, np.arange(10) % 5
+    append_membership(database, "a", a)
+    append_membership(database, "b", b)
+    size = get_membership_filename(database).stat().st_size
+    assert size == 2 * 10 * 4
+
+    for _ in range(3):
+        append_membership(database, "a", c, algorithm="new")
+    assert get_membership_filename(database).stat().st_size == size
+    metadata, memberships = read_memberships(database)
+    assert list(metadata.index) == ["b", "a"]
+    assert metadata.loc["a", "algorithm"] == "new"
+    np.testing.assert_array_equal(memberships[metadata.loc["a", "row"]], c)
+    np.testing.assert_array_equal(memberships[metadata.loc["b", "row"]], b)
+
+
+def weighted_graph(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    g = ig.Graph.Erdos_Renyi(n, m=4 * n)
+    g.es["NUMBER_OF_GAMES"] = rng.integers(1, 10, g.ecount()).tolist()
+    g.vs["name"] = [f"P{i}" for i in range(n)]
+    return g
+
+
+@pytest.mark.parametrize("weight", [None, "NUMBER_OF_GAMES"])
+@pytest.mark.parametrize("resolution", [1.0, 0.3, 2.5])
+def test_batch_modularity_matches_igraph(weight, resolution):
+    g = weighted_graph()
+    rng = np.random.default_rng(1)
+    memberships = np.array(
+        [
+            rng.integers(0, 5, g.vcount()),
+            rng.integers(0, 60, g.vcount()),
+            np.zeros(g.vcount(), dtype=np.int64),
+            np.array(g.community_multilevel(weights=weight).membership),
+        ]
+    )
+    q = batch_modularity(get_adjacency(g, weight), memberships, resolution, 500)
+    expected = [
+        g.modularity(membership.tolist(), weights=weight, resolution=resolution)
+        for membership in memberships
+    ]
+    np.testing.assert_allclose(q, expected, rtol=1e-12, atol=1e-12)
+
+    # One resolution per partition
+    resolutions = np.array([0.5, 1.0, 1.5, 2.0])
+    q = batch_modularity(get_adjacency(g, weight), memberships, resolutions)
+    expected = [
+        g.modularity(membership.tolist(), weights=weight, resolution=r)
+        for membership, r in zip(memberships, resolutions)
+    ]
+    np.testing.assert_allclose(q, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_write_louvain_q_values_only_adds_missing_rows(monkeypatch):
+    database = "test_q_values"
+    g = weighted_graph(seed=2)
+    g.write_pickle(str(get_pickle_filename(database)))
+    rng = np.random.default_rng(3)
+    for resolution in [0.5, 1.0, 2.0]:
+        append_membership(
+            database, f"louvain_{resolution:.4f}", rng.integers(0, 8, g.vcount())
+        )
+    append_membership(database, "leiden", rng.integers(0, 8, g.vcount()))
+    write_louvain_q_values(database)
+
+    computed = []
+
+    def counting_batch_modularity(adjacency, memberships, *args, **kwargs):
+        computed.append(len(memberships))
+        return batch_modularity(adjacency, memberships, *args, **kwargs)
+
+    monkeypatch.setattr(communities, "batch_modularity", counting_batch_modularity)
+    for resolution in [0.2, 5.0]:
+        append_membership(
+            database, f"louvain_{resolution:.4f}", rng.integers(0, 8, g.vcount())
+        )
+    append_membership(database, "louvain_warm_0.2000", rng.integers(0, 8, 200))
+    incremental = write_louvain_q_values(database)
+    assert computed == [2]
+    # Nothing is missing any more
+    pd.testing.assert_frame_equal(write_louvain_q_values(database), incremental)
+    assert computed == [2]
+
+    full = write_louvain_q_values(database, overwrite=True)
+    assert list(full["resolution"]) == [0.2, 0.5, 1.0, 2.0, 5.0]
+    pd.testing.assert_frame_equal(incremental, full)
@@ -0,0 +1,134 @@
+import pickle
+
+import igraph as ig
+import numpy as np
+import pytest
+
+from chessnet.csr import (
+    WEIGHT_ATTRIBUTE,
+    CSRGraph,
+    read_csr_graph,
+    write_csr,
+    write_csr_graph,
+)
+from chessnet.graphs import (
+    create_rewired_graph,
+    csv_to_igraph,
+    get_pickle_filename,
+    read_pickle,
+    read_rewired_graph,
+)
+from chessnet.pgn import OM_OTB_FIELDS, get_pgn_filename, pgn_to_artifact
+
+
+def edge_weights(source, target, weights, directed):
+    """Total weight of every vertex pair, unordered when undirected."""
+    totals = {}
+    for u, v, w in zip(source, target, weights):
+        key = (u, v) if directed else (min(u, v), max(u, v))
+        totals[key] = totals.get(key, 0) + w
+    return totals
+
+
+def igraph_weights(g):
+    edges = np.array(g.get_edgelist()).reshape(-1, 2)
+    weights = g.es[WEIGHT_ATTRIBUTE]
+    return edge_weights(edges[:, 0], edges[:, 1], weights, g.is_directed())
+
+
+def assert_same_graph(csr, g):
+    attributes = ["MeanElo", "StdElo", "PlayerId"]
+    assert csr.vcount() == g.vcount()
+    assert csr.ecount() == g.ecount()
+    assert csr.names == g.vs["name"]
+    for attr in attributes:
+        np.testing.assert_array_equal(csr[attr], g.vs[attr])
+    expected = igraph_weights(g)
+    assert edge_weights(*csr.edges(), g.is_directed()) == expected
+
+    # igraph
+    h = csr.to_igraph()
+    assert h.is_directed() == g.is_directed()
+    assert h.vs["name"] == g.vs["name"]
+    for attr in attributes:
+        np.testing.assert_array_equal(h.vs[attr], g.vs[attr])
+    assert igraph_weights(h) == expected
+
+    # scipy: undirected edges in both directions, self-loops once
+    matrix = csr.to_scipy().tocoo()
+    assert matrix.shape == (g.vcount(), g.vcount())
+    entries = dict(zip(zip(matrix.row.tolist(), matrix.col.tolist()), matrix.data))
+    symmetric = dict(expected)
+    if not g.is_directed():
+        symmetric.update({(v, u): w for (u, v), w in expected.items()})
+    assert entries == symmetric
+
+    # networkx
+    nx_graph = csr.to_networkx()
+    assert nx_graph.is_directed() == g.is_directed()
+    assert list(nx_graph.nodes) == g.vs["name"]
+    for vertex in g.vs:
+        for attr in attributes:
+            assert nx_graph.nodes[vertex["name"]][attr] == vertex[attr]
+    index = {name: i for i, name in enumerate(g.vs["name"])}
+    source, target, weights = zip(*nx_graph.edges(data=WEIGHT_ATTRIBUTE))
+    source, target = [index[u] for u in source], [index[v] for v in target]
+    assert edge_weights(source, target, weights, g.is_directed()) == expected
+
+
+@pytest.fixture
+def graph_database(database):
+    pgn_to_artifact(get_pgn_filename(database), OM_OTB_FIELDS)
+    g = csv_to_igraph(database, verbose=False)
+    g.write_pickle(str(get_pickle_filename(database)))
+    create_rewired_graph(database, 1.0, seed=0, verbose=False)
+    return database
+
+
+@pytest.mark.parametrize("rewired", [False, True])
+def test_csr_round_trip(graph_database, rewired):
+    database = graph_database
+    write_csr_graph(database, rewired, nswap_ecount_times=1.0)
+    csr = read_csr_graph(database, rewired, nswap_ecount_times=1.0)
+    if rewired:
+        g = read_rewired_graph(database, nswap_ecount_times=1.0)
+        assert g.get_edgelist() != read_pickle(database).get_edgelist()
+    else:
+        g = read_pickle(database)
+    assert g.ecount() > 0
+    assert_same_graph(csr, g)
+
+    # Pickles hold the path, not the arrays
+    data = pickle.dumps(csr)
+    assert len(data) < 1000
+    copy = pickle.loads(data)
+    assert copy.path == csr.path
+    assert_same_graph(copy, g)
+
+
+def test_csr_round_trip_directed_with_self_loops(tmp_path):
+    g = ig.Graph(
+        n=4,
+        edges=[(0, 1), (1, 0), (2, 2), (3, 1), (0, 2)],
+        directed=True,
+        vertex_attrs={
+            "name": ["Müller", "B", "", "Tal, M."],
+            "MeanElo": [2100.5, 1800.0, 1999.25, 2600.0],
+            "StdElo": [10.0, 0.0, 7.0, 3.5],
+            "PlayerId": [3, 0, 2, 1],
+        },
+        edge_attrs={WEIGHT_ATTRIBUTE: [2, 1, 5, 3, 1]},
+    )
+    write_csr(g, tmp_path / "directed.csr")
+    csr = CSRGraph(tmp_path / "directed.csr")
+    assert list(csr.degree()) == [2, 1, 1, 1]
+    assert_same_graph(csr, g)
+    assert_same_graph(pickle.loads(pickle.dumps(csr)), g)
+
+    # Undirected self-loops are stored once
+    g.to_undirected(combine_edges="sum")
+    write_csr(g, tmp_path / "undirected.csr")
+    csr = CSRGraph(tmp_path / "undirected.csr")
+    assert g.ecount() == 4
+    assert csr.degree().sum() == 2 * g.ecount() - 1
+    assert_same_graph(csr, g)
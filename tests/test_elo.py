@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from chessnet.elo import (
+    ELO_BINS,
+    ELO_CATEGORIES,
+    elo_to_categories,
+    elo_to_category,
+    elo_to_codes,
+)
+
+
+def baseline_elo_to_category(elo):
+    """The original if/elif chain of `elo_to_category`."""
+    if elo >= 2500:
+        return "IG"
+    elif 2400 <= elo < 2500:
+        return "IM"
+    elif 2300 <= elo < 2400:
+        return "FM"
+    elif 2200 <= elo < 2300:
+        return "CM"
+    elif 2000 <= elo < 2200:
+        return "E"
+    elif 1800 <= elo < 2200:
+        return "CA"
+    elif 1600 <= elo < 1800:
+        return "CB"
+    elif 1400 <= elo < 1600:
+        return "CC"
+    else:
+        return "CD"
+
+
+EDGES = np.array(ELO_BINS, dtype=float)
+ELO_VALUES = np.concatenate(
+    [
+        EDGES,
+        np.nextafter(EDGES, -np.inf),
+        np.nextafter(EDGES, np.inf),
+        EDGES - 0.5,
+        np.arange(0, 3001, 50),
+        [-np.inf, np.inf, np.nan],
+    ]
+)
+
+
+def test_elo_to_category_matches_the_original_chain():
+    expected = [baseline_elo_to_category(elo) for elo in ELO_VALUES]
+    assert [elo_to_category(elo) for elo in ELO_VALUES] == expected
+    assert elo_to_categories(ELO_VALUES).tolist() == expected
+    codes = elo_to_codes(ELO_VALUES)
+    assert [ELO_CATEGORIES[code] for code in codes] == expected
+
+
+def test_every_category_starts_at_its_bin():
+    assert elo_to_categories(EDGES).tolist() == list(ELO_CATEGORIES[1:])
+    below = np.nextafter(EDGES, -np.inf)
+    assert elo_to_categories(below).tolist() == list(ELO_CATEGORIES[:-1])
+    assert elo_to_category(np.nan) == "CD"
+
+
+def test_custom_bins():
+    codes = elo_to_codes([np.nan, 999, 1000, 1500, 2000], bins=[1000, 2000])
+    assert codes.tolist() == [0, 0, 1, 1, 2]
+    with pytest.raises(ValueError):
+        elo_to_codes([1500], bins=[2000, 1000])
+    with pytest.raises(ValueError):
+        elo_to_categories([1500], bins=[1000, 2000], categories=["a", "b"])
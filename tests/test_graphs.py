@@ -0,0 +1,118 @@
+import io
+import os
+
+import igraph as ig
+import numpy as np
+import pandas as pd
+import pytest
+
+from chessnet.edges import stream_edge_ids
+from chessnet.games import get_games_filename
+from chessnet.graphs import (
+    build_igraph,
+    csv_to_igraph,
+    edge_ids_from_games,
+    get_edges_filename,
+)
+from chessnet.pgn import (
+    OM_OTB_FIELDS,
+    get_pgn_filename,
+    pgn_to_artifact,
+    pgn_to_dataframe,
+)
+from chessnet.players import read_player_registry
+from chessnet.statistics import get_elo_arrays, read_elo_data
+
+
+def baseline_igraph(database: str) -> ig.Graph:
+    """The graph as the original `csv_to_igraph` built it, step by step."""
+    df = pgn_to_dataframe(get_pgn_filename(database), OM_OTB_FIELDS)
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    buffer.seek(0)
+    df = pd.read_csv(buffer)
+
+    mask = (
+        (df.WhiteElo >= 500)
+        & (df.WhiteElo <= 4000)
+        & (df.BlackElo >= 500)
+        & (df.BlackElo <= 4000)
+    )
+    counts = df[mask][["White", "Black", "WhiteElo", "BlackElo"]].dropna()
+    counts = counts[["White", "Black"]].value_counts()
+    counts.name = "NUMBER_OF_GAMES"
+    g = ig.Graph.DataFrame(counts.reset_index(), directed=True, use_vids=False)
+    g = g.simplify(combine_edges="sum")
+    g.to_undirected(combine_edges="sum")
+
+    players = pd.concat(
+        [
+            df[["White", "WhiteElo"]].set_axis(["Player", "Elo"], axis=1),
+            df[["Black", "BlackElo"]].set_axis(["Player", "Elo"], axis=1),
+        ],
+        ignore_index=True,
+    ).dropna()
+    players = players[(players.Elo >= 500) & (players.Elo <= 4000)]
+    elo_data = players.groupby("Player")["Elo"].agg(["mean", "std"]).dropna()
+
+    g.delete_vertices([v.index for v in g.vs if v["name"] not in elo_data.index])
+    g.vs.select(_degree=0).delete()
+    g.vs["MeanElo"] = elo_data["mean"].loc[g.vs["name"]].tolist()
+    g.vs["StdElo"] = elo_data["std"].loc[g.vs["name"]].tolist()
+    return g.components(mode="WEAK").giant()
+
+
+def assert_same_graph(g: ig.Graph, expected: ig.Graph) -> None:
+    assert g.vs["name"] == expected.vs["name"]
+    assert g.get_edgelist() == expected.get_edgelist()
+    assert g.es["NUMBER_OF_GAMES"] == expected.es["NUMBER_OF_GAMES"]
+    np.testing.assert_allclose(g.vs["MeanElo"], expected.vs["MeanElo"], atol=1e-9)
+    np.testing.assert_allclose(g.vs["StdElo"], expected.vs["StdElo"], atol=1e-9)
+
+
+@pytest.mark.parametrize(
+    "parser, workers, output_format",
+    [("chess", 1, "csv"), ("scanner", 1, "csv"), ("scanner", 2, "parquet")],
+)
+def test_csv_to_igraph_matches_baseline(database, parser, workers, output_format):
+    pgn_to_artifact(
+        get_pgn_filename(database),
+        OM_OTB_FIELDS,
+        workers=workers,
+        parser=parser,
+        output_format=output_format,
+    )
+    expected = baseline_igraph(database)
+    assert_same_graph(csv_to_igraph(database, verbose=False), expected)
+
+    # Without the edge table of the ingestion, edges are streamed from the games
+    get_edges_filename(database).unlink()
+    assert_same_graph(csv_to_igraph(database, verbose=False), expected)
+
+
+def test_spilled_edges_match_baseline(database):
+    pgn_to_artifact(get_pgn_filename(database), OM_OTB_FIELDS, parser="scanner")
+    registry = read_player_registry(database)
+    mean_elo, std_elo = get_elo_arrays(read_elo_data(database), registry)
+    edges = stream_edge_ids(database, chunk_rows=50, max_pairs=40, partitions=3)
+    g = build_igraph(edges, mean_elo, std_elo, registry)
+    assert_same_graph(g, baseline_igraph(database))
+
+
+def test_stale_edge_tables_are_not_used(database):
+    pgn_to_artifact(get_pgn_filename(database), OM_OTB_FIELDS)
+    other_bounds = get_edges_filename(database, 1000, 2000)
+    other_bounds.write_text("WhiteId,BlackId,NUMBER_OF_GAMES\n0,1,1\n")
+
+    # A full parse replaces the edge tables of every Elo bound
+    pgn_to_artifact(get_pgn_filename(database), OM_OTB_FIELDS)
+    assert not other_bounds.exists()
+
+    # An edge table older than the games is ignored
+    filename = get_edges_filename(database)
+    filename.write_text("WhiteId,BlackId,NUMBER_OF_GAMES\n0,1,1\n")
+    games_mtime = get_games_filename(database, "csv").stat().st_mtime_ns
+    os.utime(filename, ns=(games_mtime - 10**9, games_mtime - 10**9))
+    pd.testing.assert_frame_equal(
+        edge_ids_from_games(database), stream_edge_ids(database)
+    )
@@ -0,0 +1,154 @@
+import json
+import multiprocessing
+
+import pytest
+
+from chessnet import cache, metrics
+from chessnet.cache import Stage
+from chessnet.pipeline import run_pipeline
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    yield
+    metrics.configure(None)
+    metrics._series.clear()
+
+
+def read_events(sink):
+    return [json.loads(line) for line in sink.read_text().splitlines()]
+
+
+def read_prometheus(sink):
+    """Value of every sample of a Prometheus textfile, by series."""
+    samples = {}
+    for line in sink.read_text().splitlines():
+        if not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            samples[series] = float(value)
+    return samples
+
+
+def test_disabled_metrics_do_nothing(tmp_path):
+    metrics.configure(None)
+    metrics.count("games", 3)
+    metrics.gauge("pending", 1)
+    with metrics.timer("step"):
+        pass
+    metrics.flush()
+    assert not metrics.enabled()
+    assert metrics.timer("step") is metrics.timer("other")
+    assert not metrics._series
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_jsonl_events(tmp_path):
+    sink = tmp_path / "metrics.jsonl"
+    metrics.configure(sink)
+    metrics.count("games", 3, database="db")
+    with metrics.with_labels(stage="db/graph"):
+        metrics.gauge("pending", 2.5)
+        with metrics.timer("step", part=1):
+            pass
+    metrics.count("games")
+
+    events = read_events(sink)
+    assert [(e["kind"], e["name"], e["labels"]) for e in events] == [
+        ("counter", "games", {"database": "db"}),
+        ("gauge", "pending", {"stage": "db/graph"}),
+        ("timer", "step", {"stage": "db/graph", "part": "1"}),
+        ("counter", "games", {}),
+    ]
+    assert [event["value"] for event in events[:2] + events[3:]] == [3, 2.5, 1]
+    assert events[2]["value"] >= 0
+
+
+def test_prometheus_textfile(tmp_path):
+    sink = tmp_path / "metrics.prom"
+    metrics.configure(sink)
+    metrics.count("games", 3, database="db")
+    metrics.count("games", 2, database="db")
+    metrics.count("games", 1, database='a "quoted" \\ name')
+    metrics.gauge("pending", 5)
+    metrics.gauge("pending", 4)
+    with metrics.timer("stage.run"):
+        pass
+    metrics.flush()
+    assert not metrics._series
+
+    text = sink.read_text()
+    assert "# TYPE chessnet_games counter" in text
+    assert "# TYPE chessnet_pending gauge" in text
+    assert "# TYPE chessnet_stage_run_seconds summary" in text
+    samples = read_prometheus(sink)
+    assert samples['chessnet_games{database="db"}'] == 5
+    assert samples['chessnet_games{database="a \\"quoted\\" \\\\ name"}'] == 1
+    assert samples["chessnet_pending"] == 4
+    assert samples["chessnet_stage_run_seconds_count"] == 1
+
+    # A second flush adds the new counts to the totals and replaces gauges
+    metrics.count("games", 10, database="db")
+    metrics.gauge("pending", 0)
+    metrics.flush()
+    samples = read_prometheus(sink)
+    assert samples['chessnet_games{database="db"}'] == 15
+    assert samples["chessnet_pending"] == 0
+    assert samples["chessnet_stage_run_seconds_count"] == 1
+
+
+def count_and_flush(times):
+    for _ in range(times):
+        metrics.count("jobs", 1, kind="test")
+        metrics.count("jobs_total", 2)
+        metrics.flush()
+
+
+def test_prometheus_textfile_merges_processes(tmp_path):
+    sink = tmp_path / "metrics.prom"
+    metrics.configure(sink)
+    metrics.count("jobs", 5, kind="test")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=count_and_flush, args=(25,)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * 4
+    # Children do not flush the series of their parent
+    samples = read_prometheus(sink)
+    assert samples['chessnet_jobs{kind="test"}'] == 100
+    assert samples["chessnet_jobs_total"] == 200
+
+    metrics.flush()
+    assert read_prometheus(sink)['chessnet_jobs{kind="test"}'] == 105
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def fail():
+    raise RuntimeError("The stage broke")
+
+
+def test_run_pipeline_records_stage_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    (tmp_path / "in.txt").write_text("x")
+    stages = [
+        Stage(
+            f"db/{name}",
+            fail if name == "c" else (tmp_path / f"{name}.txt").touch,
+            inputs=[tmp_path / "in.txt"],
+            outputs=[tmp_path / f"{name}.txt"],
+        )
+        for name in ["a", "b", "c"]
+    ]
+    sink = tmp_path / "metrics.prom"
+    metrics.configure(sink)
+    run_pipeline(stages, workers=2, verbose=False)
+    run_pipeline(stages[:1], verbose=False)
+
+    samples = read_prometheus(sink)
+    assert samples['chessnet_stages{stage="db/a",status="built"}'] == 1
+    assert samples['chessnet_stages{stage="db/a",status="fresh"}'] == 1
+    assert samples['chessnet_stages{stage="db/b",status="built"}'] == 1
+    assert samples['chessnet_stages{stage="db/c",status="failed"}'] == 1
+    assert samples['chessnet_stage_seconds_count{stage="db/a"}'] == 2
+    assert samples['chessnet_peak_rss_bytes{stage="db/b"}'] > 0
@@ -0,0 +1,86 @@
+import igraph as ig
+import numpy as np
+import pytest
+
+from chessnet.csr import CSRGraph, write_csr
+from chessnet.elo import ELO_BINS, elo_to_codes
+from chessnet.mixing import (
+    assortativity,
+    category_assortativity,
+    category_mixing,
+    mixing_matrix,
+    quotient_graph,
+)
+
+
+def random_graph(n=300, directed=False, seed=0):
+    rng = np.random.default_rng(seed)
+    g = ig.Graph.Erdos_Renyi(n, m=5 * n, directed=directed)
+    # Neighbours of similar Elo make the graph assortative
+    extra = rng.integers(0, n - 3, 2 * n)
+    g.add_edges(np.column_stack([extra, extra + rng.integers(1, 3, 2 * n)]).tolist())
+    g.simplify()
+    g.es["NUMBER_OF_GAMES"] = rng.integers(1, 20, g.ecount()).tolist()
+    g.vs["MeanElo"] = np.sort(rng.normal(1900, 300, n)).tolist()
+    g.vs["name"] = [f"P{i}" for i in range(n)]
+    return g
+
+
+def igraph_assortativity(g, codes, weighted):
+    """`assortativity_nominal`, with integer weights as repeated edges.
+
+    The `weights` argument is not accepted by every igraph release.
+    """
+    if weighted:
+        edges = np.repeat(g.get_edgelist(), g.es["NUMBER_OF_GAMES"], axis=0)
+        g = ig.Graph(n=g.vcount(), edges=edges.tolist(), directed=g.is_directed())
+    return g.assortativity_nominal(list(codes), g.is_directed())
+
+
+def loop_mixing_matrix(codes, edges, weights, k, directed):
+    matrix = np.zeros((k, k))
+    for (u, v), w in zip(edges, weights):
+        matrix[codes[u], codes[v]] += w
+        if not directed:
+            matrix[codes[v], codes[u]] += w
+    return matrix
+
+
+@pytest.mark.parametrize("directed", [False, True])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_mixing_matches_igraph_assortativity(directed, weighted):
+    g = random_graph(directed=directed)
+    codes = elo_to_codes(g.vs["MeanElo"])
+    edges = np.array(g.get_edgelist())
+    weights = np.array(g.es["NUMBER_OF_GAMES"]) if weighted else None
+    k = len(ELO_BINS) + 1
+    matrix = mixing_matrix(codes, edges[:, 0], edges[:, 1], weights, k, directed)
+    expected = loop_mixing_matrix(
+        codes, edges, np.ones(len(edges)) if weights is None else weights, k, directed
+    )
+    np.testing.assert_array_equal(matrix, expected)
+
+    r = assortativity(matrix)
+    assert r > 0.1
+    assert r == pytest.approx(igraph_assortativity(g, codes, weighted), rel=1e-12)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_csr_category_mixing(tmp_path, weighted):
+    g = random_graph(seed=1)
+    write_csr(g, tmp_path / "graph.csr")
+    csr = CSRGraph(tmp_path / "graph.csr")
+    codes = elo_to_codes(g.vs["MeanElo"])
+    assert category_assortativity(csr, weighted=weighted) == pytest.approx(
+        igraph_assortativity(g, codes, weighted), rel=1e-12
+    )
+
+    df = category_mixing(csr, weighted=weighted)
+    total = sum(g.es["NUMBER_OF_GAMES"]) if weighted else g.ecount()
+    assert df.to_numpy().sum() == 2 * total
+    np.testing.assert_array_equal(df.to_numpy(), df.to_numpy().T)
+
+    q = quotient_graph(csr)
+    assert sum(q.vs["players"]) == g.vcount()
+    assert sum(q.es["edges"]) == g.ecount()
+    assert sum(q.es["NUMBER_OF_GAMES"]) == sum(g.es["NUMBER_OF_GAMES"])
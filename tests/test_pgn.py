@@ -0,0 +1,190 @@
+import bz2
+import gzip
+import io
+import lzma
+import struct
+import zlib
+
+import pandas as pd
+import pytest
+from chess.pgn import read_headers
+from conftest import FIXTURE_PGN
+
+from chessnet.games import read_games
+from chessnet.graphs import csv_to_igraph
+from chessnet.pgn import (
+    OM_OTB_FIELDS,
+    OM_PORTAL_FIELDS,
+    ingest_incremental,
+    pgn_to_dataframe,
+    scan_headers_columns,
+    scan_pgn_headers,
+)
+from chessnet.statistics import read_elo_data
+
+TRICKY_PGN = b"""\xef\xbb\xbf[Event "First"]
+[White "Caf\xc3\xa9, Jos\xc3\xa9"]
+[Black "M\xc3\xbcller"]
+[WhiteElo "2100"]
+[Annotator "x"]\t
+
+1. e4 {A comment with [Event "Nested"] inside} e5 1/2-1/2
+
+[Event "Second"]
+[Site "?"]
+[White "Empty value"]
+[Black ""]
+[Round "1.2"]
+
+1. d4 d5 (1... Nf6 2. c4) 2. c4 *
+
+[Event "Third"]
+[White "Tab\tinside"]
+[BlackElo "1800"]
+
+*
+
+[White "No event tag"]
+[Black "Y"]
+
+1-0
+"""
+
+
+def chess_headers(text: str):
+    """Every header of every game, as python-chess reads them."""
+    stream = io.StringIO(text)
+    games = []
+    headers = read_headers(stream)
+    while headers is not None:
+        games.append(dict(headers))
+        headers = read_headers(stream)
+    return games
+
+
+def chess_columns(text: str, fields):
+    games = chess_headers(text)
+    return {field: [game.get(field) for game in games] for field in fields}
+
+
+def all_fields(text: str):
+    return list(dict.fromkeys(field for game in chess_headers(text) for field in game))
+
+
+@pytest.fixture(scope="module")
+def fixture_bytes():
+    return FIXTURE_PGN.read_bytes()
+
+
+def test_scanner_matches_python_chess_on_fixture(fixture_bytes):
+    text = fixture_bytes.decode()
+    fields = all_fields(text)
+    assert len(chess_headers(text)) == 270
+    assert scan_headers_columns(fixture_bytes, fields) == chess_columns(text, fields)
+
+
+def test_scanner_matches_python_chess_on_tricky_games():
+    text = TRICKY_PGN.decode()
+    fields = all_fields(text)
+    assert scan_headers_columns(TRICKY_PGN, fields) == chess_columns(text, fields)
+
+
+@pytest.mark.parametrize("parser", ["chess", "scanner"])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parsers_agree(fixture_bytes, parser, workers):
+    expected = pd.DataFrame(chess_columns(fixture_bytes.decode(), OM_PORTAL_FIELDS))
+    # Small chunks split the file at many game boundaries
+    df = pgn_to_dataframe(
+        FIXTURE_PGN, OM_PORTAL_FIELDS, workers=workers, parser=parser, chunk_size=4096
+    )
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_scanner_chunks_cover_every_game(fixture_bytes):
+    fields = ["White", "Black"]
+    whole = scan_pgn_headers(FIXTURE_PGN, fields)
+    position = fixture_bytes.find(b"\n[Event ", len(fixture_bytes) // 2) + 1
+    starts = [0, position, len(fixture_bytes)]
+    chunks = [
+        scan_pgn_headers(FIXTURE_PGN, fields, start, end)
+        for start, end in zip(starts[:-1], starts[1:])
+    ]
+    assert {field: chunks[0][field] + chunks[1][field] for field in fields} == whole
+
+
+def bgzf_compress(data: bytes, block_size: int = 2**15) -> bytes:
+    blocks = []
+    for start in range(0, len(data), block_size):
+        block = data[start : start + block_size]
+        compressor = zlib.compressobj(wbits=-15)
+        payload = compressor.compress(block) + compressor.flush()
+        header = b"\x1f\x8b\x08\x04" + bytes(6) + struct.pack("<H", 6) + b"BC"
+        header += struct.pack("<HH", 2, 18 + len(payload) + 8 - 1)
+        trailer = struct.pack("<II", zlib.crc32(block), len(block))
+        blocks.append(header + payload + trailer)
+    return b"".join(blocks)
+
+
+def zstd_compress(data: bytes, frame_size: int = 2**15) -> bytes:
+    zstandard = pytest.importorskip("zstandard")
+    compressor = zstandard.ZstdCompressor()
+    return b"".join(
+        compressor.compress(data[start : start + frame_size])
+        for start in range(0, len(data), frame_size)
+    )
+
+
+COMPRESSORS = {
+    ".gz": gzip.compress,
+    ".bgz": bgzf_compress,
+    ".bz2": bz2.compress,
+    ".xz": lzma.compress,
+    ".zst": zstd_compress,
+}
+
+
+@pytest.mark.parametrize("suffix", list(COMPRESSORS))
+@pytest.mark.parametrize("parser", ["chess", "scanner"])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_compressed_input(fixture_bytes, tmp_path, suffix, parser, workers):
+    filename = tmp_path / f"fixture.pgn{suffix}"
+    filename.write_bytes(COMPRESSORS[suffix](fixture_bytes))
+    expected = pd.DataFrame(chess_columns(fixture_bytes.decode(), OM_PORTAL_FIELDS))
+    df = pgn_to_dataframe(filename, OM_PORTAL_FIELDS, workers=workers, parser=parser)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ingest_incremental_in_two_steps(fixture_bytes, tmp_path, workers):
+    once, twice = f"once_{workers}", f"twice_{workers}"
+    (tmp_path / f"{once}.pgn").write_bytes(fixture_bytes)
+    assert ingest_incremental(tmp_path / f"{once}.pgn", OM_OTB_FIELDS) == 270
+
+    # The file grows by appending the games of the second half
+    filename = tmp_path / f"{twice}.pgn"
+    middle = fixture_bytes.find(b"\n[Event ", len(fixture_bytes) // 2) + 1
+    filename.write_bytes(fixture_bytes[:middle])
+    first = ingest_incremental(filename, OM_OTB_FIELDS, workers=workers)
+    elo_before = read_elo_data(twice)
+    csv_to_igraph(twice, verbose=False)
+    filename.write_bytes(fixture_bytes)
+    second = ingest_incremental(
+        filename, OM_OTB_FIELDS, workers=workers, chunk_size=4096
+    )
+    assert first + second == 270
+    assert ingest_incremental(filename, OM_OTB_FIELDS) == 0
+
+    # Partitions have their own category dictionaries
+    pd.testing.assert_frame_equal(
+        read_games(twice), read_games(once), check_categorical=False
+    )
+    elo_data = read_elo_data(twice)
+    assert len(elo_data) > len(elo_before)
+    pd.testing.assert_frame_equal(elo_data, read_elo_data(once))
+    g, expected = csv_to_igraph(twice, verbose=False), csv_to_igraph(
+        once, verbose=False
+    )
+    assert g.vs["name"] == expected.vs["name"]
+    assert g.get_edgelist() == expected.get_edgelist()
+    assert g.es["NUMBER_OF_GAMES"] == expected.es["NUMBER_OF_GAMES"]
+    assert g.vs["MeanElo"] == expected.vs["MeanElo"]
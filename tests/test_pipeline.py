@@ -0,0 +1,171 @@
+from functools import partial
+
+import pytest
+
+from chessnet import cache
+from chessnet.cache import Stage
+from chessnet.pipeline import get_stages, run_pipeline, select_stages
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    return tmp_path / "cache"
+
+
+def concatenate(inputs, output, log):
+    """Write the inputs one after the other, and log the call."""
+    with open(log, "a") as file:
+        file.write(output.stem + "\n")
+    output.write_text("".join(path.read_text() for path in inputs) + output.stem)
+
+
+def fail():
+    raise RuntimeError("The stage broke")
+
+
+def get_test_stages(tmp_path, failing=None):
+    """a -> b, c -> d, and e on its own, all reading `source.txt`."""
+    log = tmp_path / "calls.log"
+    source = tmp_path / "source.txt"
+    if not source.exists():
+        source.write_text("x")
+    inputs = {
+        "a": [source],
+        "b": ["a"],
+        "c": ["a"],
+        "d": ["b", "c"],
+        "e": [source],
+    }
+    stages = []
+    for name, names in inputs.items():
+        paths = [tmp_path / f"{i}.txt" if isinstance(i, str) else i for i in names]
+        output = tmp_path / f"{name}.txt"
+        func = fail if name == failing else partial(concatenate, paths, output, log)
+        stages.append(Stage(f"db/{name}", func, inputs=paths, outputs=[output]))
+    return stages
+
+
+def read_calls(tmp_path):
+    log = tmp_path / "calls.log"
+    return sorted(log.read_text().split()) if log.exists() else []
+
+
+def names(stages):
+    return [stage.name for stage in stages]
+
+
+def test_select_stages_closure_and_order(tmp_path):
+    stages = get_test_stages(tmp_path)
+    assert names(select_stages(stages, None)) == [
+        "db/a",
+        "db/b",
+        "db/c",
+        "db/d",
+        "db/e",
+    ]
+    # The dependencies come first, whatever the order of the stage list
+    assert names(select_stages(stages[::-1], ["d"])) == [
+        "db/a",
+        "db/b",
+        "db/c",
+        "db/d",
+    ]
+    assert names(select_stages(stages, ["db/b", "e"])) == ["db/a", "db/b", "db/e"]
+    with pytest.raises(ValueError, match="Unknown stages"):
+        select_stages(stages, ["f"])
+
+    stages[0].inputs.append(tmp_path / "d.txt")
+    with pytest.raises(ValueError, match="Stage cycle"):
+        select_stages(stages, ["d"])
+
+
+def test_select_stages_of_a_database():
+    stages = get_stages("db")
+    assert names(select_stages(stages, ["rich_club"])) == [
+        "db/games",
+        "db/graph",
+        "db/rewired",
+        "db/rich_club",
+    ]
+    assert names(select_stages(stages, ["mixing"])) == [
+        "db/games",
+        "db/graph",
+        "db/csr",
+        "db/mixing",
+    ]
+
+
+def statuses(reports):
+    return {report["stage"]: report["status"] for report in reports}
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_run_pipeline_skips_fresh_stages(tmp_path, workers):
+    stages = get_test_stages(tmp_path)
+    reports = run_pipeline(stages, ["d"], workers=workers, verbose=False)
+    assert [report["stage"] for report in reports] == names(
+        select_stages(stages, ["d"])
+    )
+    assert set(statuses(reports).values()) == {"built"}
+    assert (tmp_path / "d.txt").read_text() == "xabxacd"
+    assert read_calls(tmp_path) == ["a", "b", "c", "d"]
+
+    reports = run_pipeline(stages, workers=workers, verbose=False)
+    assert statuses(reports) == {
+        "db/a": "fresh",
+        "db/b": "fresh",
+        "db/c": "fresh",
+        "db/d": "fresh",
+        "db/e": "built",
+    }
+    assert read_calls(tmp_path) == ["a", "b", "c", "d", "e"]
+
+    reports = run_pipeline(stages, ["b"], workers=workers, force=True, verbose=False)
+    assert statuses(reports) == {"db/a": "built", "db/b": "built"}
+    assert read_calls(tmp_path) == ["a", "a", "b", "b", "c", "d", "e"]
+
+    # A new source rebuilds everything downstream of it
+    (tmp_path / "source.txt").write_text("y")
+    reports = run_pipeline(stages, ["d"], workers=workers, verbose=False)
+    assert set(statuses(reports).values()) == {"built"}
+    assert (tmp_path / "d.txt").read_text() == "yabyacd"
+
+
+def test_failed_stage_skips_its_dependents(tmp_path):
+    stages = get_test_stages(tmp_path, failing="b")
+    reports = run_pipeline(stages, workers=2, verbose=False)
+    assert statuses(reports) == {
+        "db/a": "built",
+        "db/b": "failed",
+        "db/c": "built",
+        "db/d": "skipped",
+        "db/e": "built",
+    }
+    errors = {report["stage"]: report["error"] for report in reports}
+    assert "RuntimeError: The stage broke" in errors["db/b"]
+    assert errors["db/d"] is None
+    assert read_calls(tmp_path) == ["a", "c", "e"]
+    assert not (tmp_path / "d.txt").exists()
+
+    # Once fixed, only the failed and skipped stages are built
+    stages = get_test_stages(tmp_path)
+    assert statuses(run_pipeline(stages, workers=2, verbose=False)) == {
+        "db/a": "fresh",
+        "db/b": "built",
+        "db/c": "fresh",
+        "db/d": "built",
+        "db/e": "fresh",
+    }
+
+
+def test_failed_stage_before_the_last_stage(tmp_path):
+    # With one worker, d is skipped when nothing else is left to run
+    stages = get_test_stages(tmp_path, failing="c")
+    reports = run_pipeline(stages, ["d"], workers=1, verbose=False)
+    assert statuses(reports) == {
+        "db/a": "built",
+        "db/b": "built",
+        "db/c": "failed",
+        "db/d": "skipped",
+    }
@@ -0,0 +1,90 @@
+import igraph as ig
+import numpy as np
+import pytest
+
+from chessnet import rewiring
+from chessnet.rewiring import double_edge_swap
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def edges():
+    g = ig.Graph.Barabasi(300, 3, start_from=ig.Graph.Full(4))
+    return np.array(g.get_edgelist())
+
+
+def degrees(edges, n):
+    return np.bincount(edges.ravel(), minlength=n)
+
+
+def interrupt_after_checkpoints(monkeypatch, checkpoints):
+    """Raise from `double_edge_swap` once it has saved `checkpoints` times."""
+    saved = []
+
+    def gauge(name, value):
+        saved.append(value)
+        if len(saved) == checkpoints:
+            raise Interrupted
+
+    monkeypatch.setattr(rewiring.metrics, "gauge", gauge)
+
+
+def test_double_edge_swap_preserves_degrees(edges):
+    nswap = 5 * len(edges)
+    rewired, stats = double_edge_swap(edges, nswap, seed=0)
+    n = edges.max() + 1
+    assert stats["swaps"] == nswap
+    assert np.array_equal(degrees(rewired, n), degrees(edges, n))
+    assert np.all(rewired[:, 0] != rewired[:, 1])
+    keys = np.sort(rewired, axis=1)
+    assert len(np.unique(keys, axis=0)) == len(rewired)
+    assert not np.array_equal(rewired, edges)
+
+
+def test_double_edge_swap_is_deterministic(edges):
+    a, _ = double_edge_swap(edges, 1000, seed=1)
+    b, _ = double_edge_swap(edges, 1000, seed=1)
+    assert np.array_equal(a, b)
+
+
+def test_double_edge_swap_resumes_from_checkpoint(edges, tmp_path, monkeypatch):
+    expected, _ = double_edge_swap(edges, 1000, seed=1, batch_size=50)
+
+    checkpoint = tmp_path / "rewired.checkpoint.npz"
+    kwargs = dict(seed=1, batch_size=50, checkpoint=checkpoint, checkpoint_interval=-1)
+    with monkeypatch.context() as m:
+        interrupt_after_checkpoints(m, 3)
+        with pytest.raises(Interrupted):
+            double_edge_swap(edges, 1000, **kwargs)
+    assert checkpoint.is_file()
+
+    rewired, stats = double_edge_swap(edges, 1000, **kwargs)
+    assert np.array_equal(rewired, expected)
+    assert stats["swaps"] == 1000
+    assert not checkpoint.is_file()
+
+
+@pytest.mark.parametrize("change", ["edges", "nswap", "seed"])
+def test_double_edge_swap_ignores_checkpoint_of_other_run(
+    edges, tmp_path, monkeypatch, change
+):
+    checkpoint = tmp_path / "rewired.checkpoint.npz"
+    kwargs = dict(batch_size=50, checkpoint=checkpoint, checkpoint_interval=-1)
+    with monkeypatch.context() as m:
+        interrupt_after_checkpoints(m, 3)
+        with pytest.raises(Interrupted):
+            double_edge_swap(edges, 1000, seed=1, **kwargs)
+
+    args = {"edges": edges, "nswap": 1000, "seed": 1}
+    if change == "edges":
+        args["edges"] = edges[:-1]
+    elif change == "nswap":
+        args["nswap"] = 900
+    else:
+        args["seed"] = 2
+    expected, _ = double_edge_swap(**args, batch_size=50)
+    rewired, _ = double_edge_swap(**args, **kwargs)
+    assert np.array_equal(rewired, expected)
@@ -0,0 +1,97 @@
+import os
+import random
+import subprocess
+import sys
+
+import igraph as ig
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import ROOT_DIR
+
+from chessnet import rich_club as rc
+from chessnet.graphs import get_pickle_filename, get_rewired_filename
+
+
+def baseline_rich_club(g, thresholds, attribute=None):
+    """Density of the subgraph above every threshold, one subgraph at a time."""
+    densities = []
+    for threshold in thresholds:
+        if attribute is None:
+            h = g.subgraph(g.vs.select(_degree_gt=threshold))
+        else:
+            h = g.subgraph(g.vs.select(**{f"{attribute}_gt": threshold}))
+        m, n = h.ecount(), h.vcount()
+        densities.append(m / (n * (n - 1) / 2) if n > 1 else np.nan)
+    return densities
+
+
+def random_graph(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    random.seed(seed)
+    g = ig.Graph.Barabasi(n, 3)
+    g.add_edges(rng.integers(0, n, size=(200, 2)).tolist())
+    g.simplify()
+    # Rounded values give ties between vertices and with the thresholds
+    g.vs["MeanElo"] = np.round(rng.normal(1800, 300, n), -1).tolist()
+    g.vs["name"] = [f"P{i}" for i in range(n)]
+    return g
+
+
+@pytest.mark.parametrize("attribute", [None, "MeanElo"])
+@pytest.mark.parametrize("samples", [30, None])
+def test_rich_club_curve_matches_subgraph_loop(attribute, samples):
+    g = random_graph()
+    thresholds = rc.get_thresholds(g, attribute, samples)
+    values = np.array(g.degree() if attribute is None else g.vs[attribute])
+    # Thresholds outside and at the bounds of the values
+    thresholds = np.concatenate([thresholds, [values.min() - 1, values.max()]])
+    phi = rc.rich_club_curve(g, attribute, thresholds)["phi"].to_numpy()
+    np.testing.assert_array_equal(phi, baseline_rich_club(g, thresholds, attribute))
+
+
+def run_rich_club_script(*flags):
+    env = {**os.environ, "PYTHONPATH": str(ROOT_DIR / "src")}
+    subprocess.run(
+        [sys.executable, "-m", "chessnet.rich_club", *flags, "--samples", "20"],
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.mark.parametrize("elo", [False, True])
+def test_portal_script_writes_the_portal_curve(elo):
+    database = "OM_Portal_201510"
+    g, g_ran = random_graph(seed=1), random_graph(seed=2)
+    g.write_pickle(str(get_pickle_filename(database)))
+    g_ran.write_pickle(str(get_rewired_filename(database)))
+    filename = rc.get_rich_club_filename(database, 20, elo=elo)
+    run_rich_club_script("--rich-club-elo-portal" if elo else "--rich-club-portal")
+
+    df = pd.read_csv(filename, index_col=0, float_precision="round_trip")
+    attribute = "MeanElo" if elo else None
+    thresholds = df["elo" if elo else "k"].to_numpy()
+    phi = baseline_rich_club(g, thresholds, attribute)
+    rand_phi = baseline_rich_club(g_ran, thresholds, attribute)
+    np.testing.assert_array_equal(df["phi"], phi)
+    np.testing.assert_array_equal(df["ran_phi" if elo else "rand_phi"], rand_phi)
+    assert not rc.get_rich_club_filename("OM_OTB_201609", 20, elo=elo).exists()
+
+
+@pytest.mark.parametrize("null_model", ["rewire", "elo_shuffle"])
+def test_ensemble_does_not_depend_on_workers(null_model):
+    g = random_graph(100)
+    random.seed(123)
+    state = random.getstate()
+    kwargs = dict(
+        attribute="MeanElo", null_model=null_model, n_null=6, seed=3, samples=15
+    )
+    serial = rc.compute_rich_club_ensemble(g, workers=1, **kwargs)
+    parallel = rc.compute_rich_club_ensemble(g, workers=2, **kwargs)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert not np.allclose(serial["null_std"].dropna(), 0)
+
+    # The caller's random state is left alone and the graph is not kept
+    assert random.getstate() == state
+    assert rc._ensemble_graph is None
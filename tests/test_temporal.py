@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import FIXTURE_PGN
+
+from chessnet import metrics
+from chessnet.games import parse_dates
+from chessnet.graphs import csv_to_igraph
+from chessnet.pgn import OM_OTB_FIELDS, get_pgn_filename, pgn_to_artifact
+from chessnet.temporal import SlidingWindowGraph, read_dated_games
+
+
+def write_partial_dates(database, undated=0):
+    """The fixture PGN with a third of its dates missing the day or the month."""
+    text = FIXTURE_PGN.read_text()
+    text = text.replace('[Date "2021.09.09"]', '[Date "2021.09.??"]')
+    text = text.replace('[Date "2021.09.10"]', '[Date "2021.??.??"]')
+    text = text.replace('[Date "2021.09.08"]', '[Date "????.??.??"]', undated)
+    get_pgn_filename(database).write_text(text)
+
+
+def test_parse_dates_reads_partial_dates_as_the_start_of_the_period():
+    dates = pd.Series(["1995.06.07", "1995.06.??", "1995.??.??", "????.??.??", None])
+    expected = pd.to_datetime(["1995-06-07", "1995-06-01", "1995-01-01", None, None])
+    np.testing.assert_array_equal(parse_dates(dates), expected)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_window_covering_all_games_matches_static_graph(database, output_format):
+    write_partial_dates(database)
+    pgn_to_artifact(
+        get_pgn_filename(database), OM_OTB_FIELDS, output_format=output_format
+    )
+    expected = csv_to_igraph(database, verbose=False)
+
+    graph = SlidingWindowGraph.from_database(database)
+    assert len(graph.dates) == 270
+    assert graph.dates[0] == np.datetime64("2021-01-01")
+    graph.move(pd.Timestamp("2021-01-01"), pd.Timestamp("2022-01-01"))
+    g = graph.snapshot()
+    assert g.vs["name"] == expected.vs["name"]
+    assert g.get_edgelist() == expected.get_edgelist()
+    assert g.es["NUMBER_OF_GAMES"] == expected.es["NUMBER_OF_GAMES"]
+    assert g.vs["MeanElo"] == expected.vs["MeanElo"]
+    np.testing.assert_allclose(g.vs["StdElo"], expected.vs["StdElo"], rtol=1e-10)
+
+
+def test_games_without_a_year_are_dropped_and_counted(database, tmp_path):
+    write_partial_dates(database, undated=5)
+    pgn_to_artifact(get_pgn_filename(database), OM_OTB_FIELDS)
+    sink = tmp_path / "metrics.jsonl"
+    metrics.configure(sink)
+    try:
+        df = read_dated_games(database)
+    finally:
+        metrics.configure(None)
+    assert len(df) == 265
+    assert df["Date"].notna().all()
+    assert df["Game"].min() == 5
+    events = [json.loads(line) for line in sink.read_text().splitlines()]
+    assert [(event["name"], event["value"]) for event in events] == [
+        ("undated_games", 5)
+    ]